@@ -0,0 +1,84 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measure the memory used by each node of a typical document tree.
+
+Run from the root of the repository (Python 3 only):
+
+    python benchmarks/memory.py [SECTIONS]
+
+"""
+
+import gc
+import os.path
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import htool  # noqa: E402
+from htool.dom import _ElementContainer  # noqa: E402
+
+
+def build(sections):
+    body = []
+    for s in range(sections):
+        table = htool.Table(class_='data')
+        table.append_header_row('id', 'name', 'value')
+        for r in range(20):
+            table.append_data_row(r, 'row {}'.format(r), r * 1.5)
+        body.append(htool.Section(
+            htool.H2('Section {}'.format(s), id='s{}'.format(s)),
+            htool.P('Some ', htool.Em('text'), ' with a ',
+                    htool.A('link', href='/page/{}'.format(s)), '.'),
+            htool.Ul(*('item {}'.format(i) for i in range(10))),
+            table,
+            class_='section'))
+    return htool.docs.SimpleDocument('Title', 'Description', *body)
+
+
+def count_nodes(root):
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, _ElementContainer):
+            stack.extend(node.children)
+    return count
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    document = build(sections)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    nodes = count_nodes(document)
+    print('nodes: {}'.format(nodes))
+    print('total: {:.1f} MiB'.format((after - before) / 1024 / 1024))
+    print('bytes per node: {:.1f}'.format((after - before) / nodes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compare select() with a hand-written recursive walk of the children lists.
+
+Run from the root of the repository (Python 3 only):
+
+    python benchmarks/query.py [SECTIONS]
+
+"""
+
+import os.path
+import sys
+from timeit import default_timer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import htool  # noqa: E402
+from htool import query  # noqa: E402
+from htool.dom import _ElementContainer, _HTMLElement  # noqa: E402
+
+SELECTOR = 'table.data > tbody tr:nth-child(odd) td.num'
+
+
+def build(sections):
+    body = []
+    for s in range(sections):
+        tbody = htool.Tbody()
+        for r in range(20):
+            tbody.append_child(htool.Tr(htool.Td('row {}'.format(r)),
+                                        htool.Td(r, class_='num'),
+                                        htool.Td(r * 1.5, class_='num')))
+        body.append(htool.Section(
+            htool.H2('Section {}'.format(s), id='s{}'.format(s)),
+            htool.P('Some ', htool.Em('text'), '.'),
+            htool.Table(tbody, class_='data' if s % 2 else 'plain'),
+            class_='section'))
+    return htool.docs.SimpleDocument('Title', 'Description', *body)
+
+
+def count_nodes(root):
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, _ElementContainer):
+            stack.extend(node.children)
+    return count
+
+
+def has_class(element, cname):
+    try:
+        value = element.get_attribute('class')
+    except KeyError:
+        return False
+    return value is not None and cname in value.split()
+
+
+def naive_select(node, found=None, table=None, tbody=None, odd_row=False):
+    # The equivalent of SELECTOR, checked while recursing
+    if found is None:
+        found = []
+    for child in node.children:
+        if not isinstance(child, _HTMLElement):
+            continue
+        if child.tag == 'td' and odd_row and has_class(child, 'num'):
+            found.append(child)
+        if isinstance(child, _ElementContainer):
+            if child.tag == 'table':
+                naive_select(child, found, has_class(child, 'data'))
+            elif child.tag == 'tbody':
+                naive_select(child, found, table, tbody=tbody or table)
+            elif child.tag == 'tr':
+                rows = [row for row in node.children
+                        if isinstance(row, _HTMLElement)]
+                naive_select(child, found, table, tbody,
+                             tbody and rows.index(child) % 2 == 0)
+            else:
+                naive_select(child, found, table, tbody, odd_row)
+    return found
+
+
+def measure(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = default_timer()
+        result = function()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 650
+    document = build(sections)
+    print('nodes: {}'.format(count_nodes(document)))
+    naive_time, expected = measure(lambda: naive_select(document))
+    print('naive walk: {:.3f} s'.format(naive_time))
+
+    select_time, found = measure(lambda: document.select(SELECTOR))
+    assert found == expected, (len(found), len(expected))
+    print('select(): {:.3f} s'.format(select_time))
+    print('matches: {}'.format(len(found)))
+
+    def compile_selector():
+        query._SELECTORS.clear()
+        return query.compile_selector(SELECTOR)
+    compile_time, _ = measure(compile_selector, 1000)
+    print('selector compilation: {:.6f} s'.format(compile_time))
+    id_time, _ = measure(lambda: document.select('#s{}'.format(sections - 1)))
+    print('select() by id: {:.3f} s'.format(id_time))
+    document.enable_index()
+    id_time, _ = measure(lambda: document.get_by_id('s{}'.format(
+        sections - 1)))
+    print('get_by_id() with an index: {:.6f} s'.format(id_time))
+    id_time, found = measure(lambda: document.select('#s{}'.format(
+        sections - 1)))
+    assert len(found) == 1
+    print('select() by id with an index: {:.6f} s'.format(id_time))
+    select_time, found = measure(lambda: document.select(SELECTOR))
+    assert found == expected, (len(found), len(expected))
+    print('select() with an index: {:.3f} s'.format(select_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Reference renderer and output-equivalence checks.
+
+reference_compile() is the original recursive implementation of compile():
+the output of every faster compilation path (iter_compile(), write(),
+compile_bytes(), the render cache, parallel rendering, RowSource,
+ColumnSource, LazyChildren, the cached and lazy escapes...) must be the same
+as its output for the equivalent tree. The digests of the reference outputs
+are also saved in the baseline, see suite.py, so that changes of the output
+between releases are detected.
+
+Run from the root of the repository (Python 3 only):
+
+    python benchmarks/reference.py
+
+"""
+
+import hashlib
+import os
+import os.path
+import pickle
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import htool  # noqa: E402
+from htool import dom, text  # noqa: E402
+from htool.dom import (_ElementContainer, _HTMLContainerElement,  # noqa: E402
+                       _HTMLVoidElement, _TextNode)
+
+
+def reference_compile(node, indent=""):
+    if isinstance(node, _HTMLContainerElement):
+        return _compile_container_element(node, indent)
+    if isinstance(node, _HTMLVoidElement):
+        return node._compose_start_tag().join(('<', ' />'))
+    if isinstance(node, _ElementContainer):
+        return _compile_children(node, indent)
+    if isinstance(node, _TextNode):
+        return node.text.escaped
+    # Leaf nodes like Doctype, Comment and TextFile
+    return node.compile(indent=indent)
+
+
+def _compile_children(node, indent):
+    try:
+        prevchild = node.children[0]
+    except IndexError:
+        return ""
+    subindent = "".join((indent, node.INDENTATION))
+    # The first child's BREAK_BEFORE and the last child's BREAK_AFTER are
+    # taken into account in _compile_container_element()
+    compiled = [reference_compile(prevchild, subindent)]
+    for child in node.children[1:]:
+        if prevchild.BREAK_AFTER or child.BREAK_BEFORE:
+            compiled.append("".join(("\n", subindent)))
+        compiled.append(reference_compile(child, subindent))
+        prevchild = child
+    return "".join(compiled)
+
+
+def _compile_container_element(node, indent):
+    start = node._compose_start_tag().join(('<', '>'))
+    content = _compile_children(node, indent)
+    end = node.tag.join(('</', '>'))
+    if node.AUTOINDENT_MULTILINE and "\n" in content:
+        start = "".join((start, "\n", indent, node.INDENTATION))
+        end = "".join(("\n", indent, end))
+    elif node.children:
+        if node.children[0].BREAK_BEFORE:
+            start = "".join((start, "\n", indent, node.INDENTATION))
+        if node.children[-1].BREAK_AFTER:
+            end = "".join(("\n", indent, end))
+    return "".join((start, content, end))
+
+
+def build_wide(size=2000):
+    return htool.Div(*(htool.P('Paragraph {}'.format(index), class_='p')
+                       for index in range(size)))
+
+
+def build_deep(depth=150):
+    # Deeper trees would exceed the recursion limit when pickled
+    node = htool.Span('leaf')
+    for level in range(depth):
+        node = htool.Div('level {}'.format(level), node, id='d{}'.format(
+            level))
+    return node
+
+
+def table_rows(rows=500):
+    return [(index, 'row <{}>'.format(index), index * 1.5, None, 'caf\xe9')
+            for index in range(rows)]
+
+
+def build_table(rows=500):
+    table = htool.Table(class_='data')
+    table.append_header_row('id', 'name', 'value', 'none', 'text')
+    table.append_data_rows(*table_rows(rows))
+    return table
+
+
+def build_document(sections=40):
+    body = []
+    for index in range(sections):
+        body.append(htool.Section(
+            htool.H2('Section {}'.format(index), id='s{}'.format(index)),
+            htool.P('Some ', htool.Em('emphasized'), ' text with a ',
+                    htool.A('link & "quotes"', href='/page?a=1&b={}'.format(
+                        index)), '.\nA second line: ☃.'),
+            htool.Pre('preformatted\n  text\n'),
+            htool.Ul(*('item {}'.format(item) for item in range(5))),
+            htool.Form(htool.Input(type='checkbox', checked=None),
+                       htool.Textarea('multi\nline')),
+            htool.Comment(' section {} '.format(index)),
+            class_='section'))
+    return htool.docs.SimpleDocument(
+        'Title', 'Description', *body, css=(('all', 'style.css'), ),
+        style='body { color: black; }', js=('script.js', ))
+
+
+SAMPLES = (
+    ('wide', build_wide),
+    ('deep', build_deep),
+    ('table', build_table),
+    ('document', build_document),
+)
+INDENTS = ("", "    ")
+
+
+def reference_digests():
+    """
+    Return the digests of the reference outputs of the samples.
+    """
+    digests = {}
+    for name, build in SAMPLES:
+        for indent in INDENTS:
+            output = reference_compile(build(), indent)
+            digests['{}/{!r}'.format(name, indent)] = hashlib.sha256(
+                output.encode('utf-8')).hexdigest()
+    return digests
+
+
+def _write(node, indent):
+    tempdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tempdir, 'output.html')
+        node.write(filename)
+        with open(filename) as f:
+            return f.read()
+    finally:
+        shutil.rmtree(tempdir)
+
+
+def _compile_cached(node, indent):
+    dom.RENDER_CACHE = True
+    try:
+        node.compile(indent=indent)
+        return node.compile(indent=indent)
+    finally:
+        dom.RENDER_CACHE = False
+        # The trees of the checks are discarded, so the ancestors of the
+        # benchmarked trees don't need to be invalidated
+        dom._render_cache_used = False
+
+
+def _compile_with_escape(build, Escape, indent):
+    default = dom.DEFAULT_ESCAPE
+    dom.DEFAULT_ESCAPE = Escape
+    try:
+        return build().compile(indent=indent)
+    finally:
+        dom.DEFAULT_ESCAPE = default
+
+
+# The compilation paths that must give the same output as reference_compile()
+VARIANTS = (
+    ('compile', lambda build, indent: build().compile(indent=indent)),
+    ('iter_compile', lambda build, indent: "".join(
+        build().iter_compile(indent=indent))),
+    ('compile_bytes', lambda build, indent: build().compile_bytes(
+        indent=indent, encoding='ascii').decode('ascii')),
+    ('render cache', lambda build, indent: _compile_cached(build(), indent)),
+    ('parallel', lambda build, indent: build().compile(indent=indent,
+                                                       workers=2)),
+    ('pickle', lambda build, indent: pickle.loads(pickle.dumps(
+        build())).compile(indent=indent)),
+    ('lazy escape', lambda build, indent: _compile_with_escape(
+        build, text.TextEscapedLazy, indent)),
+    ('cached escape', lambda build, indent: _compile_with_escape(
+        build, text.make_cached_escape(), indent)),
+)
+
+
+def _build_row_source():
+    table = htool.Table(class_='data')
+    table.append_header_row('id', 'name', 'value', 'none', 'text')
+    table.append_child(htool.RowSource(iter(table_rows())))
+    return table
+
+
+def _build_column_source():
+    table = htool.Table(class_='data')
+    table.append_header_row('id', 'name', 'value', 'none', 'text')
+    table.append_child(htool.ColumnSource(list(zip(*table_rows()))))
+    return table
+
+
+# Trees built with faster constructs, and their equivalent samples
+EQUIVALENTS = (
+    ('RowSource', _build_row_source, build_table),
+    ('ColumnSource', _build_column_source, build_table),
+    ('LazyChildren', lambda: htool.Div(htool.LazyChildren(
+        htool.P('Paragraph {}'.format(index), class_='p')
+        for index in range(2000))), build_wide),
+)
+
+
+def check(digests=None):
+    """
+    Return the list of the failed checks.
+
+    'digests' can be the saved digests of the reference outputs.
+    """
+    failures = []
+    for name, build in SAMPLES:
+        for indent in INDENTS:
+            reference = reference_compile(build(), indent)
+            if indent == "":
+                variants = VARIANTS + (('write', lambda build, indent: _write(
+                    build(), indent)), )
+            else:
+                variants = VARIANTS
+            for variant, compile_ in variants:
+                if variant == 'compile_bytes':
+                    expected = reference.encode(
+                        'ascii', 'xmlcharrefreplace').decode('ascii')
+                else:
+                    expected = reference
+                if compile_(build, indent) != expected:
+                    failures.append('{} ({}, indent={!r})'.format(
+                        variant, name, indent))
+    for variant, build, build_reference in EQUIVALENTS:
+        for indent in INDENTS:
+            if (build().compile(indent=indent) !=
+                    reference_compile(build_reference(), indent)):
+                failures.append('{} (indent={!r})'.format(variant, indent))
+    if digests:
+        for key, digest in sorted(reference_digests().items()):
+            if digests.get(key, digest) != digest:
+                failures.append('reference output changed ({})'.format(key))
+    return failures
+
+
+def main():
+    failures = check()
+    for failure in failures:
+        print('FAILED: {}'.format(failure))
+    if failures:
+        sys.exit(1)
+    print('All the outputs match the reference renderer')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmarks of the main hot paths.
+
+Run from the root of the repository (Python 3 only):
+
+    python benchmarks/suite.py [--repeat N] [--save-baseline] [NAME ...]
+
+The outputs are first checked against the reference renderer (see
+reference.py), then each benchmark reports its best and mean time per call
+and the peak memory allocated by a call, compared with the saved baseline
+(baseline.json) if it exists. The baseline is only meaningful on the machine
+where it was saved: run with --save-baseline to replace it.
+
+If pyperf is installed, the benchmarks can also be run with it, in which
+case the remaining arguments are pyperf's (e.g. --track-memory or -o):
+
+    python benchmarks/suite.py --pyperf [PYPERF OPTIONS]
+
+"""
+
+import argparse
+import gc
+import json
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+from timeit import default_timer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import htool  # noqa: E402
+from htool.text import TextEscaped  # noqa: E402
+
+import reference  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+# Minimum duration of each timed sample, in seconds
+MIN_SAMPLE_TIME = 0.05
+# Relative change from the baseline that is reported as slower or faster
+THRESHOLD = 0.1
+
+# Each benchmark is a function that prepares its data, and returns the
+# function to be timed
+BENCHMARKS = OrderedDict()
+_TEMPDIRS = []
+
+
+def benchmark(function):
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+@benchmark
+def construct_kwargs():
+    def run():
+        for index in range(1000):
+            htool.Div(id='d{}'.format(index), class_='a b', title='Title',
+                      lang='en', hidden=None, data_index=index,
+                      data_name='name', style='color: red;')
+    return run
+
+
+@benchmark
+def add_classes():
+    def run():
+        for index in range(1000):
+            span = htool.Span()
+            span.add_classes('first', 'second', 'third')
+            span.add_classes('second', 'fourth')
+    return run
+
+
+@benchmark
+def escape_ascii():
+    texts = ['Plain ASCII text number {}'.format(index)
+             for index in range(10000)]
+    return lambda: [TextEscaped(text) for text in texts]
+
+
+@benchmark
+def escape_non_ascii():
+    texts = ['Caf\xe9 <{}> & ☃ "quoted"'.format(index)
+             for index in range(10000)]
+    return lambda: [TextEscaped(text) for text in texts]
+
+
+@benchmark
+def escape_non_string():
+    values = [index * (1.5 if index % 2 else 1) for index in range(10000)]
+    return lambda: [TextEscaped(value) for value in values]
+
+
+@benchmark
+def compile_wide():
+    return reference.build_wide(20000).compile
+
+
+@benchmark
+def compile_deep():
+    # Deeper than the recursion limit; the indentation makes the output grow
+    # quadratically with the depth
+    return reference.build_deep(2000).compile
+
+
+@benchmark
+def compile_table():
+    return reference.build_table(5000).compile
+
+
+@benchmark
+def simple_document():
+    return lambda: reference.build_document(200).compile()
+
+
+@benchmark
+def write():
+    document = reference.build_document(200)
+    tempdir = tempfile.mkdtemp()
+    # The temporary directories are removed by main()
+    _TEMPDIRS.append(tempdir)
+    filename = os.path.join(tempdir, 'output.html')
+
+    def run():
+        document.write(filename)
+        os.remove(filename)
+    return run
+
+
+def measure(function, repeat):
+    # Return the best and mean times per call, and the peak memory allocated
+    # by a call
+    function()
+    loops = 1
+    while True:
+        start = default_timer()
+        for _ in range(loops):
+            function()
+        elapsed = default_timer() - start
+        if elapsed >= MIN_SAMPLE_TIME:
+            break
+        loops *= 2
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = default_timer()
+        for _ in range(loops):
+            function()
+        times.append((default_timer() - start) / loops)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), sum(times) / len(times), peak
+
+
+def compare(seconds, baseline):
+    if not baseline:
+        return ''
+    ratio = seconds / baseline['seconds']
+    if ratio > 1 + THRESHOLD:
+        verdict = 'slower'
+    elif ratio < 1 - THRESHOLD:
+        verdict = 'faster'
+    else:
+        verdict = 'same'
+    return '{:.2f}x {}'.format(ratio, verdict)
+
+
+def run_pyperf():
+    import pyperf
+    sys.argv.remove('--pyperf')
+    runner = pyperf.Runner(program_args=(sys.argv[0], '--pyperf'))
+    for name, prepare in BENCHMARKS.items():
+        runner.bench_func(name, prepare())
+
+
+def main():
+    if '--pyperf' in sys.argv:
+        run_pyperf()
+        return
+    parser = argparse.ArgumentParser(description='Run the benchmarks.')
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help='run only these benchmarks')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timed samples (default: 5)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--skip-check', action='store_true',
+                        help="don't check the outputs")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmarks: {}'.format(
+            ', '.join(sorted(unknown))))
+
+    saved = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            saved = json.load(f)
+    if not args.skip_check:
+        failures = reference.check(saved.get('outputs'))
+        for failure in failures:
+            print('FAILED: {}'.format(failure))
+        if failures:
+            sys.exit(1)
+        print('The outputs match the reference renderer')
+
+    results = OrderedDict()
+    print('{:<20} {:>12} {:>12} {:>12}  {}'.format(
+        'benchmark', 'best (ms)', 'mean (ms)', 'peak (KiB)', 'baseline'))
+    try:
+        for name, prepare in BENCHMARKS.items():
+            if args.names and name not in args.names:
+                continue
+            best, mean, peak = measure(prepare(), args.repeat)
+            results[name] = {'seconds': best, 'peak_bytes': peak}
+            print('{:<20} {:>12.3f} {:>12.3f} {:>12.1f}  {}'.format(
+                name, best * 1000, mean * 1000, peak / 1024,
+                compare(best, saved.get('benchmarks', {}).get(name))))
+    finally:
+        for tempdir in _TEMPDIRS:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
+    if args.save_baseline:
+        benchmarks = saved.get('benchmarks', {})
+        benchmarks.update(results)
+        with open(BASELINE, 'w') as f:
+            json.dump({'python': sys.version.split()[0],
+                       'benchmarks': benchmarks,
+                       'outputs': reference.reference_digests()},
+                      f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Saved the baseline to {}'.format(BASELINE))
+
+
+if __name__ == '__main__':
+    main()
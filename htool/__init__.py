@@ -17,7 +17,13 @@
 # along with Htool.  If not, see <http://www.gnu.org/licenses/>.
 
 # It shouldn't be necessary to expose the dom module
-from . import docs, text
+from . import docs, templates, text
 # Only expose the tags and misc classes directly
 from .misc import *
 from .tags import *
+from .tables import ColumnSource, RowSource
+from .parallel import render_many
+from .parser import parse, Parser
+from .diffs import diff
+from .profiling import profile
+from .arena import DocumentArena
@@ -0,0 +1,208 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# Unlike the other modules, this one requires Python 3.6 (asynchronous
+# generators), so it's only imported by _Node.aiter_compile()
+
+from . import dom
+from .dom import _AsyncChild, _ElementContainer, _Node, _Renderer, _TextNode
+
+
+async def aiter_compile(node, indent=""):
+    """
+    Asynchronously yield the compiled node in chunks.
+
+    The chunks compiled synchronously are joined up to about
+    dom.WRITE_BUFFER_SIZE characters, and the output is always flushed before
+    waiting for an awaitable or asynchronous iterable child. The children of
+    each container are resolved before its start tag is compiled, or before
+    the formatting of any of its ancestors is decided, and they replace the
+    _AsyncChild nodes in the tree (see _AsyncChild), so the output is
+    exactly the output of compile() for the tree after the compilation.
+    """
+    renderer = _AsyncRenderer()
+    renderer._newlines = {0: "".join(("\n", indent))}
+    buffer_ = []
+    size = 0
+    stack = [iter(((node, 0), ))]
+    while stack:
+        frame = stack[-1]
+        if frame.__class__ is _AsyncFrame:
+            if buffer_:
+                yield "".join(buffer_)
+                buffer_ = []
+                size = 0
+            try:
+                child, subindent = await frame.items.__anext__()
+            except StopAsyncIteration:
+                stack.pop()
+                continue
+        else:
+            for item in frame:
+                if item.__class__ is tuple:
+                    child, subindent = item
+                    break
+                buffer_.append(item)
+                size += len(item)
+                if size >= dom.WRITE_BUFFER_SIZE:
+                    yield "".join(buffer_)
+                    buffer_ = []
+                    size = 0
+            else:
+                stack.pop()
+                continue
+        if isinstance(child, _AsyncChild):
+            # Only the nodes generated while compiling (e.g. by LazyChildren)
+            # can still be _AsyncChild nodes
+            stack.append(_AsyncFrame(child, renderer, subindent))
+            continue
+        container = child if _has_async_children(child) else None
+        while True:
+            if container is not None:
+                if buffer_:
+                    yield "".join(buffer_)
+                    buffer_ = []
+                    size = 0
+                await _resolve_children(container)
+            try:
+                items = child._render(renderer, subindent)
+            except _Unresolved as exc:
+                # The formatting depends on the children of a descendant
+                container = exc.container
+            else:
+                break
+        stack.append(iter(items))
+    if buffer_:
+        yield "".join(buffer_)
+
+
+class _Unresolved(Exception):
+    # Raised while compiling when the formatting depends on the _AsyncChild
+    # children of 'container'
+    def __init__(self, container):
+        super(_Unresolved, self).__init__()
+        self.container = container
+
+
+class _AsyncRenderer(_Renderer):
+    __slots__ = ()
+
+    def scan_async_child(self, child):
+        parent = child.parent_element
+        if parent is not None and any(node is child
+                                      for node in parent.children):
+            raise _Unresolved(parent)
+        # The nodes generated while compiling are resolved when they're
+        # compiled, see _AsyncFrame
+        return (True, None)
+
+
+def _has_async_children(node):
+    if isinstance(node, _ElementContainer):
+        for child in node.children:
+            if isinstance(child, _AsyncChild):
+                return True
+    return False
+
+
+async def _resolve_children(container):
+    # Replace the _AsyncChild children with the nodes they resolve to
+    children = []
+    for child in container.children:
+        if isinstance(child, _AsyncChild):
+            await _resolve(child, children)
+        else:
+            children.append(child)
+    container.children[:] = children
+    if dom._index_used:
+        for child in children:
+            container._index_subtree(child)
+    if dom._render_cache_used:
+        container._invalidate_render_cache()
+
+
+async def _resolve(child, nodes):
+    # An awaitable can also resolve to other awaitables
+    async for node in _iter_async_nodes(child):
+        if isinstance(node, _AsyncChild):
+            await _resolve(node, nodes)
+        else:
+            nodes.append(node)
+
+
+class _AsyncFrame(object):
+    # Stack frame of an _AsyncChild generated while compiling, whose items are
+    # all (node, indent) tuples
+    __slots__ = ('items', )
+
+    def __init__(self, child, renderer, indent):
+        self.items = _iter_async_items(child, renderer, indent)
+
+
+async def _iter_async_items(child, renderer, indent):
+    # Like _Fragment._render(), but the line breaks between the nodes are
+    # yielded as nodes too, so that the frame only yields tuples
+    prevnode = None
+    async for node in _iter_async_nodes(child):
+        if prevnode is not None and (prevnode.BREAK_AFTER or
+                                     node.BREAK_BEFORE):
+            yield (_Newline(), indent)
+        yield (node, indent)
+        prevnode = node
+
+
+async def _iter_async_nodes(child):
+    source = child.source
+    if hasattr(source, '__aiter__'):
+        async for value in source:
+            for node in _prepare_values(child, value, False):
+                yield node
+    else:
+        for node in _prepare_values(child, await source, True):
+            yield node
+
+
+def _prepare_values(child, value, multiple):
+    # The texts are escaped like the other children of the parent; an
+    # awaitable can also return a list or tuple of values
+    if multiple and isinstance(value, (list, tuple)):
+        values = value
+    else:
+        values = (value, )
+    parent = child.parent_element if child.parent_element is not None else (
+        child)
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, _Node):
+            value.parent_element = parent
+            yield value
+        elif hasattr(value, '__await__') or hasattr(value, '__aiter__'):
+            nested = _AsyncChild(value)
+            nested.parent_element = parent
+            yield nested
+        else:
+            yield _TextNode(parent, value)
+
+
+class _Newline(_Node):
+    # A line break at the indentation it's rendered with
+    __slots__ = ()
+
+    def _render(self, renderer, indent):
+        return (renderer.newline(indent), )
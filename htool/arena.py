@@ -0,0 +1,461 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+from array import array
+
+from . import dom
+from .dom import (_AttributeDict, _Element, _ElementContainer,
+                  _HTMLContainerElement, _HTMLElement, _HTMLVoidElement,
+                  _Node, _Renderer, _TextNode)
+from .misc import ElementContainer
+from .text import _Text, TextRaw
+
+# Maximum number of distinct strings that are stored only once (the first
+# ones, usually the most repeated, e.g. class names), see
+# DocumentArena._intern()
+INTERN_SIZE = 4096
+
+# The types of nodes, see DocumentArena._get_kind()
+_TEXT = 0
+_CONTAINER = 1
+_VOID = 2
+_PLAIN = 3
+_LEAF = 4
+
+
+class DocumentArena(object):
+    """
+    Compact representation of a node tree, for very large documents.
+
+    Instead of a Python object per node, the nodes are rows of parallel
+    arrays (their kind, i.e. class and tag, and the indexes of their parent,
+    first and last child and next sibling), and the escaped texts and
+    attributes are stored in a pool of UTF-8 bytes, where the repeated
+    strings are only stored once. The nodes are identified by their indexes:
+    the root is ROOT.
+
+    The arena is compiled like the equivalent tree (minified and encoded
+    output are not supported: convert the arena with to_tree() for those).
+    Nodes that are not text, elements or containers (e.g. Doctype or
+    Comment) are kept as objects; fragments (e.g. LazyChildren) are expanded
+    when they are added.
+    """
+    ROOT = 0
+
+    def __init__(self, root=None):
+        # Columns of the nodes; _data is the index of the first attribute in
+        # _attributes for elements, the index of the string for texts, or the
+        # index of the object in _objects for other nodes
+        self._kind = array(str('H'))
+        self._parent = array(str('i'))
+        self._first = array(str('i'))
+        self._last = array(str('i'))
+        self._next = array(str('i'))
+        self._data = array(str('i'))
+        self._count = array(str('H'))
+        # (name, value) pairs of string indexes; a value of -1 means that the
+        # attribute has no value
+        self._attributes = array(str('i'))
+        self._pool = bytearray()
+        self._offsets = array(str('l'), (0, ))
+        self._interned = {}
+        self._objects = []
+        self._kinds = []
+        self._kind_ids = {}
+        if root is None:
+            root = ElementContainer()
+        self.add_node(-1, root)
+
+    def __len__(self):
+        return len(self._kind)
+
+    @classmethod
+    def from_tree(cls, node):
+        """
+        Return a new arena whose root is the converted 'node'.
+        """
+        return cls(node)
+
+    def _get_kind(self, class_, tag):
+        key = (class_, tag)
+        try:
+            return self._kind_ids[key]
+        except KeyError:
+            pass
+        if issubclass(class_, _TextNode):
+            type_ = _TEXT
+        elif issubclass(class_, _HTMLContainerElement):
+            type_ = _CONTAINER
+        elif issubclass(class_, _HTMLVoidElement):
+            type_ = _VOID
+        elif issubclass(class_, _ElementContainer):
+            type_ = _PLAIN
+        else:
+            type_ = _LEAF
+        kind = self._kind_ids[key] = len(self._kinds)
+        self._kinds.append((type_, class_, tag))
+        return kind
+
+    def _intern(self, string):
+        # Return the index of the string in the pool; the first INTERN_SIZE
+        # distinct strings are stored only once
+        try:
+            return self._interned[string]
+        except KeyError:
+            pass
+        index = len(self._offsets) - 1
+        self._pool.extend(string.encode('utf-8'))
+        self._offsets.append(len(self._pool))
+        if len(self._interned) < INTERN_SIZE:
+            self._interned[string] = index
+        return index
+
+    def _get_string(self, index):
+        return self._pool[self._offsets[index]:
+                          self._offsets[index + 1]].decode('utf-8')
+
+    def _append(self, parent, kind, data, count=0):
+        index = len(self._kind)
+        self._kind.append(kind)
+        self._parent.append(parent)
+        self._first.append(-1)
+        self._last.append(-1)
+        self._next.append(-1)
+        self._data.append(data)
+        self._count.append(count)
+        if parent >= 0:
+            last = self._last[parent]
+            if last < 0:
+                self._first[parent] = index
+            else:
+                self._next[last] = index
+            self._last[parent] = index
+        return index
+
+    def _append_element(self, parent, element):
+        attributes = self._attributes
+        start = len(attributes)
+        for escname, (_, value) in element.attributes.items():
+            attributes.append(self._intern(escname))
+            attributes.append(-1 if value is None
+                              else self._intern(value.escaped))
+        return self._append(parent, self._get_kind(element.__class__,
+                                                   element.tag),
+                            start, len(element.attributes))
+
+    def add_text(self, parent, text):
+        """
+        Add a text as the last child of the 'parent' node, escaped like the
+        texts of the parent's class, and return its index.
+        """
+        if not isinstance(text, _Text):
+            Escape = self._kinds[self._kind[parent]][1]._resolve_escapes()[4]
+            text = Escape(text)
+        return self._append(parent, self._get_kind(_TextNode, None),
+                            self._intern(text.escaped))
+
+    def add_element(self, parent, Element, *children, **attributes):
+        """
+        Add an element as the last child of the 'parent' node, and return its
+        index.
+
+        The arguments are the same as for instantiating the 'Element' class,
+        but the element object is discarded once it's added.
+        """
+        element = self._append_element(parent, Element(**attributes))
+        for child in children:
+            if isinstance(child, _Node):
+                self.add_node(element, child)
+            elif child is not None:
+                self.add_text(element, child)
+        return element
+
+    def add_node(self, parent, node):
+        """
+        Add a copy of the node and its descendants as the last child of the
+        'parent' node (-1 for the root), and return its index.
+        """
+        root = None
+        stack = [iter(((parent, node), ))]
+        while stack:
+            for parent, node in stack[-1]:
+                if isinstance(node, _TextNode):
+                    index = self._append(parent,
+                                         self._get_kind(_TextNode, None),
+                                         self._intern(node.text.escaped))
+                elif isinstance(node, _HTMLElement):
+                    index = self._append_element(parent, node)
+                elif isinstance(node, _ElementContainer):
+                    index = self._append(parent, self._get_kind(
+                        node.__class__, None), -1)
+                else:
+                    self._objects.append(node)
+                    index = self._append(parent, self._get_kind(
+                        node.__class__, None), len(self._objects) - 1)
+                if root is None:
+                    root = index
+                if isinstance(node, _ElementContainer):
+                    # Fragments are replaced by the nodes they generate
+                    stack.append(_with_parent(index, node._iter_children()))
+                    break
+            else:
+                stack.pop()
+        return root
+
+    def to_tree(self, index=ROOT):
+        """
+        Return the node at 'index' converted to an object tree.
+
+        The texts and attribute values are TextRaw objects of the escaped
+        strings.
+        """
+        nodes = {}
+        root = None
+        # The indexes of the descendants are always greater than their
+        # ancestors'
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            node = self._make_node(current)
+            parent = self._parent[current]
+            if current == index:
+                root = node
+            else:
+                nodes[parent].append_child(node)
+            if isinstance(node, _ElementContainer):
+                nodes[current] = node
+                children = []
+                child = self._first[current]
+                while child >= 0:
+                    children.append(child)
+                    child = self._next[child]
+                stack.extend(reversed(children))
+        return root
+
+    def _make_node(self, index):
+        type_, class_, tag = self._kinds[self._kind[index]]
+        data = self._data[index]
+        if type_ == _LEAF:
+            return self._objects[data]
+        if type_ == _TEXT:
+            return TextRaw(self._get_string(data))
+        # Bypass the constructors, whose arguments and defaults differ for
+        # each class
+        node = class_.__new__(class_)
+        if type_ == _VOID:
+            _Element.__init__(node)
+        else:
+            _ElementContainer.__init__(node)
+        if type_ != _PLAIN:
+            node.tag = tag
+            node.attributes = _AttributeDict()
+            attributes = self._attributes
+            for offset in range(data, data + 2 * self._count[index], 2):
+                name = self._get_string(attributes[offset])
+                value = attributes[offset + 1]
+                node.attributes[name] = (TextRaw(name), None if value < 0
+                                         else TextRaw(self._get_string(value)))
+        return node
+
+    def _scan(self, kinds):
+        # Return, for each node, 1 if its output contains a newline, plus 2 if
+        # its content (for containers) does
+        kind = self._kind
+        first = self._first
+        next_ = self._next
+        data = self._data
+        offsets = self._offsets
+        pool = self._pool
+        flags = bytearray(len(kind))
+        for index in range(len(kind) - 1, -1, -1):
+            type_, _, _, _, break_after, _, _ = kinds[kind[index]]
+            if type_ == _TEXT:
+                string = data[index]
+                flags[index] = pool.find(b'\n', offsets[string],
+                                         offsets[string + 1]) >= 0
+                continue
+            if type_ == _LEAF:
+                flags[index] = "\n" in self._objects[data[index]].compile()
+                continue
+            found = False
+            if type_ != _PLAIN:
+                attributes = self._attributes
+                for offset in range(data[index],
+                                    data[index] + 2 * self._count[index]):
+                    string = attributes[offset]
+                    if string >= 0 and pool.find(b'\n', offsets[string],
+                                                 offsets[string + 1]) >= 0:
+                        found = True
+                        break
+            if type_ == _VOID:
+                flags[index] = found
+                continue
+            content = False
+            child = first[index]
+            previous = -1
+            while child >= 0:
+                if flags[child] & 1 or (previous >= 0 and (
+                        kinds[kind[previous]][4] or
+                        kinds[kind[child]][3])):
+                    content = True
+                    break
+                previous = child
+                child = next_[child]
+            if type_ == _CONTAINER and first[index] >= 0 and (
+                    kinds[kind[first[index]]][3] or
+                    kinds[kind[self._last[index]]][4]):
+                found = True
+            flags[index] = (found or content) | (content << 1)
+        return flags
+
+    def _resolve_kinds(self):
+        # The formatting attributes are read from the classes when compiling,
+        # like for the objects
+        return [(type_, class_, tag, class_.BREAK_BEFORE, class_.BREAK_AFTER,
+                 getattr(class_, 'AUTOINDENT_MULTILINE', False),
+                 getattr(class_, 'INDENTATION', ''))
+                for type_, class_, tag in self._kinds]
+
+    def _compose_start_tag(self, index, tag, strings):
+        if not self._count[index]:
+            return tag
+        parts = [tag]
+        attributes = self._attributes
+        start = self._data[index]
+        for offset in range(start, start + 2 * self._count[index], 2):
+            name = attributes[offset]
+            value = attributes[offset + 1]
+            for string in (name, value):
+                if string >= 0 and string not in strings:
+                    strings[string] = self._get_string(string)
+            if value < 0:
+                parts.append(strings[name])
+            else:
+                parts.append('='.join((strings[name],
+                                       strings[value].join(('"', '"')))))
+        return ' '.join(parts)
+
+    def compile(self, indent=""):
+        """
+        Return the compiled tree, as the equivalent tree's compile().
+        """
+        return "".join(self.iter_compile(indent=indent))
+
+    def iter_compile(self, indent=""):
+        """
+        Yield the compiled tree in chunks, see compile().
+        """
+        kinds = self._resolve_kinds()
+        flags = self._scan(kinds)
+        kind = self._kind
+        first = self._first
+        last = self._last
+        next_ = self._next
+        # Only the indentation handles of _Renderer are used
+        renderer = _Renderer()
+        renderer._newlines = {0: "".join(("\n", indent))}
+        # The decoded attribute names and values
+        strings = {}
+
+        def open_node(index, handle):
+            # Return the start of the node's output, and the frame of its
+            # children, if any
+            type_, _, tag, _, _, autoindent, indentation = kinds[kind[index]]
+            if type_ == _TEXT:
+                return self._get_string(self._data[index]), None
+            if type_ == _LEAF:
+                return (self._objects[self._data[index]].compile(
+                    indent=renderer.newline(handle)[1:]), None)
+            if type_ == _VOID:
+                return (self._compose_start_tag(index, tag, strings).join(
+                    ('<', ' />')), None)
+            subindent = renderer.indent(handle, indentation)
+            if type_ == _PLAIN:
+                return "", [first[index], -1, subindent, ""]
+            start = self._compose_start_tag(index, tag, strings).join(
+                ('<', '>'))
+            end = tag.join(('</', '>'))
+            if autoindent and flags[index] & 2:
+                start = "".join((start, renderer.newline(subindent)))
+                end = "".join((renderer.newline(handle), end))
+            elif first[index] >= 0:
+                if kinds[kind[first[index]]][3]:
+                    start = "".join((start, renderer.newline(subindent)))
+                if kinds[kind[last[index]]][4]:
+                    end = "".join((renderer.newline(handle), end))
+            return start, [first[index], -1, subindent, end]
+
+        start, frame = open_node(self.ROOT, 0)
+        if start:
+            yield start
+        stack = [frame] if frame is not None else []
+        while stack:
+            frame = stack[-1]
+            child = frame[0]
+            if child < 0:
+                stack.pop()
+                if frame[3]:
+                    yield frame[3]
+                continue
+            previous = frame[1]
+            if previous >= 0 and (kinds[kind[previous]][4] or
+                                  kinds[kind[child]][3]):
+                yield renderer.newline(frame[2])
+            frame[0] = next_[child]
+            frame[1] = child
+            start, childframe = open_node(child, frame[2])
+            if start:
+                yield start
+            if childframe is not None:
+                stack.append(childframe)
+
+    def write(self, filename):
+        """
+        Write the compiled tree to a file (or file-like object) in chunks,
+        see compile().
+        """
+        if hasattr(filename, 'write'):
+            self._write_chunks(filename.write)
+        else:
+            with open(filename, 'w') as f:
+                self._write_chunks(f.write)
+
+    def _write_chunks(self, write):
+        buffer_ = []
+        size = 0
+        for chunk in self.iter_compile():
+            buffer_.append(chunk)
+            size += len(chunk)
+            if size >= dom.WRITE_BUFFER_SIZE:
+                write("".join(buffer_))
+                buffer_ = []
+                size = 0
+        if buffer_:
+            write("".join(buffer_))
+
+
+def _with_parent(parent, children):
+    for child in children:
+        yield parent, child
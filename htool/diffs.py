@@ -0,0 +1,243 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+from bisect import bisect_left
+
+from .dom import _ElementContainer, _Fragment, _HTMLElement, _TextNode
+from .index import _get_key
+
+INSERT = 'insert'
+REMOVE = 'remove'
+TEXT = 'text'
+ATTRIBUTE = 'attr'
+
+
+def diff(old, new, keys=()):
+    """
+    Return the list of the operations that turn the 'old' tree into 'new'.
+
+    The operations are lists, that can be serialized to JSON, and must be
+    applied in order:
+
+        ['insert', path, markup]: insert the node compiled (minified) as
+            'markup' at 'path'
+        ['remove', path]: remove the node at 'path'
+        ['text', path, markup]: replace the text of the text node at 'path'
+            with 'markup', which is escaped as in the compiled output
+        ['attr', path, name, value]: set the attribute of the element at
+            'path' to 'value', which is not escaped; a value of None removes
+            the attribute, and attributes without a value have a value of ''
+
+    Paths are lists of the indexes of the nodes in the 'children' lists of
+    the htool tree, starting from the root; the path of the root is []. They
+    are not paths in the DOM that a browser builds from the compiled output:
+    there, adjacent text nodes are merged, the indentation and newlines
+    added by the renderer are whitespace text nodes, ElementContainer nodes
+    don't exist and their children are the children of the parent element,
+    and a fragment is as many nodes as it generates. The operations are thus
+    meant to be applied to a copy of the htool tree, or to a client-side
+    tree that mirrors its children lists, not directly to the DOM.
+
+    The trees are walked without recursion, so they can be arbitrarily deep.
+
+    Elements are matched when they have the same tag, first at the start and
+    end of each children list, then in order; 'keys' can be a list of
+    attribute names (e.g. ['id', 'data-key']) whose values identify the
+    elements, so that e.g. a reordered or filtered list of items is patched
+    by only moving (i.e. removing and inserting) the items that don't keep
+    their relative order. The nodes that are not elements nor text (e.g.
+    comments) are replaced when their compiled output changes, while
+    fragments (e.g. RowSource or LazyChildren children) are replaced unless
+    they are the same object.
+    """
+    ops = []
+    keys = tuple(keys)
+    if not _match(old, new, keys):
+        _replace(new, [], ops)
+        return ops
+    # The iterators of the matched (old, new, path) nodes of each level; the
+    # operations of each node are appended before those of its next sibling
+    # in the new tree, as the operations of a children list depend on the
+    # indexes left by those of its previous nodes
+    stack = [iter(((old, new, []), ))]
+    while stack:
+        for oldnode, newnode, path in stack[-1]:
+            children = _diff_node(oldnode, newnode, path, keys, ops)
+            if children is not None:
+                stack.append(children)
+                break
+        else:
+            stack.pop()
+    return ops
+
+
+def _get_node_key(node, keys):
+    if keys and isinstance(node, _HTMLElement):
+        for name in keys:
+            value = _get_key(node, name)
+            if value is not None:
+                return (name, value)
+    return None
+
+
+def _match(old, new, keys):
+    # Whether 'old' can be updated to 'new' instead of being replaced
+    if old.__class__ is not new.__class__:
+        return False
+    if isinstance(old, _HTMLElement):
+        return (old.tag == new.tag and
+                _get_node_key(old, keys) == _get_node_key(new, keys))
+    return True
+
+
+def _replace(node, path, ops):
+    ops.append([REMOVE, path])
+    ops.append([INSERT, path, node.compile(minify=True)])
+
+
+def _diff_node(old, new, path, keys, ops):
+    # Return the iterator of the matched children to diff next, or None
+    if old is new:
+        return None
+    if isinstance(old, _HTMLElement):
+        _diff_attributes(old, new, path, ops)
+        if isinstance(old, _ElementContainer):
+            return _diff_children(old.children, new.children, path, keys,
+                                  ops)
+    elif isinstance(old, _TextNode):
+        if old.text.escaped != new.text.escaped:
+            ops.append([TEXT, path, new.text.escaped])
+    elif isinstance(old, _ElementContainer):
+        return _diff_children(old.children, new.children, path, keys, ops)
+    elif (isinstance(old, _Fragment) or
+            old.compile(minify=True) != new.compile(minify=True)):
+        _replace(new, path, ops)
+    return None
+
+
+def _diff_attributes(old, new, path, ops):
+    for name in new.attributes:
+        value = _get_key(new, name)
+        if value is None:
+            value = ''
+        if name not in old.attributes:
+            ops.append([ATTRIBUTE, path, name, value])
+        else:
+            oldvalue = _get_key(old, name)
+            if (oldvalue if oldvalue is not None else '') != value:
+                ops.append([ATTRIBUTE, path, name, value])
+    for name in old.attributes:
+        if name not in new.attributes:
+            ops.append([ATTRIBUTE, path, name, None])
+
+
+def _diff_children(old, new, path, keys, ops):
+    pairs = _pair_children(old, new, keys)
+    # First remove the old nodes without a match, from the last one, so that
+    # the indexes of the others don't change; the kept nodes are then already
+    # in the new order, and the new nodes can be inserted from the first one
+    kept = set(oldindex for oldindex, _ in pairs)
+    for index in range(len(old) - 1, -1, -1):
+        if index not in kept:
+            ops.append([REMOVE, path + [index]])
+    matches = dict((newindex, oldindex) for oldindex, newindex in pairs)
+    return _iter_matched_children(old, new, path, matches, ops)
+
+
+def _iter_matched_children(old, new, path, matches, ops):
+    # Insert the new nodes without a match as they're reached, i.e. after the
+    # operations of the previous matched nodes' subtrees
+    for index, node in enumerate(new):
+        oldindex = matches.get(index)
+        if oldindex is None:
+            ops.append([INSERT, path + [index], node.compile(minify=True)])
+        else:
+            yield (old[oldindex], node, path + [index])
+
+
+def _pair_children(old, new, keys):
+    # Return the (old index, new index) pairs of the matched children, in
+    # increasing order of both indexes
+    length = min(len(old), len(new))
+    start = 0
+    while start < length and _match(old[start], new[start], keys):
+        start += 1
+    end = 0
+    while (end < length - start and
+           _match(old[-1 - end], new[-1 - end], keys)):
+        end += 1
+    pairs = [(index, index) for index in range(start)]
+    # The keyed old nodes are matched by key, the others in order
+    keyed = {}
+    unkeyed = []
+    for index in range(start, len(old) - end):
+        key = _get_node_key(old[index], keys)
+        if key is None:
+            unkeyed.append(index)
+        else:
+            keyed.setdefault(key, index)
+    candidates = []
+    position = 0
+    for newindex in range(start, len(new) - end):
+        node = new[newindex]
+        key = _get_node_key(node, keys)
+        if key is not None:
+            index = keyed.pop(key, None)
+            if index is not None and _match(old[index], node, keys):
+                candidates.append((index, newindex))
+            continue
+        while position < len(unkeyed):
+            index = unkeyed[position]
+            position += 1
+            if _match(old[index], node, keys):
+                candidates.append((index, newindex))
+                break
+    pairs.extend(_increasing_pairs(candidates))
+    pairs.extend((len(old) - end + offset, len(new) - end + offset)
+                 for offset in range(end))
+    return pairs
+
+
+def _increasing_pairs(candidates):
+    # Return the longest subsequence of the pairs whose old indexes are
+    # increasing (the new indexes already are), in O(n log n)
+    tails = []
+    tailindexes = []
+    previous = []
+    for position, (oldindex, _) in enumerate(candidates):
+        slot = bisect_left(tails, oldindex)
+        previous.append(tailindexes[slot - 1] if slot else None)
+        if slot == len(tails):
+            tails.append(oldindex)
+            tailindexes.append(position)
+        else:
+            tails[slot] = oldindex
+            tailindexes[slot] = position
+    result = []
+    position = tailindexes[-1] if tailindexes else None
+    while position is not None:
+        result.append(candidates[position])
+        position = previous[position]
+    return result[::-1]
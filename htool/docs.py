@@ -28,11 +28,15 @@ from .misc import Doctype, ElementContainer
 
 
 class Document(ElementContainer):
+    __slots__ = ()
+
     def __init__(self, html, doctype=None):
         super(Document, self).__init__(doctype or Doctype(), html)
 
 
 class SimpleDocument(Document):
+    __slots__ = ()
+
     def __init__(self, title, description, *body_elements, **kwargs):
         # Python 2 must be supported, so the following definition can't be
         # used...
@@ -23,22 +23,351 @@ from __future__ import (absolute_import, division,
 # Support Python 2.6
 # from builtins import *
 
+import codecs
+import itertools
+import os
+import sys
 from collections import OrderedDict
 
-from .text import _Text, TextEscaped
+from .text import _STRING_TYPES, _Text, CacheInfo, TextEscaped
 
 # TODO: Document that the _Text classes to be used can be also set by
 #       overriding the global 'DEFAULT_ESCAPE_*' module attributes, or for each
 #       object by setting its 'DEFAULT_ESCAPE_*' attributes
+#       For example, set DEFAULT_ESCAPE to text.TextEscapedCached to memoize
+#       the escaped strings
 DEFAULT_ESCAPE = None
 DEFAULT_ESCAPE_TEXT = None
 DEFAULT_ESCAPE_ATTR_NAME = None
 DEFAULT_ESCAPE_ATTR_VALUE = None
+# Approximate number of characters buffered by _Node.write() between writes
+WRITE_BUFFER_SIZE = 64 * 1024
+# If True, containers cache their compiled output, which is reused by the
+# next compilations until the container or any of its descendants is
+# modified through the methods of the element classes; the cached output of
+# a container references the cached outputs of its children, so each
+# character is stored only once; note that the containers with descendants
+# that are not CACHEABLE (e.g. TextFile, LazyChildren or Slot nodes) are
+# compiled again each time
+RENDER_CACHE = False
+# Maximum number of characters stored in the render caches of all the trees:
+# when reached, no more outputs are cached until some are released, i.e.
+# their containers are modified or deleted
+RENDER_CACHE_SIZE = 16 * 1024 * 1024
+# Whether any output was ever cached, i.e. whether modifying an element
+# requires invalidating the caches of its ancestors
+_render_cache_used = False
+# Hits and misses of the render cache
+_render_cache_stats = [0, 0]
+# Number of characters currently stored in the render caches
+_render_cache_size = [0]
+# The integer keys of the indentation strings, by the key of the parent
+# indentation (None for the base indentation) and the string added to it, see
+# _Renderer._cache_key()
+_INDENT_KEYS = {}
+_indent_key_counter = itertools.count()
+# The containers with a shorter output are only cached as part of their
+# ancestors' outputs, unless they're the outermost cached container
+_CACHE_MIN_LENGTH = 512
+# Maximum number of the nodes generated by a _Fragment that are kept while
+# looking ahead for line breaks: if the fragment generates more nodes, and
+# the formatting of its parent depends on them, ValueError is raised, see
+# _Fragment._scan_nodes()
+FRAGMENT_SCAN_SIZE = 1000
+# Whether any container was ever indexed, i.e. whether modifying an element
+# requires updating the indexes of its ancestors, see
+# _ElementContainer.enable_index()
+_index_used = False
+
+# Maximum number of attribute names and call signatures whose normalization
+# is memoized by _HTMLElement.__init__()
+_ATTRIBUTE_CACHE_SIZE = 4096
+_NORMALIZED_ATTRIBUTE_NAMES = {}
+_ATTRIBUTE_PLANS = {}
+# The pickled slots of each node class, see _get_pickled_slots()
+_PICKLED_SLOTS = {}
+
+# Plain dictionaries preserve the insertion order since Python 3.7, and they
+# are much smaller than OrderedDict objects
+if sys.version_info >= (3, 7):
+    _AttributeDict = dict
+else:
+    _AttributeDict = OrderedDict
+
+
+def _normalize_attribute_name(name):
+    try:
+        return _NORMALIZED_ATTRIBUTE_NAMES[name]
+    except KeyError:
+        # If an attribute ends with an underscore, the underscore is removed
+        # and the rest of the attribute name is used as is; this is useful for
+        # example with 'class' and 'for', which are common HTML attributes but
+        # also reserved Python keywords
+        # If in need to keep the final underscore, just double it, e.g.
+        # attr__="value"
+        if name.endswith("_"):
+            normalized = name[:-1]
+        # Else all underscores are changed into dashes, and the attribute name
+        # is converted to lowercase; this is useful for example with 'class'
+        # and 'for' (use Class="value", For="value"...) and the 'data-*'
+        # attributes
+        else:
+            normalized = name.replace("_", "-").lower()
+        if len(_NORMALIZED_ATTRIBUTE_NAMES) < _ATTRIBUTE_CACHE_SIZE:
+            _NORMALIZED_ATTRIBUTE_NAMES[name] = normalized
+        return normalized
+
+
+def _plan_attributes(keys, NameEscape):
+    # Return how the keyword arguments of _HTMLElement.__init__() are set as
+    # attributes: a tuple of (escaped_name, keyword) pairs sorted by attribute
+    # name, the keyword whose value is used for the 'class' attribute (or
+    # None), and the escaped 'class' attribute name; the plan only depends on
+    # the keyword names, their order and the class escaping the names, so it's
+    # memoized for each call signature
+    try:
+        return _ATTRIBUTE_PLANS[(NameEscape, keys)]
+    except KeyError:
+        pass
+    # Map the final attribute names to the original keywords
+    attributes = OrderedDict((key, key) for key in keys)
+    for key in keys:
+        # If an attribute is passed both with and without a trailing
+        # underscore, or if the "dashed" attribute name already exists, leave
+        # the two as they are
+        name = _normalize_attribute_name(key)
+        if name not in attributes:
+            attributes[name] = attributes.pop(key)
+    # 'attributes' may be still an unordered dict here, i.e. adding it
+    # unsorted would make the key order variable from one run to the other
+    # The escaped names can be shared by all the elements, since _Text
+    # objects are never modified
+    plan = (tuple((NameEscape(name), key)
+                  for name, key in sorted(attributes.items())),
+            attributes.get('class'),
+            NameEscape('class').escaped)
+    if len(_ATTRIBUTE_PLANS) < _ATTRIBUTE_CACHE_SIZE:
+        _ATTRIBUTE_PLANS[(NameEscape, keys)] = plan
+    return plan
+
+
+def _get_pickled_slots(cls):
+    # Return the names of the slots of 'cls' that are pickled, and of those
+    # that are reset to None when unpickling (see _Node.__getstate__())
+    try:
+        return _PICKLED_SLOTS[cls]
+    except KeyError:
+        pass
+    names = []
+    transient = []
+    for class_ in reversed(cls.__mro__):
+        slots = class_.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots, )
+        names.extend(name for name in slots
+                     if name not in ('__dict__', '__weakref__'))
+        transient.extend(class_.__dict__.get('_TRANSIENT_SLOTS', ()))
+    layout = (tuple(name for name in names if name not in transient),
+              tuple(transient))
+    _PICKLED_SLOTS[cls] = layout
+    return layout
+
+
+def render_cache_info():
+    """
+    Return the hits and misses of the render cache (see RENDER_CACHE).
+    """
+    return CacheInfo(_render_cache_stats[0], _render_cache_stats[1], None,
+                     None)
+
+
+def reset_render_cache_info():
+    _render_cache_stats[0] = 0
+    _render_cache_stats[1] = 0
+
+
+def _get_indent_key(parent, indentation):
+    # next() and setdefault() are atomic, so the keys are unique also when
+    # multiple threads compile
+    key = (parent, indentation)
+    try:
+        return _INDENT_KEYS[key]
+    except KeyError:
+        return _INDENT_KEYS.setdefault(key, next(_indent_key_counter))
+
+
+class _CachedOutput(object):
+    # The cached output of a container (see RENDER_CACHE): a list of strings
+    # and of the _CachedOutput objects of its descendants, i.e. a rope
+    __slots__ = ('parts', 'length', 'size')
+
+    def __init__(self, items):
+        # Join the consecutive strings
+        parts = []
+        strings = []
+        length = size = 0
+        for item in items:
+            if item.__class__ is _CachedOutput:
+                if strings:
+                    parts.append("".join(strings))
+                    strings = []
+                parts.append(item)
+                length += item.length
+            else:
+                strings.append(item)
+                size += len(item)
+        if strings:
+            parts.append("".join(strings))
+        self.parts = parts
+        # The length of the whole output, and the number of characters stored
+        # in this object
+        self.length = length + size
+        self.size = size
+        _render_cache_size[0] += size
+
+    def __del__(self):
+        _render_cache_size[0] -= self.size
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        # Yield the strings of the output, without recursion
+        stack = [iter(self.parts)]
+        while stack:
+            for part in stack[-1]:
+                if part.__class__ is _CachedOutput:
+                    stack.append(iter(part.parts))
+                    break
+                yield part
+            else:
+                stack.pop()
+
+
+# The ids of the nodes whose overridden compile() is running, see _NodeType
+_legacy_compiling = set()
+# The class attributes that determine the escape policy of the elements, see
+# _Element._resolve_escapes()
+_ESCAPE_ATTRIBUTES = frozenset(('DEFAULT_ESCAPE', 'DEFAULT_ESCAPE_TEXT',
+                                'DEFAULT_ESCAPE_ATTR_NAME',
+                                'DEFAULT_ESCAPE_ATTR_VALUE'))
+
+
+def _make_escape_policy(source):
+    # Return a tuple of the module attributes, the resolved escape classes for
+    # the text, the attribute names and the attribute values, and whether the
+    # instances may have DEFAULT_ESCAPE* attributes of their own; 'source' is
+    # the class, or an instance that overrides its class's attributes
+    # TODO: Test this "inheritance" system again, since it was reorganized
+    #       with the _Text classes
+    return (DEFAULT_ESCAPE,
+            DEFAULT_ESCAPE_TEXT,
+            DEFAULT_ESCAPE_ATTR_NAME,
+            DEFAULT_ESCAPE_ATTR_VALUE,
+            (source.DEFAULT_ESCAPE_TEXT or
+             source.DEFAULT_ESCAPE or
+             DEFAULT_ESCAPE_TEXT or
+             DEFAULT_ESCAPE or
+             TextEscaped),
+            (source.DEFAULT_ESCAPE_ATTR_NAME or
+             source.DEFAULT_ESCAPE or
+             DEFAULT_ESCAPE_ATTR_NAME or
+             DEFAULT_ESCAPE or
+             TextEscaped),
+            (source.DEFAULT_ESCAPE_ATTR_VALUE or
+             source.DEFAULT_ESCAPE or
+             DEFAULT_ESCAPE_ATTR_VALUE or
+             DEFAULT_ESCAPE or
+             TextEscaped),
+            # Whether the instances have a __dict__
+            bool(getattr(source, '__dictoffset__', 0)))
+
+
+class _NodeType(type):
+    # Resolve the escape policy of the element classes when they are created,
+    # and again when their DEFAULT_ESCAPE* attributes are set
+    # Also, node subclasses used to customize their output by overriding
+    # compile(), but the renderer only calls _render(): the classes that
+    # override compile() without defining _render() are rendered with the
+    # output of their compile(); when that calls the inherited compile(), e.g.
+    # through super(), the node is rendered with the inherited _render()
+    # instead
+    def __init__(cls, name, bases, namespace):
+        super(_NodeType, cls).__init__(name, bases, namespace)
+        if ('compile' in namespace and '_render' not in namespace and
+                hasattr(cls, '_render')):
+            cls._render = _make_legacy_render(cls._render)
+            cls._scan_newline = _make_legacy_scan(cls._scan_newline)
+            # The output may depend on anything the override reads
+            if 'CACHEABLE' not in namespace:
+                cls.CACHEABLE = False
+        if hasattr(cls, '_resolve_escapes'):
+            cls._escape_policy = _make_escape_policy(cls)
+
+    def __setattr__(cls, name, value):
+        super(_NodeType, cls).__setattr__(name, value)
+        if name in _ESCAPE_ATTRIBUTES:
+            cls._update_escape_policies()
+
+    def __delattr__(cls, name):
+        super(_NodeType, cls).__delattr__(name)
+        if name in _ESCAPE_ATTRIBUTES:
+            cls._update_escape_policies()
+
+    def _update_escape_policies(cls):
+        # Resolve the escape policies of the class and of its subclasses again
+        stack = [cls]
+        while stack:
+            class_ = stack.pop()
+            if hasattr(class_, '_resolve_escapes'):
+                class_._escape_policy = _make_escape_policy(class_)
+            stack.extend(class_.__subclasses__())
+
+
+def _make_legacy_render(render):
+    def _render(self, renderer, indent):
+        if id(self) in _legacy_compiling:
+            return render(self, renderer, indent)
+        _legacy_compiling.add(id(self))
+        try:
+            return (self.compile(indent=renderer.newline(indent)[1:]), )
+        finally:
+            _legacy_compiling.discard(id(self))
+    return _render
+
+
+def _make_legacy_scan(scan_newline):
+    def _scan_newline(self, renderer):
+        if id(self) in _legacy_compiling:
+            return scan_newline(self, renderer)
+        return ("\n" in self.compile(), None)
+    return _scan_newline
 
 
-class _Node(object):
+# Python 2 and 3 have incompatible syntaxes for metaclasses
+_NodeBase = _NodeType(str('_NodeBase'), (object, ), {'__slots__': ()})
+
+
+class _Node(_NodeBase):
+    # Nodes define __slots__ to keep large trees compact; subclasses that don't
+    # define them get an instance __dict__ as usual; nodes can still be
+    # referenced weakly
+    __slots__ = ('parent_element', '__weakref__')
+    # The slots that are not pickled, see __getstate__()
+    _TRANSIENT_SLOTS = ('parent_element', )
     BREAK_BEFORE = False
     BREAK_AFTER = False
+    # If True, the node and its descendants are formatted as usual also in
+    # minified output, since their whitespace is part of the content
+    PRESERVE_WHITESPACE = False
+    # If False, the output of the node depends on something else than the
+    # tree (e.g. a file or an iterator), so its ancestors' output is never
+    # cached, see RENDER_CACHE
+    CACHEABLE = True
+    # If True, the texts of the children are raw text, where character
+    # references are not decoded (e.g. in script and style elements), see
+    # _Renderer.check_raw_text()
+    RAW_TEXT = False
 
     def __init__(self):
         # parent_element is modified directly, it isn't set with an __init__
@@ -48,26 +377,251 @@ class _Node(object):
         #      more different parent element objects?
         self.parent_element = None
 
-    def compile(self, indent=""):
+    def __getstate__(self):
+        # The parent is not pickled, otherwise pickling a subtree would also
+        # pickle the rest of the tree; the containers restore their children's
+        # links when they are unpickled
+        # Caches are not pickled either, see _TRANSIENT_SLOTS
+        names = _get_pickled_slots(self.__class__)[0]
+        return (tuple(getattr(self, name, None) for name in names),
+                getattr(self, '__dict__', None))
+
+    def __setstate__(self, state):
+        values, dict_ = state
+        names, transient = _get_pickled_slots(self.__class__)
+        for name, value in zip(names, values):
+            setattr(self, name, value)
+        for name in transient:
+            setattr(self, name, None)
+        if dict_:
+            self.__dict__.update(dict_)
+
+    def compile(self, indent="", workers=None, minify=False):
+        """
+        Return the compiled node.
+
+        If 'workers' is not None, the large subtrees are compiled in a pool
+        of at most that many processes, see parallel.render_parallel().
+
+        If 'minify' is True, the line breaks and the indentation between the
+        nodes are omitted, except inside the PRESERVE_WHITESPACE elements
+        (e.g. Pre and Textarea); the whitespace in the texts is kept.
+        """
+        if workers is not None:
+            from .parallel import render_parallel
+            return render_parallel(self, indent=indent, workers=workers,
+                                   minify=minify)
+        return "".join(self.iter_compile(indent=indent, minify=minify))
+
+    def iter_compile(self, indent="", minify=False):
+        """
+        Yield the compiled node in chunks, in document order.
+
+        Joining the chunks gives exactly the output of compile().
+        """
+        return _make_renderer(minify).iter_compile(self, indent=indent)
+
+    def compile_bytes(self, indent="", encoding='utf-8', target=None,
+                      minify=False):
+        """
+        Return the compiled node encoded as bytes.
+
+        Only the characters that are significant in HTML are escaped, and the
+        characters that 'encoding' can't represent are replaced with
+        character references by the encoder, so e.g. with UTF-8 non-ASCII
+        texts don't grow into references as in compile()'s output (_Text
+        subclasses that only define 'escaped' are output as usual). The
+        output is encoded incrementally, so e.g. UTF-16 output only starts
+        with one byte order mark.
+
+        Character references are not decoded in raw text, i.e. in the
+        RAW_TEXT elements (Script and Style) and in comments, so
+        UnicodeEncodeError is raised if their text has characters that
+        'encoding' can't represent.
+
+        If 'target' is given, e.g. a bytearray or a BytesIO object, the
+        output is appended to it (with its extend() or write() method) and
+        the target is returned.
+        """
+        if target is None:
+            output = bytearray()
+            self._write_chunks(output.extend, minify, encoding, indent)
+            return bytes(output)
+        write = target.extend if hasattr(target, 'extend') else target.write
+        self._write_chunks(write, minify, encoding, indent)
+        return target
+
+    def aiter_compile(self, indent=""):
+        """
+        Return an asynchronous iterator of the compiled node's chunks.
+
+        Awaitable and asynchronous iterable children are only resolved when
+        the compilation reaches their parent, and the output compiled until
+        then is yielded first; they are then replaced in the tree with the
+        nodes they resolve to. Requires Python 3.6.
+        """
+        from .aio import aiter_compile
+        return aiter_compile(self, indent=indent)
+
+    def _render(self, renderer, indent):
+        # Return an iterable of output chunks (strings) and of
+        # (child_node, child_indent) tuples, which are rendered in place by
+        # _Renderer; nodes must never render their children directly, or the
+        # renderer could not avoid recursion
+        # 'indent' is an opaque handle: use renderer.indent() to derive the
+        # children's indentation, and renderer.newline() to break a line
         raise NotImplementedError()
 
-    def write(self, filename):
-        with open(filename, 'w') as f:
-            f.write(self.compile())
+    def _scan_newline(self, renderer):
+        # Tell if the compiled node would contain a newline, without compiling
+        # it; this is needed by _HTMLContainerElement._render() to decide the
+        # formatting of its start tag before streaming its content
+        # Return a (found, nodes) tuple: if 'found' is False, the node contains
+        # a newline only if any of 'nodes' (if not None) does
+        return ("\n" in self.compile(), None)
+
+    def write(self, filename, minify=False, encoding=None):
+        """
+        Write the compiled node to a file.
+
+        'filename' can also be an already open file-like object; the output is
+        streamed in chunks, so that the whole document is never kept in
+        memory. See compile() for 'minify'.
+
+        If 'encoding' is None the output of compile() is written, in text
+        mode; otherwise the output of compile_bytes() is written, in binary
+        mode.
+        """
+        if hasattr(filename, 'write'):
+            self._write_chunks(filename.write, minify, encoding,
+                               stream=filename)
+        else:
+            with open(filename, 'w' if encoding is None else 'wb') as f:
+                self._write_chunks(f.write, minify, encoding, stream=f)
+
+    def _invalidate_render_cache(self):
+        # Only the ancestors that are containers have a cache
+        node = self
+        while node is not None:
+            if isinstance(node, _ElementContainer):
+                node._render_cache = None
+            node = node.parent_element
+
+    def _get_indexes(self):
+        # Return the indexes of the node itself and of its ancestors; the slot
+        # may not be set yet while a container is being initialized
+        indexes = []
+        node = self
+        while node is not None:
+            index = getattr(node, '_index', None)
+            if index is not None:
+                indexes.append(index)
+            node = node.parent_element
+        return indexes
+
+    def _write_chunks(self, write, minify=False, encoding=None, indent="",
+                      stream=None):
+        # Compiled chunks are usually tiny (a tag, a newline, an indentation),
+        # so group them before writing (and encoding) them
+        renderer = _make_renderer(minify, encoding)
+        fd = None
+        if (stream is not None and encoding is not None and
+                hasattr(os, 'sendfile')):
+            try:
+                fd = stream.fileno()
+            except (AttributeError, ValueError, IOError, OSError):
+                # E.g. io.UnsupportedOperation for BytesIO objects
+                pass
+            else:
+                renderer.splice_encoding = encoding
+        if encoding is None:
+            encode = None
+        else:
+            # Some encodings write a byte order mark or keep a state, so the
+            # buffers must not be encoded separately
+            encode = codecs.getincrementalencoder(encoding)(
+                'xmlcharrefreplace').encode
+        buffer_ = []
+        size = 0
+        for chunk in renderer.iter_compile(self, indent=indent):
+            if chunk.__class__ is _FileRegion:
+                # The file's bytes are copied as they are, so reset the
+                # encoder's state first
+                self._write_buffer(write, buffer_, encode, True)
+                buffer_ = []
+                size = 0
+                stream.flush()
+                chunk.copy(fd)
+                continue
+            buffer_.append(chunk)
+            size += len(chunk)
+            if size >= WRITE_BUFFER_SIZE:
+                self._write_buffer(write, buffer_, encode)
+                buffer_ = []
+                size = 0
+        if buffer_ or encode is not None:
+            self._write_buffer(write, buffer_, encode, True)
+
+    @staticmethod
+    def _write_buffer(write, buffer_, encode, final=False):
+        if encode is None:
+            write("".join(buffer_))
+        else:
+            encoded = encode("".join(buffer_), final)
+            if encoded:
+                write(encoded)
 
 
 class _TextNode(_Node):
+    __slots__ = ('text', )
+
     def __init__(self, parent_element, text):
         super(_TextNode, self).__init__()
         self.parent_element = parent_element
         self.text = text if isinstance(
             text, _Text) else self.parent_element.DefaultContentEscape(text)
 
-    def compile(self, indent=""):
-        return self.text.escaped
+    def _render(self, renderer, indent):
+        if renderer.UNICODE:
+            if self.parent_element.RAW_TEXT:
+                return (renderer.check_raw_text(self.text.escaped_unicode), )
+            return (self.text.escaped_unicode, )
+        return (self.text.escaped, )
+
+    def _scan_newline(self, renderer):
+        return ("\n" in self.text.escaped, None)
+
+
+class _FileRegion(object):
+    # A file whose bytes are copied as they are to the output file descriptor
+    # by _Node._write_chunks(), see _Renderer.splice_encoding
+    __slots__ = ('filename', 'size')
+
+    def __init__(self, filename, size):
+        self.filename = filename
+        self.size = size
+
+    def copy(self, fd):
+        with open(self.filename, 'rb') as f:
+            offset = 0
+            while offset < self.size:
+                # The data is copied by the kernel, without reading it here
+                sent = os.sendfile(fd, f.fileno(), offset, self.size - offset)
+                if not sent:
+                    # The file was truncated
+                    break
+                offset += sent
 
 
 class _Element(_Node):
+    # The escape classes are per-instance slots, so that they can be
+    # overridden for each object, as in
+    # element.DefaultContentEscape = TextRaw
+    __slots__ = ('DefaultContentEscape', 'DefaultAttributeNameEscape',
+                 'DefaultAttributeValueEscape')
+    # They are resolved again from the class when unpickling, see
+    # __getstate__()
+    _TRANSIENT_SLOTS = __slots__
     # TODO: Document that when the class attributes are overridden, also a
     #       'self' argument must be accepted; when overriding the global
     #       attributes, or monkey-patching the self.escape_* object attributes,
@@ -79,29 +633,69 @@ class _Element(_Node):
     DEFAULT_ESCAPE_TEXT = None
     DEFAULT_ESCAPE_ATTR_NAME = None
     DEFAULT_ESCAPE_ATTR_VALUE = None
+    # The policy resolved from the class attributes, see _resolve_escapes()
+    _escape_policy = None
 
     def __init__(self):
         super(_Element, self).__init__()
-        # TODO: Test this "inheritance" system again, since it was reorganized
-        #       with the _Text classes
-        self.DefaultContentEscape = (self.DEFAULT_ESCAPE_TEXT or
-                                     self.DEFAULT_ESCAPE or
-                                     DEFAULT_ESCAPE_TEXT or
-                                     DEFAULT_ESCAPE or
-                                     TextEscaped)
-        self.DefaultAttributeNameEscape = (self.DEFAULT_ESCAPE_ATTR_NAME or
-                                           self.DEFAULT_ESCAPE or
-                                           DEFAULT_ESCAPE_ATTR_NAME or
-                                           DEFAULT_ESCAPE or
-                                           TextEscaped)
-        self.DefaultAttributeValueEscape = (self.DEFAULT_ESCAPE_ATTR_VALUE or
-                                            self.DEFAULT_ESCAPE or
-                                            DEFAULT_ESCAPE_ATTR_VALUE or
-                                            DEFAULT_ESCAPE or
-                                            TextEscaped)
+        policy = self._escape_policy
+        if (policy[0] is not DEFAULT_ESCAPE or
+                policy[1] is not DEFAULT_ESCAPE_TEXT or
+                policy[2] is not DEFAULT_ESCAPE_ATTR_NAME or
+                policy[3] is not DEFAULT_ESCAPE_ATTR_VALUE):
+            policy = self._resolve_escapes()
+        # Subclasses without __slots__ can also set the DEFAULT_ESCAPE*
+        # attributes on the instance before calling this
+        if policy[7] and _ESCAPE_ATTRIBUTES.intersection(self.__dict__):
+            policy = _make_escape_policy(self)
+        (self.DefaultContentEscape,
+         self.DefaultAttributeNameEscape,
+         self.DefaultAttributeValueEscape) = policy[4:7]
+
+    def __getstate__(self):
+        # Only the escape classes that differ from the class's are pickled
+        values, dict_ = super(_Element, self).__getstate__()
+        policy = self._resolve_escapes()
+        overrides = tuple(None if escape is default else escape
+                          for escape, default in zip(
+                              (self.DefaultContentEscape,
+                               self.DefaultAttributeNameEscape,
+                               self.DefaultAttributeValueEscape),
+                              policy[4:7]))
+        if any(overrides):
+            return (values, dict_, overrides)
+        return (values, dict_)
+
+    def __setstate__(self, state):
+        super(_Element, self).__setstate__(state[:2])
+        policy = self._resolve_escapes()
+        overrides = state[2] if len(state) > 2 else (None, None, None)
+        self.DefaultContentEscape = overrides[0] or policy[4]
+        self.DefaultAttributeNameEscape = overrides[1] or policy[5]
+        self.DefaultAttributeValueEscape = overrides[2] or policy[6]
+
+    @classmethod
+    def _resolve_escapes(cls):
+        # The escape classes only depend on the class and on the module
+        # attributes, so they are resolved when the class is created, again
+        # when its (or its bases') DEFAULT_ESCAPE* attributes are set, see
+        # _NodeType.__setattr__(), and when the module attributes differ from
+        # the ones the policy was resolved with
+        policy = cls._escape_policy
+        if (policy is None or
+                policy[0] is not DEFAULT_ESCAPE or
+                policy[1] is not DEFAULT_ESCAPE_TEXT or
+                policy[2] is not DEFAULT_ESCAPE_ATTR_NAME or
+                policy[3] is not DEFAULT_ESCAPE_ATTR_VALUE):
+            policy = cls._escape_policy = _make_escape_policy(cls)
+        return policy
 
 
 class _HTMLElement(_Element):
+    # 'tag' and 'attributes' are added to __slots__ by the concrete
+    # subclasses, otherwise _HTMLContainerElement could not also inherit from
+    # _ElementContainer
+    __slots__ = ()
     TAG = None
     # Note that the structure of ATTRIBUTES is different from self.attributes
     # TODO: Document that these attributes are normally escaped
@@ -113,7 +707,7 @@ class _HTMLElement(_Element):
         # TODO: Document that duplicate attribute names are not supported
         #       (i.e. setting an attribute with a certain name always
         #       overwrites if the name already exists)
-        self.attributes = OrderedDict()
+        self.attributes = _AttributeDict()
         # Don't use self.set_attributes because that's re-sorting the keys
         for name, value in self.ATTRIBUTES.items():
             self.set_attribute(name, value)
@@ -125,34 +719,27 @@ class _HTMLElement(_Element):
         # Tag(**{'-attr-foo_bar-': 'value'})
         # 'classes' is a special attribute (this can be overridden by passing
         # classes_="value", Classes="value", **{"classes_": "value"}, etc.)
-        # Note that 'classes' can't be a tuple, it must be a list!
-        classnames = attributes.pop('classes', [])
-        for attrname, attrval in tuple(attributes.items()):
-            # If an attribute ends with an underscore, the underscore is
-            # removed and the rest of the attribute name is used as is; this is
-            # useful for example with 'class' and 'for', which are common HTML
-            # attributes but also reserved Python keywords; if an attribute is
-            # passed both with and without a trailing underscore, the two are
-            # left as they are
-            # If in need to keep the final underscore, just double it, e.g.
-            # attr__="value"
-            if attrname.endswith("_"):
-                attrname_ = attrname[:-1]
-                if attrname_ not in attributes:
-                    attributes[attrname_] = attributes.pop(attrname)
-            # Else all underscores are changed into dashes, and the attribute
-            # name is converted to lowercase; this is useful for example with
-            # 'class' and 'for' (use Class="value", For="value"...) and the
-            # 'data-*' attributes; if however the "dashed" attribute name
-            # already exists, leave the two as they are
-            else:
-                attrname_ = attrname.replace("_", "-").lower()
-                if attrname_ not in attributes:
-                    attributes[attrname_] = attributes.pop(attrname)
-        classnames.extend(attributes.get('class', '').split())
-        self.add_classes(*classnames)
-
-        self.set_attributes(**attributes)
+        # See _plan_attributes() for how the other attribute names are
+        # normalized
+        classnames = attributes.pop('classes', ())
+        if attributes:
+            names, classkey, classname = _plan_attributes(
+                tuple(attributes), self.DefaultAttributeNameEscape)
+        else:
+            names, classkey = (), None
+        if classkey is not None:
+            # The value of the 'class' keyword overwrites the classes merged
+            # by add_classes() when all the attributes are set below, so
+            # add_classes() would only determine the position of the
+            # attribute, if it added any class
+            if classnames or attributes[classkey].split():
+                self.attributes.setdefault(classname, None)
+        # Also the classes from ATTRIBUTES are normalized by add_classes()
+        elif classnames or 'class' in self.attributes:
+            self.add_classes(*classnames)
+        # The plan is already sorted like set_attributes() would do
+        for name, key in names:
+            self.set_attribute(name, attributes[key])
 
     @classmethod
     def join(cls, *elements, **attributes):
@@ -192,7 +779,16 @@ class _HTMLElement(_Element):
         # TODO: Document this
         if value is not None and not isinstance(value, _Text):
             value = self.DefaultAttributeValueEscape(value)
+        indexes = ()
+        if _index_used and name.escaped in ('id', 'class'):
+            indexes = self._get_indexes()
+            for index in indexes:
+                index.remove_element(self)
         self.attributes[name.escaped] = (name, value)
+        for index in indexes:
+            index.add_element(self)
+        if _render_cache_used:
+            self._invalidate_render_cache()
 
     def set_attributes(self, **attributes):
         # 'attributes' is still an unordered dict here, i.e. adding it unsorted
@@ -222,80 +818,371 @@ class _HTMLElement(_Element):
         if classes:
             self.set_attribute('class', ' '.join(classes))
 
-    def _compose_start_tag(self):
+    def _compose_start_tag(self, unicode=False):
         if self.attributes:
-            attributes = ''
+            attributes = [self.tag]
             for escname, (name, value) in self.attributes.items():
                 if value is None:
-                    attribute = escname
+                    escvalue = None
+                elif unicode:
+                    escvalue = value.escaped_unicode
+                else:
+                    escvalue = value.escaped
+                if unicode:
+                    # See _Text.escaped_unicode
+                    escname = name.escaped_unicode
+                if escvalue is None:
+                    attributes.append(escname)
                 else:
-                    escvalue = value.escaped.join(('"', '"'))
-                    attribute = '='.join((escname, escvalue))
-                attributes = ' '.join((attributes, attribute))
-            return ''.join((self.tag, attributes))
+                    attributes.append('='.join((escname,
+                                                escvalue.join(('"', '"')))))
+            return ' '.join(attributes)
         else:
             return self.tag
 
 
 class _HTMLVoidElement(_HTMLElement):
-    def compile(self, indent=""):
-        return self._compose_start_tag().join(('<', ' />'))
+    __slots__ = ('tag', 'attributes')
+
+    def _render(self, renderer, indent):
+        return (self._compose_start_tag(renderer.UNICODE).join(('<', ' />')),
+                )
+
+    def _scan_newline(self, renderer):
+        return ("\n" in self._compose_start_tag(), None)
 
 
 class _ElementContainer(_Element):
+    __slots__ = ('children', '_render_cache', '_index')
+    # The indexes are not pickled, enable them again after unpickling
+    _TRANSIENT_SLOTS = ('_render_cache', '_index')
     # TODO: Allow resetting the indentation from a particular node in the tree
     INDENTATION = ''
 
     def __init__(self, *children):
         super(_ElementContainer, self).__init__()
         self.children = []
+        # Only the output for the last indentation is cached, as a
+        # (newline, compiled) tuple, see RENDER_CACHE
+        self._render_cache = None
+        # See enable_index()
+        self._index = None
         self.append_children(*children)
 
     def _prepare_child(self, element):
         if not isinstance(element, _Element):
+            if element.__class__ not in _STRING_TYPES and (
+                    hasattr(element, '__await__') or
+                    hasattr(element, '__aiter__')):
+                element = _AsyncChild(element)
+                element.parent_element = self
+                return element
             element = _TextNode(self, element)
         else:
             element.parent_element = self
         return element
 
     def prepend_child(self, element):
-        self.children.insert(0, self._prepare_child(element))
+        element = self._prepare_child(element)
+        self.children.insert(0, element)
+        if _index_used:
+            self._index_subtree(element)
+        if _render_cache_used:
+            self._invalidate_render_cache()
 
     def append_child(self, element):
         # Accept (and safely ignore) None elements, so that they can be
         # added to parents with e.g. ternary operators, as in
         # P('foo', Span('bar') if abc else None)
         if element is not None:
-            self.children.append(self._prepare_child(element))
+            element = self._prepare_child(element)
+            self.children.append(element)
+            if _index_used:
+                self._index_subtree(element)
+            if _render_cache_used:
+                self._invalidate_render_cache()
 
     def append_children(self, *elements):
         for element in elements:
             self.append_child(element)
 
+    def __setstate__(self, state):
+        super(_ElementContainer, self).__setstate__(state)
+        for child in self.children:
+            child.parent_element = self
+
     def empty(self):
+        if _index_used:
+            for index in self._get_indexes():
+                for child in self.children:
+                    index.remove_subtree(child)
         self.children.clear()
+        if _render_cache_used:
+            self._invalidate_render_cache()
 
-    def compile(self, indent=""):
-        try:
-            prevchild = self.children[0]
-        except IndexError:
-            return ""
-
-        subindent = "".join((indent, self.INDENTATION))
-        # The first child's BREAK_BEFORE is taken into account in
-        # _HTMLContainerElement.compile()
-        compiled = prevchild.compile(indent=subindent)
-        for child in self.children[1:]:
-            if prevchild.BREAK_AFTER or child.BREAK_BEFORE:
-                compiled = "".join((compiled, "\n", subindent))
-            compiled = "".join((compiled, child.compile(indent=subindent)))
+    def _index_subtree(self, element):
+        for index in self._get_indexes():
+            index.add_subtree(element)
+
+    def enable_index(self):
+        """
+        Index the HTML elements of the tree by id, class name and tag.
+
+        The index makes get_by_id(), get_by_class() and get_by_tag()
+        constant-time, and is kept up to date as long as the tree is modified
+        through append_child(), prepend_child(), empty(), set_attribute() and
+        add_classes(); the nodes generated when compiling (e.g. by
+        LazyChildren) are not indexed.
+        """
+        global _index_used
+        if self._index is None:
+            from .index import ElementIndex
+            _index_used = True
+            self._index = ElementIndex(self)
+        return self._index
+
+    def disable_index(self):
+        self._index = None
+
+    def _get_index(self):
+        # Without an index, build a temporary one
+        if self._index is not None:
+            return self._index
+        from .index import ElementIndex
+        return ElementIndex(self)
+
+    def get_by_id(self, id_):
+        """
+        Return the first element with the given id, or None.
+        """
+        return self._get_index().get_by_id(id_)
+
+    def get_by_class(self, cname):
+        """
+        Return the list of the elements with the given class name.
+
+        With an index (see enable_index()) the elements are in the order they
+        were indexed, otherwise in document order.
+        """
+        return self._get_index().get_by_class(cname)
+
+    def get_by_tag(self, tag):
+        """
+        Return the list of the elements with the given tag, see
+        get_by_class().
+        """
+        return self._get_index().get_by_tag(tag)
+
+    def select(self, selector):
+        """
+        Return the list of the descendants that match the CSS selector, in
+        document order, see htool.query.
+        """
+        from .query import select
+        return select(self, selector)
+
+    def select_one(self, selector):
+        """
+        Return the first descendant that matches the CSS selector, or None.
+        """
+        from .query import iter_select
+        for element in iter_select(self, selector):
+            return element
+        return None
+
+    def _iter_children(self, scan=False):
+        # Return the children, with the _Fragment nodes replaced by the nodes
+        # they generate; if 'scan' is True, the fragments keep the generated
+        # nodes for the actual compilation
+        for child in self.children:
+            if isinstance(child, _Fragment):
+                return self._iter_fragmented_children(scan)
+        return self.children
+
+    def _iter_fragmented_children(self, scan):
+        for child in self.children:
+            if isinstance(child, _Fragment):
+                nodes = child._scan_nodes() if scan else child._pop_nodes()
+                for node in nodes:
+                    yield node
+            else:
+                yield child
+
+    def _render(self, renderer, indent):
+        return self._render_children(
+            renderer, renderer.indent(indent, self.INDENTATION))
+
+    def _render_children(self, renderer, subindent, last=None):
+        # If 'last' is a list, the last child is appended to it
+        prevchild = None
+        for child in self._iter_children():
+            # The first child's BREAK_BEFORE and the last child's BREAK_AFTER
+            # are taken into account in _HTMLContainerElement._render()
+            if prevchild is not None and (prevchild.BREAK_AFTER or
+                                          child.BREAK_BEFORE):
+                yield renderer.newline(subindent)
+            yield (child, subindent)
+            prevchild = child
+        if last is not None:
+            last.append(prevchild)
+
+    def _scan_newline(self, renderer):
+        children = self._iter_children(scan=True)
+        # If there are fragments, also return their nodes, but without
+        # generating them all if a newline is found earlier
+        nodes = None if children is self.children else []
+        prevchild = None
+        for child in children:
+            if prevchild is not None and (prevchild.BREAK_AFTER or
+                                          child.BREAK_BEFORE):
+                return (True, None)
+            if nodes is not None:
+                nodes.append(child)
             prevchild = child
-        # The last child's BREAK_AFTER is taken into account in
-        # _HTMLContainerElement.compile()
-        return compiled
+        return (False, self.children if nodes is None else nodes)
+
+
+class _AsyncChild(_Element):
+    """
+    Child that wraps an awaitable or an asynchronous iterable.
+
+    When the parent is compiled with aiter_compile(), the awaitable's result
+    or all the iterable's items (nodes, texts or None) replace the child in
+    the parent's children, before the parent's start tag is compiled, so
+    that they are formatted like any other children. Awaitables can only be
+    awaited once, but after aiter_compile() the tree only contains the
+    resolved nodes.
+    """
+    __slots__ = ('source', )
+    CACHEABLE = False
+
+    def __init__(self, source):
+        super(_AsyncChild, self).__init__()
+        self.source = source
+
+    def _render(self, renderer, indent):
+        raise TypeError("Trees with awaitable or asynchronous iterable "
+                        "children can only be compiled with aiter_compile()")
+
+    def _scan_newline(self, renderer):
+        return renderer.scan_async_child(self)
+
+
+class _Fragment(_Element):
+    """
+    Child node that is replaced by a sequence of nodes when compiled.
+
+    The nodes are formatted as if they were children of the fragment's parent
+    in place of the fragment; subclasses generate them in _generate_nodes(),
+    which is called again for each compilation.
+    """
+    __slots__ = ('_pending', )
+    _TRANSIENT_SLOTS = ('_pending', )
+    CACHEABLE = False
+    # If True or False, the content of the parent is assumed to contain, or
+    # not, line breaks because of the fragment's nodes, which are then not
+    # looked ahead; if None, they are looked ahead up to FRAGMENT_SCAN_SIZE
+    # nodes, and ValueError is raised if that's not enough
+    multiline = None
+
+    def __init__(self):
+        super(_Fragment, self).__init__()
+        # The nodes generated while the parent was looking ahead during the
+        # current compilation, and the iterator of the other nodes
+        self._pending = None
+
+    def _generate_nodes(self):
+        raise NotImplementedError()
+
+    def _scan_nodes(self):
+        # Iterate the nodes, keeping them for _pop_nodes(); only the first
+        # FRAGMENT_SCAN_SIZE nodes are generated (or the first one if
+        # 'multiline' is set), and if there are more, a _LookaheadBreak (or a
+        # _LookaheadLimit if 'multiline' is None) is yielded in place of the
+        # others
+        if self._pending is None:
+            self._pending = ([], iter(self._generate_nodes()))
+        buffered, iterator = self._pending
+        limit = max(FRAGMENT_SCAN_SIZE, 1) if self.multiline is None else 1
+        for node in buffered[:limit]:
+            yield node
+        while len(buffered) <= limit:
+            node = next(iterator, None)
+            if node is None:
+                return
+            buffered.append(node)
+            if len(buffered) <= limit:
+                yield node
+        if self.multiline is None:
+            yield _LookaheadLimit(self)
+        elif self.multiline:
+            yield _LOOKAHEAD_BREAK
+
+    def _pop_nodes(self):
+        # Iterate the nodes for compiling them, starting from the kept ones
+        if self._pending is None:
+            return iter(self._generate_nodes())
+        buffered, iterator = self._pending
+        self._pending = None
+        return itertools.chain(buffered, iterator)
+
+    def _render(self, renderer, indent):
+        # Only used if the fragment is compiled on its own
+        prevchild = None
+        for node in self._pop_nodes():
+            if prevchild is not None and (prevchild.BREAK_AFTER or
+                                          node.BREAK_BEFORE):
+                yield renderer.newline(indent)
+            yield (node, indent)
+            prevchild = node
+
+    def _scan_newline(self, renderer):
+        # Only used if the fragment is scanned on its own
+        nodes = []
+        prevchild = None
+        for node in self._scan_nodes():
+            if prevchild is not None and (prevchild.BREAK_AFTER or
+                                          node.BREAK_BEFORE):
+                return (True, None)
+            nodes.append(node)
+            prevchild = node
+        return (False, nodes)
+
+
+class _LookaheadBreak(_Node):
+    # Yielded by _Fragment._scan_nodes() in place of the nodes that are not
+    # looked ahead, forcing a line break
+    __slots__ = ()
+    BREAK_BEFORE = True
+    BREAK_AFTER = True
+
+    def _scan_newline(self, renderer):
+        return (True, None)
+
+
+_LOOKAHEAD_BREAK = _LookaheadBreak()
+
+
+class _LookaheadLimit(_Node):
+    # Yielded by _Fragment._scan_nodes() in place of the nodes that are not
+    # looked ahead when the fragment's 'multiline' is None: it's only scanned
+    # if the line breaks of the parent's content depend on those nodes, whose
+    # output would otherwise depend on FRAGMENT_SCAN_SIZE
+    __slots__ = ('fragment', )
+
+    def __init__(self, fragment):
+        super(_LookaheadLimit, self).__init__()
+        self.fragment = fragment
+
+    def _scan_newline(self, renderer):
+        raise ValueError("{} generated more than FRAGMENT_SCAN_SIZE ({}) "
+                         "nodes without line breaks: set its 'multiline' "
+                         "attribute".format(self.fragment.__class__.__name__,
+                                            FRAGMENT_SCAN_SIZE))
 
 
 class _HTMLContainerElement(_HTMLElement, _ElementContainer):
+    __slots__ = ('tag', 'attributes')
     INDENTATION = ' ' * 2
     # NOTE[1]: By default do not force indentation on multiline text, because
     # some elements like <pre> or <textarea> preserve white space (also leading
@@ -305,94 +1192,499 @@ class _HTMLContainerElement(_HTMLElement, _ElementContainer):
     AUTOINDENT_MULTILINE = False
 
     def __init__(self, *children, **attributes):
+        # _HTMLElement.__init__() already initializes _ElementContainer
+        # through super(), so only the children are left to be added
         _HTMLElement.__init__(self, **attributes)
-        _ElementContainer.__init__(self, *children)
+        self.append_children(*children)
 
-    def compile(self, indent=""):
+    def _render(self, renderer, indent):
+        if self.PRESERVE_WHITESPACE and renderer.MINIFY:
+            indent = renderer.preserve(indent)
         # The start tag is indented by the partent _ElementContainer if needed
-        start = self._compose_start_tag().join(('<', '>'))
-        # The content is indented by _ElementContainer.compile()
-        content = _ElementContainer.compile(self, indent=indent)
+        start = self._compose_start_tag(renderer.UNICODE).join(('<', '>'))
         end = self.tag.join(('</', '>'))
-        # See NOTE[1]
-        # Do not just test if there are children with a BREAK_* attribute,
-        # since also all the descendants should be tested and the code would
-        # get much more complicated
-        if self.AUTOINDENT_MULTILINE and "\n" in content:
-            start = "".join((start, "\n", indent, self.INDENTATION))
-            end = "".join(("\n", indent, end))
-        else:
-            try:
-                first_child = self.children[0]
-            except IndexError:
-                pass
-            else:
-                if first_child.BREAK_BEFORE:
-                    # The first child's BREAK_BEFORE has not been taken into
-                    # account in _ElementContainer.compile(), so do it here
-                    start = "".join((start, "\n", indent, self.INDENTATION))
-                if self.children[-1].BREAK_AFTER:
-                    # The last child's BREAK_AFTER has not been taken into
-                    # account in _ElementContainer.compile(), so do it here
-                    end = "".join(("\n", indent, end))
-        return "".join((start, content, end))
+        subindent = renderer.indent(indent, self.INDENTATION)
+        if self.children:
+            if (isinstance(self.children[0], _Fragment) or
+                    isinstance(self.children[-1], _Fragment)):
+                return self._render_fragmented(renderer, indent, subindent,
+                                               start, end)
+            # The first child's BREAK_BEFORE and the last child's BREAK_AFTER
+            # have not been taken into account in _ElementContainer._render(),
+            # so do it here
+            breakstart = self.children[0].BREAK_BEFORE
+            breakend = self.children[-1].BREAK_AFTER
+            # See NOTE[1]
+            # Do not just test if there are children with a BREAK_* attribute,
+            # since also all the descendants should be tested; the content is
+            # streamed, so _Renderer.contains_newline() predicts whether it
+            # will contain newlines without compiling it; if the first and
+            # last children already force the breaks, the content can't
+            # change the formatting, so don't even scan it
+            if (self.AUTOINDENT_MULTILINE and
+                    not (breakstart and breakend) and
+                    renderer.scan_content(self, subindent)):
+                breakstart = breakend = True
+            if breakstart:
+                start = "".join((start, renderer.newline(subindent)))
+            if breakend:
+                end = "".join((renderer.newline(indent), end))
+        # The content is indented by _ElementContainer._render_children()
+        return itertools.chain((start, ),
+                               self._render_children(renderer, subindent),
+                               (end, ))
+
+    def _render_fragmented(self, renderer, indent, subindent, start, end):
+        # Like _render(), but the first or last child is a _Fragment, whose
+        # nodes are only known while compiling: the first node is read ahead,
+        # and the last one is only known after compiling the content
+        first = next(iter(self._iter_children(scan=True)), None)
+        if first is None:
+            return (start, end)
+        breakstart = first.BREAK_BEFORE
+        breakend = False
+        if self.AUTOINDENT_MULTILINE and renderer.scan_content(self,
+                                                               subindent):
+            breakstart = breakend = True
+        if breakstart:
+            start = "".join((start, renderer.newline(subindent)))
+        last = []
+        return itertools.chain((start, ),
+                               self._render_children(renderer, subindent,
+                                                     last),
+                               self._render_fragmented_end(
+                                   renderer, indent, end, breakend, last))
+
+    def _render_fragmented_end(self, renderer, indent, end, breakend, last):
+        # This generator is only started after the content has been compiled
+        if breakend or (last[0] is not None and last[0].BREAK_AFTER):
+            end = "".join((renderer.newline(indent), end))
+        yield end
+
+    def _scan_newline(self, renderer):
+        # Whatever the branch taken in _render(), the output contains a
+        # newline if the start tag or the content do, or if the first or last
+        # child force a break
+        fragmented = self.children and (
+            isinstance(self.children[0], _Fragment) or
+            isinstance(self.children[-1], _Fragment))
+        if self.children and not fragmented and (
+                self.children[0].BREAK_BEFORE or
+                self.children[-1].BREAK_AFTER):
+            return (True, None)
+        if "\n" in self._compose_start_tag():
+            return (True, None)
+        found, nodes = _ElementContainer._scan_newline(self, renderer)
+        if not found and fragmented and nodes:
+            found = nodes[0].BREAK_BEFORE or nodes[-1].BREAK_AFTER
+        return (found, nodes)
 
 
 class _HTMLNewlineVoidElement(_HTMLVoidElement):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = True
     AUTOINDENT_MULTILINE = True
 
 
 class _HTMLNewlineElement(_HTMLContainerElement):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = True
     AUTOINDENT_MULTILINE = True
 
 
 class _HTMLPrelineVoidElement(_HTMLVoidElement):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = True
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLPrelineElement(_HTMLContainerElement):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = True
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLStartlineVoidElement(_HTMLVoidElement):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = False
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLStartlineElement(_HTMLContainerElement):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = False
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLEndlineVoidElement(_HTMLVoidElement):
+    __slots__ = ()
     BREAK_BEFORE = False
     BREAK_AFTER = True
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLEndlineElement(_HTMLContainerElement):
+    __slots__ = ()
     BREAK_BEFORE = False
     BREAK_AFTER = True
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLSamelineVoidElement(_HTMLVoidElement):
+    __slots__ = ()
     BREAK_BEFORE = False
     BREAK_AFTER = False
     AUTOINDENT_MULTILINE = False
 
 
 class _HTMLSamelineElement(_HTMLContainerElement):
+    __slots__ = ()
     BREAK_BEFORE = False
     BREAK_AFTER = False
     AUTOINDENT_MULTILINE = False
+
+
+class _Renderer(object):
+    """
+    Compile node trees in linear time and without recursion.
+
+    The tree is walked with an explicit stack of the iterables returned by
+    each node's _render() method, so its depth is not limited by Python's
+    recursion limit.
+    """
+    __slots__ = ('slots', 'encoding', 'splice_encoding', '_indents',
+                 '_indent_handles', '_newlines', '_cache_keys')
+    MINIFY = False
+    # If True, the texts are output with _Text.escaped_unicode
+    UNICODE = False
+    # If not None, an object whose render(renderer, node, indent) method is
+    # called in place of node._render(renderer, indent), whose cached(node,
+    # compiled) method is called for the containers whose cached output is
+    # reused, and whose iter_compile(iterator) method wraps the output of
+    # iter_compile(), see htool.profiling
+    HOOK = None
+
+    def __init__(self, slots=None):
+        # The values of the templates.Slot nodes, by name
+        self.slots = slots
+        # The encoding of the output of the UNICODE renderers
+        self.encoding = None
+        # If not None, the output is written in this encoding to a file
+        # descriptor, and nodes can yield _FileRegion objects to have their
+        # bytes copied directly to it
+        self.splice_encoding = None
+        # Indentations are passed to _Node._render() as integer handles, and
+        # their strings are only built when a newline is actually emitted:
+        # keeping a string per level of the stack would make the memory usage
+        # quadratic in the depth of the tree
+        # Handle 0 is the base indentation passed to iter_compile()
+        self._indents = [(None, "")]
+        self._indent_handles = {}
+        self._newlines = None
+        # The keys of the cached outputs for each handle, see _cache_key()
+        self._cache_keys = {}
+
+    def indent(self, indent, indentation):
+        # Return the handle of the 'indent' handle extended by 'indentation'
+        if not indentation:
+            return indent
+        key = (indent, indentation)
+        try:
+            return self._indent_handles[key]
+        except KeyError:
+            handle = len(self._indents)
+            self._indents.append(key)
+            self._indent_handles[key] = handle
+            return handle
+
+    def newline(self, indent):
+        # Return a newline followed by the indentation string of 'indent'
+        try:
+            return self._newlines[indent]
+        except KeyError:
+            pass
+        handle = indent
+        indentations = []
+        while handle not in self._newlines:
+            handle, indentation = self._indents[handle]
+            indentations.append(indentation)
+        indentations.append(self._newlines[handle])
+        newline = "".join(reversed(indentations))
+        self._newlines[indent] = newline
+        return newline
+
+    def _cache_key(self, indent):
+        # Return the key of the cached output of a container at 'indent' (see
+        # _iter_compile_cached()), i.e. an integer that identifies its
+        # indentation string in all the renderers; the strings themselves are
+        # not built, for the same reason as in __init__()
+        try:
+            return self._cache_keys[indent]
+        except KeyError:
+            pass
+        handles = []
+        handle = indent
+        while handle not in self._cache_keys:
+            handles.append(handle)
+            if handle == 0:
+                break
+            handle = self._indents[handle][0]
+        if handle == 0 and handle not in self._cache_keys:
+            handles.pop()
+            key = self._cache_keys[0] = _get_indent_key(None,
+                                                        self._newlines[0])
+        else:
+            key = self._cache_keys[handle]
+        for handle in reversed(handles):
+            key = self._cache_keys[handle] = _get_indent_key(
+                key, self._indents[handle][1])
+        return key
+
+    def check_raw_text(self, text):
+        # Return the raw text (see _Node.RAW_TEXT), making sure that its
+        # characters are not replaced with character references when encoded
+        if self.encoding is not None:
+            try:
+                text.encode(self.encoding)
+            except UnicodeEncodeError as exc:
+                raise UnicodeEncodeError(
+                    exc.encoding, exc.object, exc.start, exc.end,
+                    "character references are not decoded in raw text "
+                    "(script, style and comments)")
+        return text
+
+    def iter_compile(self, node, indent=""):
+        self._newlines = {0: "".join(("\n", indent))}
+        self._cache_keys = {}
+        # The values of slots are not part of the cached output, and the
+        # _FileRegion objects can't be joined
+        if (RENDER_CACHE and self.slots is None and
+                self.splice_encoding is None):
+            iterator = self._iter_compile_cached(node)
+        else:
+            iterator = self._iter_compile(node)
+        if self.HOOK is not None:
+            return self.HOOK.iter_compile(iterator)
+        return iterator
+
+    def _iter_compile(self, node):
+        hook = self.HOOK
+        stack = [iter(((node, 0), ))]
+        while stack:
+            for item in stack[-1]:
+                if item.__class__ is tuple:
+                    child, subindent = item
+                    if hook is None:
+                        stack.append(iter(child._render(self, subindent)))
+                    else:
+                        stack.append(hook.render(self, child, subindent))
+                    break
+                yield item
+            else:
+                stack.pop()
+
+    def _iter_compile_cached(self, node):
+        # Like _iter_compile(), but reuse and fill the containers' caches
+        global _render_cache_used
+        _render_cache_used = True
+        hook = self.HOOK
+        # The chunks emitted while any container is being cached; the chunks
+        # of each completed container are replaced with their joined string
+        chunks = []
+        # Each frame is a list of the iterator, the container being compiled
+        # (if any), its cache key, the index of its first chunk, and whether
+        # its chunks are collected, i.e. whether the frame is, or is inside, a
+        # container that can still be cached; when a node that is not
+        # CACHEABLE is reached, none of its ancestors can be cached either
+        stack = [[iter(((node, 0), )), None, None, None, False]]
+        while stack:
+            frame = stack[-1]
+            for item in frame[0]:
+                if item.__class__ is tuple:
+                    child, subindent = item
+                    container = key = start = None
+                    if not child.CACHEABLE:
+                        self._uncache_frames(stack)
+                        collect = False
+                    elif isinstance(child, _ElementContainer):
+                        key = self._cache_key(subindent)
+                        cache = child._render_cache
+                        if cache is not None and cache[0] == key:
+                            _render_cache_stats[0] += 1
+                            if hook is not None:
+                                hook.cached(child, cache[1])
+                            if frame[4]:
+                                chunks.append(cache[1])
+                            for chunk in cache[1]:
+                                yield chunk
+                            continue
+                        _render_cache_stats[1] += 1
+                        container = child
+                        start = len(chunks)
+                        collect = True
+                        for grandchild in child.children:
+                            if not grandchild.CACHEABLE:
+                                self._uncache_frames(stack)
+                                collect = False
+                                break
+                    else:
+                        collect = frame[4]
+                    if hook is None:
+                        iterator = iter(child._render(self, subindent))
+                    else:
+                        iterator = hook.render(self, child, subindent)
+                    stack.append([iterator, container, key, start, collect])
+                    break
+                if frame[4]:
+                    chunks.append(item)
+                yield item
+            else:
+                stack.pop()
+                container, key, start, collect = frame[1:]
+                if container is not None and collect:
+                    size = 0
+                    length = 0
+                    for chunk in chunks[start:]:
+                        if chunk.__class__ is _CachedOutput:
+                            length += chunk.length
+                        else:
+                            size += len(chunk)
+                    # The short outputs are only stored in the ancestors'
+                    # caches, since each cache costs more memory than a few
+                    # characters
+                    if stack[-1][4] and length + size < _CACHE_MIN_LENGTH:
+                        continue
+                    if _render_cache_size[0] + size > RENDER_CACHE_SIZE:
+                        # Leave the chunks to the cached ancestors, if any
+                        if not stack[-1][4]:
+                            del chunks[start:]
+                        continue
+                    compiled = _CachedOutput(chunks[start:])
+                    container._render_cache = (key, compiled)
+                    if stack[-1][4]:
+                        chunks[start:] = [compiled]
+                    else:
+                        del chunks[start:]
+
+    @staticmethod
+    def _uncache_frames(stack):
+        # Stop collecting the chunks of the frames on the stack; the frames
+        # that don't collect them are always at the bottom of the stack
+        for frame in reversed(stack):
+            if not frame[4]:
+                break
+            frame[4] = False
+
+    def scan_async_child(self, child):
+        # Only aio's renderer can resolve the _AsyncChild nodes, the others
+        # raise the same error as when compiling them
+        return child._render(self, 0)
+
+    def scan_content(self, container, indent):
+        # Tell if the content of the container, indented by 'indent', would
+        # contain a newline
+        return self.contains_newline(
+            *_ElementContainer._scan_newline(container, self))
+
+    def contains_newline(self, found, nodes):
+        # Resolve the (found, nodes) tuples returned by _Node._scan_newline()
+        if found:
+            return True
+        if not nodes:
+            return False
+        stack = [iter(nodes)]
+        while stack:
+            for node in stack[-1]:
+                found, nodes = node._scan_newline(self)
+                if found:
+                    return True
+                if nodes:
+                    stack.append(iter(nodes))
+                    break
+            else:
+                stack.pop()
+        return False
+
+
+class _MinifyingRenderer(_Renderer):
+    """
+    Renderer that omits the line breaks and the indentation between nodes.
+
+    The PRESERVE_WHITESPACE elements are formatted as usual, at the
+    indentation they would have in the formatted output.
+    """
+    __slots__ = ('_preserved', )
+    MINIFY = True
+
+    def __init__(self, slots=None):
+        super(_MinifyingRenderer, self).__init__(slots)
+        # The indentation handles inside PRESERVE_WHITESPACE elements
+        self._preserved = set()
+
+    def indent(self, indent, indentation):
+        handle = _Renderer.indent(self, indent, indentation)
+        if indent in self._preserved:
+            self._preserved.add(handle)
+        return handle
+
+    def preserve(self, indent):
+        # Return a handle with the same indentation as 'indent', whose
+        # newlines are kept, as well as those of the handles derived from it
+        key = (indent, None)
+        try:
+            return self._indent_handles[key]
+        except KeyError:
+            handle = len(self._indents)
+            self._indents.append((indent, ""))
+            self._indent_handles[key] = handle
+            self._preserved.add(handle)
+            return handle
+
+    def newline(self, indent):
+        if indent in self._preserved:
+            return _Renderer.newline(self, indent)
+        return ""
+
+    def _cache_key(self, indent):
+        # The cached output still depends on the indentation, because of the
+        # preserved elements; the key must also differ from the formatted
+        # output's
+        return (indent in self._preserved, _Renderer._cache_key(self, indent))
+
+    def scan_content(self, container, indent):
+        # The breaks are omitted anyway, so don't scan the content
+        if indent in self._preserved:
+            return _Renderer.scan_content(self, container, indent)
+        return False
+
+
+class _UnicodeRenderer(_Renderer):
+    __slots__ = ()
+    UNICODE = True
+
+    def _cache_key(self, indent):
+        return ('unicode', _Renderer._cache_key(self, indent))
+
+
+class _UnicodeMinifyingRenderer(_MinifyingRenderer):
+    __slots__ = ()
+    UNICODE = True
+
+    def _cache_key(self, indent):
+        return ('unicode', _MinifyingRenderer._cache_key(self, indent))
+
+
+def _make_renderer(minify=False, encoding=None):
+    # The output is encoded only if 'encoding' is not None
+    if encoding is not None:
+        renderer = (_UnicodeMinifyingRenderer() if minify
+                    else _UnicodeRenderer())
+        renderer.encoding = encoding
+        return renderer
+    return _MinifyingRenderer() if minify else _Renderer()
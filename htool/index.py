@@ -0,0 +1,117 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+from .dom import _ElementContainer, _HTMLElement
+from .text import _STRING_TYPES
+
+
+def _iter_elements(root):
+    # Iterate the HTML elements of the tree in document order, without
+    # recursion; the nodes generated by _Fragment children are not included
+    stack = [iter((root, ))]
+    while stack:
+        for node in stack[-1]:
+            if isinstance(node, _HTMLElement):
+                yield node
+            if isinstance(node, _ElementContainer) and node.children:
+                stack.append(iter(node.children))
+                break
+        else:
+            stack.pop()
+
+
+def _get_key(element, name):
+    # Return the raw value of the attribute, or None
+    try:
+        value = element.attributes[name][1]
+    except KeyError:
+        return None
+    if value is None:
+        return None
+    if isinstance(value.raw, _STRING_TYPES):
+        return value.raw
+    return value.escaped
+
+
+class ElementIndex(object):
+    """
+    Map of the ids, class names and tags of the HTML elements of a tree.
+
+    The dictionaries map each key to a dictionary whose keys are the elements,
+    in the order they were indexed, which is not necessarily their order in
+    the tree. See _ElementContainer.enable_index().
+    """
+    def __init__(self, root):
+        self.ids = {}
+        self.classes = {}
+        self.tags = {}
+        self.add_subtree(root)
+
+    def add_subtree(self, node):
+        for element in _iter_elements(node):
+            self.add_element(element)
+
+    def remove_subtree(self, node):
+        for element in _iter_elements(node):
+            self.remove_element(element)
+
+    def add_element(self, element):
+        self.tags.setdefault(element.tag, {})[element] = None
+        id_ = _get_key(element, 'id')
+        if id_ is not None:
+            self.ids.setdefault(id_, {})[element] = None
+        classes = _get_key(element, 'class')
+        if classes is not None:
+            for cname in classes.split():
+                self.classes.setdefault(cname, {})[element] = None
+
+    def remove_element(self, element):
+        _discard(self.tags, element.tag, element)
+        id_ = _get_key(element, 'id')
+        if id_ is not None:
+            _discard(self.ids, id_, element)
+        classes = _get_key(element, 'class')
+        if classes is not None:
+            for cname in classes.split():
+                _discard(self.classes, cname, element)
+
+    def get_by_id(self, id_):
+        for element in self.ids.get(id_, ()):
+            return element
+        return None
+
+    def get_by_class(self, cname):
+        return list(self.classes.get(cname, ()))
+
+    def get_by_tag(self, tag):
+        return list(self.tags.get(tag, ()))
+
+
+def _discard(mapping, key, element):
+    elements = mapping.get(key)
+    if elements is not None:
+        elements.pop(element, None)
+        if not elements:
+            del mapping[key]
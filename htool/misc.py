@@ -23,59 +23,244 @@ from __future__ import (absolute_import, division,
 # Support Python 2.6
 # from builtins import *
 
-from .dom import _Element, _ElementContainer
+import codecs
+import io
+import mmap
+import os
+from collections import OrderedDict
+
+from . import dom
+from .dom import _Element, _ElementContainer, _FileRegion, _Fragment, _TextNode
 from .text import _Text, TextRaw
 
+# Only the node classes are exported by 'from .misc import *' in htool's
+# __init__; Python 2 requires native strings in __all__
+__all__ = [str(name) for name in ('Doctype', 'Comment', 'ElementContainer',
+                                  'LazyChildren', 'TextFile', 'HTMLFile')]
+
+# Files larger than this (in bytes) are streamed in chunks when compiled,
+# instead of being read whole and cached
+FILE_STREAM_SIZE = 1024 * 1024
+# Maximum number of files whose contents are cached, see _File
+FILE_CACHE_SIZE = 64
+_FILE_CACHE = OrderedDict()
+# The encodings whose files can't be copied as they are into the output,
+# since they start with a byte order mark
+_BOM_ENCODINGS = ('utf-8-sig', 'utf-16', 'utf-32')
+
 
 class Doctype(_Element):
+    __slots__ = ()
     BREAK_BEFORE = True
     BREAK_AFTER = True
 
-    def compile(self, indent=""):
-        return '<!doctype html>'
+    def _render(self, renderer, indent):
+        return ('<!doctype html>', )
+
+    def _scan_newline(self, renderer):
+        return (False, None)
 
 
 class Comment(_Element):
+    __slots__ = ('textbits', )
     # TODO: Does text have to be escaped in comments?
     # TODO: Document that the text isn't escaped in this case
     DEFAULT_ESCAPE_TEXT = TextRaw
 
     def __init__(self, *text):
         super(Comment, self).__init__()
-        self.text = ''
+        # Only read the escaped text when compiling, in case the _Text class
+        # escapes it lazily
+        self.textbits = []
         for textbit in text:
             if not isinstance(textbit, _Text):
                 textbit = self.DefaultContentEscape(textbit)
-            self.text = ''.join((self.text, textbit.escaped))
+            self.textbits.append(textbit)
 
-    def compile(self, indent=""):
+    @property
+    def text(self):
+        return ''.join(textbit.escaped for textbit in self.textbits)
+
+    def _render(self, renderer, indent):
         # TODO: Optionally surround text with spaces?
-        return self.text.join(('<!--', '-->'))
+        if renderer.UNICODE:
+            text = renderer.check_raw_text(''.join(
+                textbit.escaped_unicode for textbit in self.textbits))
+        else:
+            text = self.text
+        return (text.join(('<!--', '-->')), )
+
+    def _scan_newline(self, renderer):
+        return ("\n" in self.text, None)
 
 
 class ElementContainer(_ElementContainer):
     """
     Safe alias for the "private" _ElementContainer class.
     """
-    pass
+    __slots__ = ()
+
+
+class LazyChildren(_Fragment):
+    """
+    Child that adds the items of an iterable as children of its parent.
+
+    The iterable is only consumed when the parent is compiled, and its items
+    are compiled one at a time, so e.g. Ul(LazyChildren(Li(x) for x in rows))
+    never holds all the Li elements in memory. Items that are not elements
+    are turned into text nodes like with append_child(), and None items are
+    ignored. The iterable is consumed only once: later compilations don't
+    include its items.
+
+    When the formatting of an element depends on whether its content
+    contains line breaks (e.g. Div(LazyChildren(Span(x) for x in rows))),
+    only up to dom.FRAGMENT_SCAN_SIZE items are looked ahead and kept in
+    memory: if they don't break lines, but there are more items, ValueError
+    is raised when compiling, since the formatting can't be decided.
+    'multiline' can be set to True or False to declare whether the items
+    break lines, so that they are not looked ahead at all.
+    """
+    __slots__ = ('iterable', 'multiline')
+
+    def __init__(self, iterable, multiline=None):
+        super(LazyChildren, self).__init__()
+        self.iterable = iterable
+        self.multiline = multiline
+
+    def _generate_nodes(self):
+        iterable = self.iterable
+        self.iterable = ()
+        parent = self.parent_element
+        for item in iterable:
+            if item is None:
+                continue
+            if isinstance(parent, _ElementContainer):
+                yield parent._prepare_child(item)
+            elif isinstance(item, _Element):
+                yield item
+            else:
+                yield _TextNode(self, item)
 
 
 class _File(_Element):
+    """
+    Node whose text is read from a file when it's compiled.
+
+    The contents of the files up to FILE_STREAM_SIZE bytes are cached until
+    their modification time or size change; larger files are read and
+    escaped in chunks each time they're compiled, and, with write(...,
+    encoding=...), if they aren't escaped (e.g. HTMLFile) and were created
+    with the same 'encoding', their bytes are copied as they are by the
+    kernel.
+
+    Setting 'text' (to a _Text object, or a string that is escaped as the
+    file's contents) replaces the contents of the file in the output, and
+    drops the cached contents; setting it to None reads the file again.
+    """
+    __slots__ = ('filename', 'encoding', '_text')
     BREAK_BEFORE = True
     BREAK_AFTER = True
+    # The file may change between compilations
+    CACHEABLE = False
 
-    def __init__(self, filename):
+    def __init__(self, filename, encoding=None):
         super(_File, self).__init__()
-        with open(filename, 'r') as f:
-            self.text = self.DefaultContentEscape(f.read())
+        # Relative paths are resolved when the node is created, as they were
+        # when the file was read here
+        self.filename = os.path.abspath(filename)
+        self.encoding = encoding
+        # The text set in place of the file's contents
+        self._text = None
+
+    @property
+    def text(self):
+        if self._text is not None:
+            return self._text
+        return self._read(os.stat(self.filename))
+
+    @text.setter
+    def text(self, text):
+        if text is not None and not isinstance(text, _Text):
+            text = self.DefaultContentEscape(text)
+        self._text = text
+        for key in list(_FILE_CACHE):
+            if key[0] == self.filename:
+                del _FILE_CACHE[key]
+
+    def _open(self):
+        return io.open(self.filename, 'r', encoding=self.encoding)
+
+    def _read(self, stat):
+        Escape = self.DefaultContentEscape
+        key = (self.filename, self.encoding, Escape)
+        version = (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size)
+        cached = _FILE_CACHE.pop(key, None)
+        if cached is None or cached[0] != version:
+            with self._open() as f:
+                cached = (version, Escape(f.read()))
+        if stat.st_size <= FILE_STREAM_SIZE:
+            # Re-insert the key to mark it as the most recently used
+            _FILE_CACHE[key] = cached
+            if len(_FILE_CACHE) > FILE_CACHE_SIZE:
+                _FILE_CACHE.popitem(last=False)
+        return cached[1]
+
+    def _iter_chunks(self, unicode):
+        # Escaping replaces single characters, so it can be done in chunks
+        Escape = self.DefaultContentEscape
+        with self._open() as f:
+            while True:
+                chunk = f.read(dom.WRITE_BUFFER_SIZE)
+                if not chunk:
+                    break
+                text = Escape(chunk)
+                yield text.escaped_unicode if unicode else text.escaped
+
+    def _can_splice(self, encoding):
+        if (self.DefaultContentEscape is not TextRaw or
+                self.encoding is None):
+            return False
+        name = codecs.lookup(self.encoding).name
+        if name != codecs.lookup(encoding).name or name in _BOM_ENCODINGS:
+            return False
+        # Reading the file in text mode would translate the line endings
+        with open(self.filename, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return mapped.find(b'\r') < 0
+            finally:
+                mapped.close()
+
+    def _render(self, renderer, indent):
+        if self._text is not None:
+            if renderer.UNICODE:
+                return (self._text.escaped_unicode, )
+            return (self._text.escaped, )
+        stat = os.stat(self.filename)
+        if stat.st_size <= FILE_STREAM_SIZE:
+            text = self._read(stat)
+            if renderer.UNICODE:
+                return (text.escaped_unicode, )
+            return (text.escaped, )
+        if (renderer.splice_encoding is not None and
+                self._can_splice(renderer.splice_encoding)):
+            return (_FileRegion(self.filename, stat.st_size), )
+        return self._iter_chunks(renderer.UNICODE)
 
-    def compile(self, indent=""):
-        return self.text.escaped
+    def _scan_newline(self, renderer):
+        if self._text is not None:
+            return ("\n" in self._text.escaped, None)
+        stat = os.stat(self.filename)
+        if stat.st_size <= FILE_STREAM_SIZE:
+            return ("\n" in self._read(stat).escaped, None)
+        return (any("\n" in chunk for chunk in self._iter_chunks(False)),
+                None)
 
 
 class TextFile(_File):
-    pass
+    __slots__ = ()
 
 
 class HTMLFile(_File):
+    __slots__ = ()
     DEFAULT_ESCAPE_TEXT = TextRaw
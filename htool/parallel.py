@@ -0,0 +1,324 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import errno
+# multiprocessing is only imported when the workers are started, since this
+# module is imported by htool's __init__
+import os
+import pickle
+from collections import namedtuple
+from timeit import default_timer
+
+from .dom import (_ElementContainer, _HTMLContainerElement, _Fragment,
+                  _MinifyingRenderer, _Node, _Renderer)
+
+# Subtrees with fewer nodes than this are not worth sending to a worker
+MIN_PART_SIZE = 1000
+
+# Trees with fewer nodes than this are compiled in this process, since
+# starting the workers takes longer than compiling them
+MIN_PARALLEL_SIZE = 20000
+
+# Number of documents sent to a worker at a time by render_many()
+RENDER_MANY_CHUNK_SIZE = 16
+
+RenderedDocument = namedtuple('RenderedDocument', ('path', 'seconds', 'size'))
+
+# The parts of the tree being compiled by render_parallel(), inherited by the
+# forked worker processes
+_forked_parts = None
+
+
+def render_parallel(node, indent="", workers=None,
+                    min_part_size=MIN_PART_SIZE, minify=False,
+                    min_size=MIN_PARALLEL_SIZE):
+    """
+    Compile a node, rendering its large subtrees in a pool of processes.
+
+    The tree is split at the boundaries between sibling nodes, e.g. between
+    the Section children of a Body or the rows of a Tbody; the main process
+    compiles the rest of the tree and joins the parts, so the output is
+    exactly the same as compile()'s. 'workers' defaults to, and is limited
+    to, the number of CPUs; with fewer than 2, or if the tree has fewer than
+    'min_size' nodes, the tree is compiled in this process. See compile() for
+    'minify'.
+
+    Where the 'fork' start method is available the workers inherit the tree,
+    otherwise the parts are pickled, and the usual precautions of the
+    multiprocessing module apply (e.g. the main module must be importable).
+    Pickling is recursive, so the parts nested deeper than the recursion
+    limit allows (a few hundred levels with the default limit, see
+    sys.getrecursionlimit()) are compiled in this process instead.
+    """
+    cpus = _get_cpu_count()
+    if workers is None or workers > cpus:
+        workers = cpus
+    if workers < 2:
+        return node.compile(indent=indent, minify=minify)
+    total = _count_nodes(node, min_size)
+    if total < min_size:
+        return node.compile(indent=indent, minify=minify)
+    total = _count_nodes(node)
+    parts = _split(node, max(total // (workers * 4), min_part_size),
+                   min_part_size)
+    if not parts:
+        return node.compile(indent=indent, minify=minify)
+    import multiprocessing
+    context = _get_fork_context()
+    global _forked_parts
+    if context is not None:
+        _forked_parts = parts
+        try:
+            pool = context.Pool(workers)
+        finally:
+            _forked_parts = None
+    else:
+        pool = multiprocessing.Pool(workers)
+    try:
+        chunks = []
+        renderer = _MinifyingRenderer() if minify else _Renderer()
+        for chunk in _iter_split(renderer, node, indent, parts):
+            if chunk.__class__ is _Part:
+                # Submit the parts as soon as their indentation is known, so
+                # that the workers run while the rest of the tree is compiled
+                if context is not None:
+                    chunk.result = pool.apply_async(
+                        _render_forked_part,
+                        (chunk.index, chunk.indent, chunk.minify))
+                else:
+                    try:
+                        data = pickle.dumps(parts[chunk.index],
+                                            pickle.HIGHEST_PROTOCOL)
+                    except RuntimeError:
+                        # RecursionError, or RuntimeError in Python 2
+                        chunk = _render_part(parts[chunk.index], chunk.indent,
+                                             chunk.minify)
+                    else:
+                        chunk.result = pool.apply_async(
+                            _render_pickled_part,
+                            (data, chunk.indent, chunk.minify))
+            chunks.append(chunk)
+        return "".join(chunk.result.get() if chunk.__class__ is _Part
+                       else chunk for chunk in chunks)
+    finally:
+        pool.terminate()
+
+
+def render_many(items, outdir, workers=None, encoding='utf-8'):
+    """
+    Write many documents in parallel worker processes.
+
+    'items' is an iterable of (path, document) pairs, where 'path' is relative
+    to 'outdir' (missing directories are created) and 'document' is either a
+    node or a callable that returns one; callables are only invoked in the
+    workers, so e.g. functools.partial(make_page, page_id) items avoid
+    building and pickling the trees in the main process. 'items' is consumed
+    lazily. The documents are written with write(), i.e. as the output of
+    compile_bytes() with 'encoding', or of compile() in text mode (with the
+    platform's default encoding) if 'encoding' is None.
+
+    Return a list of RenderedDocument tuples in the order of 'items', with
+    the path of the file, the seconds spent building and writing the document
+    and the size of the file in bytes. 'workers' defaults to the number of
+    CPUs; with fewer than 2 the documents are written in this process.
+    """
+    import multiprocessing
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    tasks = ((os.path.join(outdir, path), document, encoding)
+             for path, document in items)
+    if workers < 2:
+        return [_render_document(task) for task in tasks]
+    pool = multiprocessing.Pool(workers)
+    try:
+        return list(pool.imap(_render_document, tasks,
+                              RENDER_MANY_CHUNK_SIZE))
+    finally:
+        pool.terminate()
+
+
+def _render_document(task):
+    path, document, encoding = task
+    start = default_timer()
+    if not isinstance(document, _Node):
+        document = document()
+    directory = os.path.dirname(path)
+    if directory:
+        try:
+            os.makedirs(directory)
+        except OSError as exc:
+            # Other workers may be creating the same directories
+            if exc.errno != errno.EEXIST:
+                raise
+    document.write(path, encoding=encoding)
+    return RenderedDocument(path, default_timer() - start,
+                            os.path.getsize(path))
+
+
+def _get_cpu_count():
+    import multiprocessing
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def _get_fork_context():
+    import multiprocessing
+    try:
+        return multiprocessing.get_context('fork')
+    except (AttributeError, ValueError):
+        # Python 2 doesn't have get_context(), but forks anyway on POSIX
+        # systems, which is not worth detecting
+        return None
+
+
+def _count_nodes(node, limit=None):
+    # Count the nodes of the subtree, stopping as soon as they exceed 'limit'
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if limit is not None and count > limit:
+            break
+        if isinstance(node, _ElementContainer):
+            stack.extend(node.children)
+    return count
+
+
+def _is_splittable(node):
+    # The children can be compiled separately only if the container yields
+    # them as (child, indent) items separated by the line breaks computed by
+    # _ElementContainer._render_children(), which _render_part() reproduces
+    return isinstance(node, _ElementContainer) and type(node)._render in (
+        _ElementContainer._render, _HTMLContainerElement._render)
+
+
+def _split(root, target, minsize):
+    # Return a list of the parts to be rendered by the workers, i.e. tuples
+    # of consecutive siblings with about 'target' nodes in total; the nodes
+    # larger than that are split among their children
+    parts = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not _is_splittable(node):
+            continue
+        run = []
+        runsize = 0
+        for child in node.children:
+            if isinstance(child, _Fragment):
+                # The nodes of a fragment are only known while compiling
+                size = None
+            else:
+                size = _count_nodes(child, target)
+            if size is None or size > target:
+                if runsize >= minsize:
+                    parts.append(tuple(run))
+                run = []
+                runsize = 0
+                if size is not None:
+                    stack.append(child)
+                continue
+            run.append(child)
+            runsize += size
+            if runsize >= target:
+                parts.append(tuple(run))
+                run = []
+                runsize = 0
+        if runsize >= minsize:
+            parts.append(tuple(run))
+    return parts
+
+
+def _render_part(nodes, indent, minify):
+    # Compile consecutive siblings like their parent would do
+    chunks = []
+    newline = "" if minify else "".join(("\n", indent))
+    prevnode = None
+    for node in nodes:
+        if prevnode is not None and (prevnode.BREAK_AFTER or
+                                     node.BREAK_BEFORE):
+            chunks.append(newline)
+        chunks.append(node.compile(indent=indent, minify=minify))
+        prevnode = node
+    return "".join(chunks)
+
+
+def _render_forked_part(index, indent, minify):
+    return _render_part(_forked_parts[index], indent, minify)
+
+
+def _render_pickled_part(data, indent, minify):
+    # Unpickling is not recursive, unlike pickling
+    return _render_part(pickle.loads(data), indent, minify)
+
+
+class _Part(object):
+    # Placeholder for the output of a part in the compiled chunks
+    __slots__ = ('index', 'indent', 'minify', 'result')
+
+    def __init__(self, index, indent, minify):
+        self.index = index
+        self.indent = indent
+        self.minify = minify
+        self.result = None
+
+
+def _iter_split(renderer, node, indent, parts):
+    # Like _Renderer.iter_compile(), but yield a _Part in place of each part
+    # of the tree, skipping its nodes and the line breaks between them
+    # Map the first node of each part to the part's index and last node
+    part_indexes = dict((id(part[0]), (index, part[-1]))
+                        for index, part in enumerate(parts))
+    renderer._newlines = {0: "".join(("\n", indent))}
+    stack = [iter(((node, 0), ))]
+    lastnode = None
+    while stack:
+        for item in stack[-1]:
+            if lastnode is not None:
+                if item.__class__ is tuple and item[0] is lastnode:
+                    lastnode = None
+                continue
+            if item.__class__ is tuple:
+                child, subindent = item
+                part = part_indexes.get(id(child))
+                if part is not None:
+                    index, last = part
+                    # The parts inside PRESERVE_WHITESPACE elements are
+                    # formatted also when minifying
+                    yield _Part(index,
+                                _Renderer.newline(renderer, subindent)[1:],
+                                renderer.MINIFY and
+                                subindent not in renderer._preserved)
+                    if last is not child:
+                        lastnode = last
+                    continue
+                stack.append(iter(child._render(renderer, subindent)))
+                break
+            yield item
+        else:
+            stack.pop()
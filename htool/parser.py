@@ -0,0 +1,237 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+try:
+    from html.parser import HTMLParser
+except ImportError:
+    # Python 2
+    from HTMLParser import HTMLParser
+
+from . import tags
+from .dom import (_HTMLElement, _HTMLVoidElement, _HTMLSamelineElement,
+                  _HTMLSamelineVoidElement)
+from .misc import Comment, Doctype, ElementContainer
+from .text import TextRaw
+
+# The elements that are implicitly closed by a sibling with the same tag
+_SELF_CLOSING = frozenset(('li', 'p', 'td', 'th', 'tr', 'option', 'dt',
+                           'dd'))
+
+
+class GenericElement(_HTMLSamelineElement):
+    """
+    Element with an arbitrary tag, e.g. for custom elements.
+    """
+    __slots__ = ()
+
+    def __init__(self, tag, *children, **attributes):
+        super(GenericElement, self).__init__(*children, **attributes)
+        self.tag = tag
+
+
+class GenericVoidElement(_HTMLSamelineVoidElement):
+    """
+    Void element with an arbitrary tag.
+    """
+    __slots__ = ()
+
+    def __init__(self, tag, **attributes):
+        super(GenericVoidElement, self).__init__(**attributes)
+        self.tag = tag
+
+
+def _map_tags():
+    classes = {}
+    for name in dir(tags):
+        cls = getattr(tags, name)
+        if (isinstance(cls, type) and issubclass(cls, _HTMLElement) and
+                cls.TAG is not None):
+            classes[cls.TAG] = cls
+    return classes
+
+
+class Parser(object):
+    """
+    Incremental HTML parser that builds htool trees.
+
+    Feed the source in chunks of any size with feed(), then call close() to
+    get the root ElementContainer. Tags are mapped to the htool.tags classes,
+    and unknown tags to GenericElement or GenericVoidElement; attributes are
+    set in the source order. Texts, comments and other markup are kept as
+    TextRaw objects with their source text, so that their character
+    references are not escaped a second time; attribute values are unescaped
+    by the parser instead, and escaped again as usual when compiled.
+
+    If 'callback' is given, it's called with each element as soon as its end
+    tag (or the end of its parent) is parsed: if it returns a true value, the
+    element is removed from its parent, so that large documents can be
+    processed without keeping them whole in memory.
+    """
+    TAG_CLASSES = None
+
+    def __init__(self, callback=None):
+        if Parser.TAG_CLASSES is None:
+            Parser.TAG_CLASSES = _map_tags()
+        self.callback = callback
+        self.root = ElementContainer()
+        self._builder = _TreeBuilder(self)
+        # The open elements, starting from the root
+        self._stack = [self.root]
+        # The pieces of the text being parsed
+        self._text = []
+
+    def feed(self, data):
+        self._builder.feed(data)
+
+    def close(self):
+        """
+        Parse the remaining data, close the open elements, and return the root.
+        """
+        self._builder.close()
+        self._flush_text()
+        while len(self._stack) > 1:
+            self._close_element()
+        return self.root
+
+    def _flush_text(self):
+        if self._text:
+            self._stack[-1].append_child(TextRaw("".join(self._text)))
+            self._text = []
+
+    def _close_element(self):
+        element = self._stack.pop()
+        if self.callback is not None and self.callback(element):
+            # The element is always its parent's last child here
+            self._stack[-1].children.pop()
+
+    def _start(self, tag, attrs, closed):
+        self._flush_text()
+        if (tag in _SELF_CLOSING and
+                getattr(self._stack[-1], 'tag', None) == tag):
+            self._close_element()
+        cls = self.TAG_CLASSES.get(tag)
+        if cls is None:
+            if closed:
+                element = GenericVoidElement(tag)
+            else:
+                element = GenericElement(tag)
+        else:
+            element = cls()
+        for name, value in attrs:
+            element.set_attribute(name, value)
+        self._stack[-1].append_child(element)
+        if closed or isinstance(element, _HTMLVoidElement):
+            if self.callback is not None and self.callback(element):
+                self._stack[-1].children.pop()
+        else:
+            self._stack.append(element)
+
+    def _end(self, tag):
+        self._flush_text()
+        # Close the elements that were left open inside the closed one; end
+        # tags without a start tag are ignored
+        for index in range(len(self._stack) - 1, 0, -1):
+            if self._stack[index].tag == tag:
+                while len(self._stack) > index:
+                    self._close_element()
+                break
+
+    def _append(self, node):
+        self._flush_text()
+        self._stack[-1].append_child(node)
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self, parser):
+        try:
+            HTMLParser.__init__(self, convert_charrefs=False)
+        except TypeError:
+            # Python 2 never converts character references
+            HTMLParser.__init__(self)
+        self.parser = parser
+        # Whether a character reference was just parsed, see updatepos()
+        self._reference = False
+
+    def handle_starttag(self, tag, attrs):
+        self.parser._start(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self.parser._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        self.parser._end(tag)
+
+    def handle_data(self, data):
+        self.parser._text.append(data)
+
+    def handle_entityref(self, name):
+        self._reference = True
+
+    def handle_charref(self, name):
+        self._reference = True
+
+    def updatepos(self, i, j):
+        # The references are handled without their final ';', which is
+        # optional, but the parser moves past them right after, so their
+        # source text is kept from here
+        if self._reference:
+            self._reference = False
+            self.parser._text.append(self.rawdata[i:j])
+        return HTMLParser.updatepos(self, i, j)
+
+    def handle_comment(self, data):
+        self.parser._append(Comment(data))
+
+    def handle_decl(self, decl):
+        if decl.lower() == 'doctype html':
+            self.parser._append(Doctype())
+        else:
+            self.parser._text.append(decl.join(('<!', '>')))
+
+    def handle_pi(self, data):
+        self.parser._text.append(data.join(('<?', '>')))
+
+    def unknown_decl(self, data):
+        # The data of a CDATA section ends before its ']]>'
+        if data.startswith('CDATA['):
+            self.parser._text.append(data.join(('<![', ']]>')))
+        else:
+            self.parser._text.append(data.join(('<![', ']>')))
+
+
+def parse(source, callback=None):
+    """
+    Parse an HTML string, or a file-like object in chunks, see Parser.
+    """
+    parser = Parser(callback=callback)
+    if hasattr(source, 'read'):
+        while True:
+            chunk = source.read(64 * 1024)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    else:
+        parser.feed(source)
+    return parser.close()
@@ -0,0 +1,254 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import threading
+from timeit import default_timer
+
+from . import dom, tables, text
+from .dom import _HTMLElement, _Renderer
+from .text import _STRING_TYPES, TextEscapedCached
+
+# The profile being recorded, see Profile.__enter__()
+_active = None
+
+# The columns of the statistics of each element class or tag
+COLUMNS = ('count', 'cumulative', 'self', 'output', 'cumulative_output')
+
+
+def profile():
+    """
+    Return a context that profiles the compilations run inside it, e.g.:
+
+        with htool.profile() as p:
+            document.compile()
+        print(p.table())
+
+    See Profile.
+    """
+    return Profile()
+
+
+class Profile(object):
+    """
+    Compilation statistics per element class and per tag.
+
+    For each class and tag the statistics are the number of compiled nodes,
+    their cumulative and self compilation time in seconds (the cumulative
+    time of nested nodes of the same class is counted at each level, like
+    the output), and the length of their own output (e.g. the tags) and of
+    their whole compiled output. The profile also counts the calls to the
+    escape functions of the _Text classes, and the hits and misses of the
+    render cache and of TextEscapedCached's default cache.
+
+    Only the compilations in the thread that entered the profile are
+    recorded, i.e. not those of other threads, nor the subtrees compiled by
+    other processes with compile(workers=...), and the Template and
+    asynchronous compilations are not broken down by node. Only one profile
+    can be recorded at a time in the process: while it is, the hook of the
+    renderers (see _Renderer.HOOK) is set, and the escape functions of the
+    htool.text and htool.tables modules are replaced, so that otherwise
+    profiling costs nothing. The escape functions imported by name by other
+    modules, or called through references kept since before the profile was
+    entered, are not counted.
+    """
+    def __init__(self):
+        self.classes = {}
+        self.tags = {}
+        self.escape_calls = 0
+        self.render_cache = [0, 0]
+        self.escape_cache = [0, 0]
+        self._saved = None
+
+    def __enter__(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("Another profile is already being recorded")
+        _active = self
+        self._saved = (text._escape,
+                       text._escape_unicode,
+                       tuple(dom._render_cache_stats),
+                       TextEscapedCached.CACHE.info())
+        thread = threading.current_thread()
+        _Renderer.HOOK = _Hook(self, thread)
+        escape = self._count_calls(text._escape, thread)
+        escape_unicode = self._count_calls(text._escape_unicode, thread)
+        text._escape = tables._escape = escape
+        text._escape_unicode = tables._escape_unicode = escape_unicode
+        # Keep escaping the table columns in one pass
+        tables._BATCH_ESCAPES[escape] = tables._BATCH_ESCAPES[
+            self._saved[0]]
+        tables._BATCH_ESCAPES[escape_unicode] = tables._BATCH_ESCAPES[
+            self._saved[1]]
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        global _active
+        del tables._BATCH_ESCAPES[text._escape]
+        del tables._BATCH_ESCAPES[text._escape_unicode]
+        (text._escape, text._escape_unicode, render_cache,
+         escape_cache) = self._saved
+        tables._escape = text._escape
+        tables._escape_unicode = text._escape_unicode
+        _Renderer.HOOK = None
+        self._saved = None
+        _active = None
+        self.render_cache[0] += dom._render_cache_stats[0] - render_cache[0]
+        self.render_cache[1] += dom._render_cache_stats[1] - render_cache[1]
+        info = TextEscapedCached.CACHE.info()
+        self.escape_cache[0] += info.hits - escape_cache.hits
+        self.escape_cache[1] += info.misses - escape_cache.misses
+
+    def _count_calls(self, escape, thread):
+        def count_calls(rawtext):
+            if threading.current_thread() is thread:
+                self.escape_calls += 1
+            return escape(rawtext)
+        return count_calls
+
+    def _record(self, node, cumulative, self_time, output, cumulative_output):
+        keys = [(self.classes, node.__class__.__name__)]
+        if isinstance(node, _HTMLElement):
+            keys.append((self.tags, node.tag))
+        for stats, key in keys:
+            try:
+                values = stats[key]
+            except KeyError:
+                values = stats[key] = [0, 0.0, 0.0, 0, 0]
+            values[0] += 1
+            values[1] += cumulative
+            values[2] += self_time
+            values[3] += output
+            values[4] += cumulative_output
+
+    def as_dict(self):
+        """
+        Return the statistics as a dictionary of plain types.
+        """
+        return {
+            'classes': dict((key, dict(zip(COLUMNS, values)))
+                            for key, values in self.classes.items()),
+            'tags': dict((key, dict(zip(COLUMNS, values)))
+                         for key, values in self.tags.items()),
+            'escape_calls': self.escape_calls,
+            'render_cache': {'hits': self.render_cache[0],
+                             'misses': self.render_cache[1]},
+            'escape_cache': {'hits': self.escape_cache[0],
+                             'misses': self.escape_cache[1]},
+        }
+
+    def table(self, by='classes', sort='cumulative', limit=None):
+        """
+        Return the statistics as a text table.
+
+        'by' is 'classes' or 'tags', 'sort' is the column to sort by in
+        descending order (see COLUMNS), and 'limit' the maximum number of
+        rows.
+        """
+        stats = getattr(self, by)
+        column = COLUMNS.index(sort)
+        rows = sorted(stats.items(), key=lambda item: item[1][column],
+                      reverse=True)[:limit]
+        name = 'class' if by == 'classes' else 'tag'
+        width = max([len(name)] + [len(key) for key, _ in rows])
+        lines = ['{:<{}} {:>9} {:>12} {:>12} {:>12} {:>12}'.format(
+            name, width, 'count', 'cumul. (ms)', 'self (ms)', 'output',
+            'cumul. out.')]
+        for key, values in rows:
+            lines.append('{:<{}} {:>9} {:>12.3f} {:>12.3f} {:>12} {:>12}'
+                         .format(key, width, values[0], values[1] * 1000,
+                                 values[2] * 1000, values[3], values[4]))
+        lines.append('escape calls: {}, render cache hits/misses: {}/{}, '
+                     'escape cache hits/misses: {}/{}'.format(
+                         self.escape_calls, self.render_cache[0],
+                         self.render_cache[1], self.escape_cache[0],
+                         self.escape_cache[1]))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.table()
+
+
+class _Hook(object):
+    # The hook of the renderers while a profile is recorded, see
+    # _Renderer.HOOK; the time spent by the consumer between the chunks
+    # yielded by iter_compile() is excluded
+    def __init__(self, profile, thread):
+        self.profile = profile
+        self.thread = thread
+        # Each frame is [start time, children's time, own output length,
+        # children's output length] of a node being compiled
+        self.stack = []
+        self.paused = 0.0
+
+    def iter_compile(self, iterator):
+        # The compilations nested in a node's, e.g. of its templates.Slot
+        # values, are paused with it
+        if self.stack or threading.current_thread() is not self.thread:
+            return iterator
+        return self._iter_paused(iterator)
+
+    def _iter_paused(self, iterator):
+        timer = default_timer
+        for chunk in iterator:
+            start = timer()
+            yield chunk
+            self.paused += timer() - start
+
+    def render(self, renderer, node, indent):
+        if threading.current_thread() is not self.thread:
+            return iter(node._render(renderer, indent))
+        return self._iter_render(renderer, node, indent)
+
+    def _iter_render(self, renderer, node, indent):
+        timer = default_timer
+        frame = [timer() - self.paused, 0.0, 0, 0]
+        self.stack.append(frame)
+        try:
+            for item in node._render(renderer, indent):
+                if item.__class__ is not tuple:
+                    if isinstance(item, _STRING_TYPES):
+                        frame[2] += len(item)
+                    else:
+                        # _FileRegion
+                        frame[2] += item.size
+                yield item
+        finally:
+            # Also if the compilation is interrupted
+            self.stack.pop()
+        elapsed = timer() - self.paused - frame[0]
+        output = frame[2] + frame[3]
+        self.profile._record(node, elapsed, elapsed - frame[1], frame[2],
+                             output)
+        if self.stack:
+            parent = self.stack[-1]
+            parent[1] += elapsed
+            parent[3] += output
+
+    def cached(self, node, compiled):
+        if threading.current_thread() is not self.thread:
+            return
+        self.profile._record(node, 0.0, 0.0, 0, len(compiled))
+        if self.stack:
+            self.stack[-1][3] += len(compiled)
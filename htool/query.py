@@ -0,0 +1,612 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+# CSS selectors over htool trees, see _ElementContainer.select()
+# Supported are the type, universal, id, class and attribute ([a], [a=v],
+# [a~=v], [a|=v], [a^=v], [a$=v], [a*=v]) selectors, the :first-child,
+# :last-child, :only-child, :nth-child(), :nth-last-child() and :not()
+# pseudo-classes, the descendant, child (>), adjacent sibling (+) and general
+# sibling (~) combinators, and selector lists (,)
+
+import re
+
+from . import dom
+from .dom import _ElementContainer, _HTMLElement
+from .text import _STRING_TYPES
+
+# Maximum number of compiled selectors that are cached
+SELECTOR_CACHE_SIZE = 256
+_SELECTORS = {}
+# The index of the tree (see _ElementContainer.enable_index()) is used to find
+# the candidate elements of the rightmost compound only if they are fewer than
+# this fraction of the indexed elements, since they must then be sorted in
+# document order
+INDEX_MAX_FRACTION = 0.25
+
+_TOKEN = re.compile(r"""
+    \s*(?P<combinator>[>+~,])\s*
+  | (?P<space>\s+)
+  | (?P<universal>\*)
+  | (?P<tag>[-\w]+)
+  | \#(?P<id>[-\w]+)
+  | \.(?P<class>[-\w]+)
+  | \[\s*(?P<attr>[-\w:]+)\s*
+      (?:(?P<op>[~|^$*]?=)\s*
+         (?:"(?P<dquoted>[^"]*)"|'(?P<squoted>[^']*)'|(?P<value>[-\w]+))\s*
+      )?\]
+  | :(?P<pseudo>[-\w]+)(?:\(\s*(?P<argument>[^)]*?)\s*\))?
+""", re.VERBOSE | re.UNICODE)
+
+# The alternatives of _TOKEN, whose 'lastgroup' may be a nested group
+_KINDS = ('combinator', 'space', 'universal', 'tag', 'id', 'class', 'attr',
+          'pseudo')
+
+_NTH = re.compile(r'^([-+]?\d*)n\s*(?:([-+])\s*(\d+))?$')
+
+
+def select(root, selector):
+    """
+    Return the list of the descendants of 'root' that match the selector, in
+    document order.
+    """
+    return list(iter_select(root, selector))
+
+
+def iter_select(root, selector):
+    tag, attribute, keys, match, test, context = _compile(selector)
+    # The results of the compound selectors, see _compile_chain()
+    cache = {}
+    if keys is not None and dom._index_used:
+        candidates = _get_indexed_candidates(root, keys)
+        if candidates is not None:
+            return iter([element for element in candidates
+                         if match(element, cache)])
+    return _iter_walk(root, tag, attribute, test, context, cache)
+
+
+def _iter_walk(root, tag, attribute, test, context, cache):
+    # Like htool.index._iter_elements(), but the root itself is not included,
+    # as in querySelectorAll(), and the elements with a different tag than
+    # the rightmost compound's, or without an attribute that it tests, are
+    # skipped without calling test(); context() tells if the parent of the
+    # elements matches the rest of the selector, and is called once for each
+    # parent; the node classes are also tested once, and the containers of
+    # a single leaf node, e.g. some text, are not entered
+    kinds = {}
+    contexts = {}
+    stack = [iter(root.children)]
+    while stack:
+        for node in stack[-1]:
+            try:
+                kind = kinds[node.__class__]
+            except KeyError:
+                kind = _get_node_kind(node, kinds)
+            if (kind & 1 and
+                    (tag is None or node.tag == tag) and
+                    (attribute is None or attribute in node.attributes)):
+                if context is None:
+                    matched = True
+                else:
+                    parent = node.parent_element
+                    matched = contexts.get(parent)
+                    if matched is None:
+                        matched = contexts[parent] = context(parent, cache)
+                if matched and (test is None or test(node, cache)):
+                    yield node
+            if kind & 2:
+                children = node.children
+                if len(children) > 1:
+                    stack.append(iter(children))
+                    break
+                if children:
+                    child = children[0]
+                    try:
+                        child_kind = kinds[child.__class__]
+                    except KeyError:
+                        child_kind = _get_node_kind(child, kinds)
+                    if child_kind:
+                        stack.append(iter(children))
+                        break
+        else:
+            stack.pop()
+
+
+def _get_node_kind(node, kinds):
+    # Return 1 for HTML elements, 2 for the other element containers, 3 for
+    # the HTML element containers, 0 for the other nodes
+    class_ = node.__class__
+    kind = kinds[class_] = (issubclass(class_, _HTMLElement) |
+                            issubclass(class_, _ElementContainer) << 1)
+    return kind
+
+
+def _get_indexed_candidates(root, keys):
+    # Return the descendants of 'root' in document order that have the id,
+    # class name or tag of the rightmost compound, from the nearest index of
+    # 'root' or of its ancestors, or None if there's no index or it's not
+    # worth using
+    indexes = root._get_indexes()
+    if not indexes:
+        return None
+    index = indexes[0]
+    id_, cname, tag = keys
+    candidates = None
+    for mapping, key in ((index.ids, id_), (index.classes, cname),
+                         (index.tags, tag)):
+        if key is not None:
+            elements = mapping.get(key, ())
+            if candidates is None or len(elements) < len(candidates):
+                candidates = elements
+    if candidates is None:
+        return None
+    if len(candidates) > 1 and len(candidates) > INDEX_MAX_FRACTION * sum(
+            len(elements) for elements in index.tags.values()):
+        return None
+    # The index may also contain the root and, if it's an ancestor's, other
+    # elements than the root's descendants; the paths from the root are the
+    # sort keys in document order
+    if len(candidates) == 1:
+        return [element for element in candidates
+                if _is_descendant(element, root)]
+    paths = {}
+    positions = {}
+    for element in candidates:
+        path = []
+        node = element
+        while node is not root:
+            parent = node.parent_element
+            if parent is None:
+                break
+            try:
+                children = positions[parent]
+            except KeyError:
+                children = positions[parent] = dict(
+                    (child, position)
+                    for position, child in enumerate(parent.children))
+            path.append(children[node])
+            node = parent
+        else:
+            if path:
+                paths[element] = path[::-1]
+    return sorted(paths, key=paths.__getitem__)
+
+
+def _is_descendant(element, root):
+    node = element.parent_element
+    while node is not None:
+        if node is root:
+            return True
+        node = node.parent_element
+    return False
+
+
+def compile_selector(selector):
+    """
+    Return a function that tests if an element matches the selector.
+
+    The function takes the element and a dictionary, used as a cache while
+    matching the elements of the same tree, as long as the tree isn't
+    modified.
+    """
+    return _compile(selector)[3]
+
+
+def _compile(selector):
+    # Return the tag that all the matching elements have, or None, the name
+    # of an attribute that they all have, or None, the (id, class name, tag)
+    # keys of the rightmost compound in an ElementIndex, or None, the
+    # matching function, and its split for _iter_walk(), i.e. the test of
+    # the elements that have the tag, or None, and the test of their parent,
+    # or None
+    try:
+        return _SELECTORS[selector]
+    except KeyError:
+        pass
+    selectors = _parse(selector)
+    chains = [_compile_chain(compounds) for compounds in selectors]
+    if len(chains) == 1:
+        match = chains[0]
+        test, context = match.test, match.context
+    else:
+        def match(element, cache):
+            for chain in chains:
+                if chain(element, cache):
+                    return True
+            return False
+        test, context = match, None
+    tags = set(compounds[0][1] for compounds in selectors)
+    attributes = set(_get_required_attribute(compounds[0][2])
+                     for compounds in selectors)
+    keys = None
+    if len(selectors) == 1:
+        keys = _get_index_keys(selectors[0][0])
+    compiled = (tags.pop() if len(tags) == 1 else None,
+                attributes.pop() if len(attributes) == 1 else None,
+                keys,
+                match,
+                test,
+                context)
+    if len(_SELECTORS) < SELECTOR_CACHE_SIZE:
+        _SELECTORS[selector] = compiled
+    return compiled
+
+
+def _get_required_attribute(tests):
+    # Return the name of an attribute that the elements matching the compound
+    # must have, or None
+    for test in tests:
+        name = getattr(test, 'attribute', None)
+        if name is not None:
+            return name
+    return None
+
+
+def _get_index_keys(compound):
+    # Return the (id, class name, tag) keys of the compound in an
+    # ElementIndex, or None
+    _, tag, tests = compound
+    id_ = cname = None
+    for test in tests:
+        if test is None:
+            continue
+        if getattr(test, 'attribute', None) == 'id':
+            id_ = test.value
+        elif getattr(test, 'attribute', None) == 'class':
+            cname = test.value
+    if id_ is None and cname is None and tag is None:
+        return None
+    return (id_, cname, tag)
+
+
+def _parse(selector):
+    # Return the list of the complex selectors, each as a list of
+    # (combinator, tag, tests) tuples, from right to left; 'combinator'
+    # relates the compound to the next one, i.e. the one on its left in the
+    # selector, and 'tag' is None for any tag
+    selectors = []
+    compounds = []
+    tag = None
+    tests = []
+    combinator = None
+    pos = 0
+    selector = selector.strip()
+    while pos < len(selector):
+        token = _TOKEN.match(selector, pos)
+        if token is None:
+            raise ValueError("Invalid selector at position {}: {!r}".format(
+                pos, selector))
+        pos = token.end()
+        kind = _get_kind(token)
+        if kind in ('combinator', 'space'):
+            if not tests:
+                raise ValueError("Invalid selector at position {}: {!r}"
+                                 .format(token.start(), selector))
+            compounds.append((combinator, tag, tests))
+            tag = None
+            tests = []
+            if kind == 'space':
+                combinator = ' '
+            elif token.group('combinator') == ',':
+                selectors.append(compounds[::-1])
+                compounds = []
+                combinator = None
+            else:
+                combinator = token.group('combinator')
+        elif kind == 'tag':
+            # Tested directly by the compound, see _compile_compound()
+            tag = token.group('tag').lower()
+            tests.append(None)
+        else:
+            tests.append(_compile_test(token))
+    if not tests:
+        raise ValueError("Invalid selector: {!r}".format(selector))
+    compounds.append((combinator, tag, tests))
+    selectors.append(compounds[::-1])
+    return selectors
+
+
+def _get_kind(token):
+    for kind in _KINDS:
+        if token.group(kind) is not None:
+            return kind
+
+
+def _compile_test(token):
+    kind = _get_kind(token)
+    if kind == 'universal':
+        return None
+    if kind == 'tag':
+        tag = token.group('tag').lower()
+        return lambda element, cache: element.tag == tag
+    if kind == 'id':
+        id_ = token.group('id')
+
+        def test(element, cache):
+            return _get_value(element, 'id') == id_
+        return _describe(test, 'id', id_)
+    if kind == 'class':
+        cname = token.group('class')
+
+        def test(element, cache):
+            attribute = element.attributes.get('class')
+            if attribute is None or attribute[1] is None:
+                return False
+            classes = attribute[1].raw
+            if not isinstance(classes, _STRING_TYPES):
+                classes = attribute[1].escaped
+            return classes == cname or cname in classes.split()
+        return _describe(test, 'class', cname)
+    if kind == 'attr':
+        return _compile_attribute(token)
+    return _compile_pseudo(token.group('pseudo'), token.group('argument'))
+
+
+def _describe(test, attribute, value=None):
+    # Record the attribute that the elements passing the test must have, and
+    # the id or class name that they must have, see _compile()
+    test.attribute = attribute
+    test.value = value
+    return test
+
+
+def _get_value(element, name):
+    # Like htool.index._get_key(), inlined for speed
+    attribute = element.attributes.get(name)
+    if attribute is None or attribute[1] is None:
+        return None
+    value = attribute[1].raw
+    if isinstance(value, _STRING_TYPES):
+        return value
+    return attribute[1].escaped
+
+
+def _compile_attribute(token):
+    name = token.group('attr').lower()
+    op = token.group('op')
+    if op is None:
+        return _describe(lambda element, cache: name in element.attributes,
+                         name)
+    value = next(group for group in (token.group('dquoted'),
+                                     token.group('squoted'),
+                                     token.group('value'))
+                 if group is not None)
+    compare = {
+        '=': lambda actual: actual == value,
+        '~=': lambda actual: value in actual.split(),
+        '|=': lambda actual: actual == value or actual.startswith(
+            value + '-'),
+        '^=': lambda actual: bool(value) and actual.startswith(value),
+        '$=': lambda actual: bool(value) and actual.endswith(value),
+        '*=': lambda actual: bool(value) and value in actual,
+    }[op]
+
+    def test(element, cache):
+        actual = _get_value(element, name)
+        return actual is not None and compare(actual)
+    return _describe(test, name)
+
+
+def _compile_pseudo(name, argument):
+    name = name.lower()
+    if name == 'not':
+        tests = []
+        pos = 0
+        argument = argument or ''
+        while pos < len(argument):
+            token = _TOKEN.match(argument, pos)
+            if token is None or _get_kind(token) in ('combinator', 'space'):
+                raise ValueError("Invalid argument of :not(): {!r}".format(
+                    argument))
+            tests.append(_compile_test(token))
+            pos = token.end()
+        compound = _compile_compound(tests)
+        if compound is None:
+            return lambda element, cache: False
+        return lambda element, cache: not compound(element, cache)
+    if name == 'first-child':
+        step, offset, last = 0, 1, False
+    elif name == 'last-child':
+        step, offset, last = 0, 1, True
+    elif name == 'only-child':
+        return lambda element, cache: _get_position(element, cache) == (1, 1)
+    elif name in ('nth-child', 'nth-last-child'):
+        step, offset = _parse_nth(argument)
+        last = name == 'nth-last-child'
+    else:
+        raise ValueError("Unsupported pseudo-class: {!r}".format(name))
+
+    def test(element, cache):
+        position, count = cache.get(element) or _get_position(element, cache)
+        if last:
+            position = count - position + 1
+        if step == 0:
+            return position == offset
+        return ((position - offset) % step == 0 and
+                (position - offset) // step >= 0)
+    return test
+
+
+def _parse_nth(argument):
+    # Return the (a, b) tuple of the an+b expression
+    argument = (argument or '').strip().lower()
+    if argument == 'odd':
+        return (2, 1)
+    if argument == 'even':
+        return (2, 0)
+    match = _NTH.match(argument)
+    if match is None:
+        try:
+            return (0, int(argument))
+        except ValueError:
+            raise ValueError("Invalid :nth-child() argument: {!r}".format(
+                argument))
+    step, sign, offset = match.groups()
+    step = int(step + '1') if step in ('', '-', '+') else int(step)
+    offset = int(offset) if offset else 0
+    return (step, -offset if sign == '-' else offset)
+
+
+def _get_siblings(parent, cache):
+    # Return the HTML elements among the parent's children
+    key = (_get_siblings, parent)
+    try:
+        return cache[key]
+    except KeyError:
+        siblings = cache[key] = [child for child in parent.children
+                                 if isinstance(child, _HTMLElement)]
+        return siblings
+
+
+def _get_position(element, cache):
+    # Return the 1-based position of the element among its parent's HTML
+    # elements, and their count; the positions of all the siblings are
+    # computed at once
+    try:
+        return cache[element]
+    except KeyError:
+        pass
+    parent = element.parent_element
+    if parent is None:
+        return (1, 1)
+    siblings = _get_siblings(parent, cache)
+    count = len(siblings)
+    for position, sibling in enumerate(siblings, 1):
+        cache[sibling] = (position, count)
+    return cache.get(element, (1, 1))
+
+
+def _compile_compound(tests):
+    # The universal selector has no test, and the tags of the compounds are
+    # tested directly, see _compile_chain(); return None if no test is left
+    tests = [test for test in tests if test is not None]
+    if not tests:
+        return None
+    if len(tests) == 1:
+        return tests[0]
+
+    def compound(element, cache):
+        for test in tests:
+            if not test(element, cache):
+                return False
+        return True
+    return compound
+
+
+def _compile_chain(compounds):
+    # Match the compounds from right to left, so that most elements are
+    # rejected by the rightmost compound without looking at their ancestors
+    parts = [(tag, _compile_compound(tests), combinator)
+             for combinator, tag, tests in compounds]
+    length = len(parts)
+    # The keys of the memos of match_ancestors() and match_siblings() in the
+    # cache, by index
+    ancestor_keys = [object() for _ in parts]
+    sibling_keys = [object() for _ in parts]
+
+    def match(element, cache, index=0):
+        tag, test, combinator = parts[index]
+        if tag is not None and element.tag != tag:
+            return False
+        if test is not None and not test(element, cache):
+            return False
+        index += 1
+        if index == length:
+            return True
+        if combinator == '>':
+            parent = element.parent_element
+            return (isinstance(parent, _HTMLElement) and
+                    match(parent, cache, index))
+        if combinator == ' ':
+            return match_ancestors(element.parent_element, cache, index)
+        position = _get_position(element, cache)[0]
+        if position == 1:
+            return False
+        siblings = _get_siblings(element.parent_element, cache)
+        if combinator == '+':
+            return match(siblings[position - 2], cache, index)
+        return match_siblings(siblings, position - 2, cache, index)
+
+    def match_ancestors(node, cache, index=1):
+        # Tell if 'node' or any of its ancestors matches the compounds from
+        # 'index'; the result is remembered for all the nodes walked, since
+        # the other descendants of the same subtree would test them again;
+        # the default index is for match.context
+        try:
+            memo = cache[ancestor_keys[index]]
+        except KeyError:
+            memo = cache[ancestor_keys[index]] = {}
+        walked = []
+        while node is not None:
+            found = memo.get(node)
+            if found is not None:
+                break
+            walked.append(node)
+            if isinstance(node, _HTMLElement) and match(node, cache, index):
+                found = True
+                break
+            node = node.parent_element
+        else:
+            found = False
+        for node in walked:
+            memo[node] = found
+        return found
+
+    def match_siblings(siblings, position, cache, index):
+        # Like match_ancestors(), for the siblings up to the 0-based
+        # 'position'
+        try:
+            memo = cache[sibling_keys[index]]
+        except KeyError:
+            memo = cache[sibling_keys[index]] = {}
+        walked = []
+        while position >= 0:
+            sibling = siblings[position]
+            found = memo.get(sibling)
+            if found is not None:
+                break
+            walked.append(sibling)
+            if match(sibling, cache, index):
+                found = True
+                break
+            position -= 1
+        else:
+            found = False
+        for sibling in walked:
+            memo[sibling] = found
+        return found
+
+    # See _compile()
+    match.test = parts[0][1]
+    if length == 1:
+        match.context = None
+    elif parts[0][2] == '>':
+        match.context = lambda parent, cache: (
+            isinstance(parent, _HTMLElement) and match(parent, cache, 1))
+    elif parts[0][2] == ' ':
+        match.context = match_ancestors
+    else:
+        match.test = lambda element, cache: match(element, cache)
+        match.context = None
+    return match
@@ -0,0 +1,292 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+from .dom import _Node, _TextNode, _Fragment
+from .tags import Td, Th, Tr
+from .text import (_escape, _escape_unicode, _ESCAPABLE, _NUMBER_TYPES,
+                   _SIGNIFICANT, _STRING_TYPES, _Text, TextEscaped)
+
+# The characters escaped by the escape functions, see _escape_column()
+_BATCH_ESCAPES = {_escape: _ESCAPABLE, _escape_unicode: _SIGNIFICANT}
+
+
+def _get_escape(Escape, unicode=False):
+    # Return a function that escapes a raw text with the Escape class, see
+    # _Text.escaped_unicode for 'unicode'
+    if unicode:
+        if Escape is TextEscaped:
+            return _escape_unicode
+        return lambda rawtext: Escape(rawtext).escaped_unicode
+    if Escape is TextEscaped:
+        return _escape
+    return lambda rawtext: Escape(rawtext).escaped
+
+
+class RowSource(_Fragment):
+    """
+    Table child that renders rows of plain data as Tr elements.
+
+    RowSource(rows) is compiled exactly like the rows appended with
+    append_data_rows(*rows), but no Tr, Td and text objects are created for
+    cells of plain data; rows containing nodes are still compiled as Tr
+    elements. 'rows' is iterated again each time the source is compiled, so
+    a generator can only be compiled once.
+    """
+    __slots__ = ('rows', 'header', 'row_attributes', '_layout')
+    _TRANSIENT_SLOTS = ('_layout', )
+
+    def __init__(self, rows, header=False, **row_attributes):
+        super(RowSource, self).__init__()
+        self.rows = rows
+        self.header = header
+        self.row_attributes = row_attributes
+        # The markup for the last renderer and indentation, see _get_layout()
+        self._layout = None
+
+    def _generate_nodes(self):
+        direct = self._is_direct(Tr) and self._is_direct(
+            Th if self.header else Td)
+        for cells in self.rows:
+            if not isinstance(cells, (list, tuple)):
+                cells = tuple(cells)
+            if direct and not any(isinstance(cell, _Node) for cell in cells):
+                yield _Row(self, cells)
+            else:
+                yield self._make_tr(cells)
+
+    @staticmethod
+    def _is_direct(cls):
+        # The direct rendering reproduces the formatting of the standard
+        # classes only
+        return (cls.BREAK_BEFORE and cls.BREAK_AFTER and
+                cls.AUTOINDENT_MULTILINE and
+                not _TextNode.BREAK_BEFORE and not _TextNode.BREAK_AFTER)
+
+    def _make_tr(self, cells):
+        row = Tr(**self.row_attributes)
+        row.parent_element = self.parent_element
+        if self.header:
+            row.append_header_cells(*cells)
+        else:
+            row.append_data_cells(*cells)
+        return row
+
+    def _get_layout(self, renderer, indent):
+        layout = self._layout
+        if layout is None or layout[0] is not renderer or layout[1] != indent:
+            row = Tr(**self.row_attributes)
+            cell = (Th if self.header else Td)()
+            rowindent = renderer.indent(indent, row.INDENTATION)
+            cellindent = renderer.indent(rowindent, cell.INDENTATION)
+            rowstart = row._compose_start_tag(renderer.UNICODE).join(
+                ('<', '>'))
+            rowend = row.tag.join(('</', '>'))
+            cellstart = cell._compose_start_tag(renderer.UNICODE).join(
+                ('<', '>'))
+            cellend = cell.tag.join(('</', '>'))
+            layout = self._layout = (
+                renderer,
+                indent,
+                "".join((rowstart, rowend)),
+                "".join((rowstart, renderer.newline(rowindent))),
+                "".join((renderer.newline(indent), rowend)),
+                renderer.newline(rowindent),
+                cellstart,
+                cellend,
+                "".join((cellstart, renderer.newline(cellindent))),
+                "".join((renderer.newline(rowindent), cellend)),
+                _get_escape(cell.DefaultContentEscape, renderer.UNICODE))
+        return layout
+
+    def _render_row(self, renderer, indent, cells):
+        layout = self._get_layout(renderer, indent)
+        escape = layout[10]
+        texts = []
+        for cell in cells:
+            # Like in _ElementContainer.append_child(), None cells are empty
+            if cell is None:
+                texts.append('')
+            elif isinstance(cell, _Text):
+                texts.append(cell.escaped_unicode if renderer.UNICODE
+                             else cell.escaped)
+            else:
+                texts.append(escape(cell))
+        return self._join_row(layout, texts)
+
+    @staticmethod
+    def _join_row(layout, texts):
+        (_, _, emptyrow, rowstart, rowend, cellsep, cellstart, cellend,
+         cellstartbreak, cellendbreak, _) = layout
+        if not texts:
+            return emptyrow
+        chunks = []
+        for text in texts:
+            if "\n" in text:
+                chunks.append("".join((cellstartbreak, text, cellendbreak)))
+            else:
+                chunks.append("".join((cellstart, text, cellend)))
+        return "".join((rowstart, cellsep.join(chunks), rowend))
+
+
+class ColumnSource(RowSource):
+    """
+    Table child that renders columns of plain data as Tr elements.
+
+    ColumnSource(columns) is compiled like RowSource(zip(*columns)), but the
+    cells are converted to strings and escaped one column at a time.
+    'formats' can be a sequence with a format spec (as in Python's format())
+    or None for each column.
+
+    The columns can be sequences of strings, numbers, None or _Text objects,
+    or NumPy arrays (or objects with the same 'dtype', 'astype' and 'tolist'
+    interface, like pandas' Series): numeric arrays without a format spec are
+    converted in bulk with astype(str). NumPy is not required otherwise.
+    """
+    __slots__ = ('columns', 'formats', '_texts')
+    _TRANSIENT_SLOTS = ('_texts', )
+
+    def __init__(self, columns, formats=None, header=False,
+                 **row_attributes):
+        super(ColumnSource, self).__init__(None, header=header,
+                                           **row_attributes)
+        self.columns = columns
+        self.formats = formats
+        # The escaped columns for the current compilation, see _get_texts()
+        self._texts = None
+
+    def _generate_nodes(self):
+        if not (self._is_direct(Tr) and
+                self._is_direct(Th if self.header else Td)):
+            for cells in zip(*self.columns):
+                yield self._make_tr(cells)
+            return
+        # The columns are only escaped when the first row is compiled, since
+        # the escaping depends on the renderer
+        self._texts = None
+        if self.columns:
+            for index in range(min(len(column) for column in self.columns)):
+                yield _ColumnRow(self, index)
+
+    def _get_texts(self, unicode):
+        # Return the escaped columns
+        texts = self._texts
+        if texts is None or texts[0] is not unicode:
+            cell = Th if self.header else Td
+            escape = _get_escape(cell._resolve_escapes()[4], unicode)
+            formats = self.formats or ()
+            columns = []
+            for index, column in enumerate(self.columns):
+                spec = formats[index] if index < len(formats) else None
+                columns.append(self._format_column(column, spec, escape,
+                                                   unicode))
+            texts = self._texts = (unicode, columns)
+        return texts[1]
+
+    @staticmethod
+    def _format_column(column, spec, escape, unicode):
+        # Return the list of the escaped texts of the column's cells
+        dtype = getattr(column, 'dtype', None)
+        if dtype is not None:
+            if spec is None and getattr(dtype, 'kind', None) in ('b', 'i',
+                                                                 'u', 'f'):
+                # NumPy's string representations are the same as str()'s
+                return column.astype(str).tolist()
+            column = column.tolist()
+        types = set(map(type, column))
+        if spec is None:
+            if types <= set(_NUMBER_TYPES):
+                # No need to escape the numbers' representations
+                return list(map(str, column))
+            if types <= set(_STRING_TYPES):
+                return _escape_column(list(column), escape)
+        elif type(None) not in types and not any(issubclass(type_, _Text)
+                                                 for type_ in types):
+            return _escape_column([format(value, spec) for value in column],
+                                  escape)
+        # Mixed types, convert the cells one by one
+        texts = []
+        for value in column:
+            if value is None:
+                texts.append('')
+            elif isinstance(value, _Text):
+                texts.append(value.escaped_unicode if unicode
+                             else value.escaped)
+            elif spec is None:
+                texts.append(escape(value))
+            else:
+                texts.append(escape(format(value, spec)))
+        return texts
+
+    def _render_row(self, renderer, indent, index):
+        return self._join_row(self._get_layout(renderer, indent),
+                              [column[index] for column in
+                               self._get_texts(renderer.UNICODE)])
+
+
+def _escape_column(texts, escape):
+    # Escape all the texts in one pass; html_escape() and the character
+    # references replace single characters, and keep the \x00 separators
+    pattern = _BATCH_ESCAPES.get(escape)
+    if pattern is None:
+        return [escape(text) for text in texts]
+    joined = "\x00".join(texts)
+    if not pattern.search(joined):
+        return texts
+    escaped = escape(joined).split("\x00")
+    if len(escaped) != len(texts):
+        # Some texts contain \x00 characters themselves
+        return [escape(text) for text in texts]
+    return escaped
+
+
+class _Row(_Node):
+    # A row of plain data of a RowSource, compiled directly as markup
+    __slots__ = ('source', 'cells')
+    BREAK_BEFORE = True
+    BREAK_AFTER = True
+
+    def __init__(self, source, cells):
+        super(_Row, self).__init__()
+        self.source = source
+        self.cells = cells
+
+    def _render(self, renderer, indent):
+        return (self.source._render_row(renderer, indent, self.cells), )
+
+    def _scan_newline(self, renderer):
+        if self.cells:
+            # The cells are always on their own lines
+            return (True, None)
+        return ("\n" in Tr(**self.source.row_attributes)._compose_start_tag(),
+                None)
+
+
+class _ColumnRow(_Row):
+    # A row of a ColumnSource: 'cells' is the index of the row
+    __slots__ = ()
+
+    def _scan_newline(self, renderer):
+        # The rows always have cells
+        return (True, None)
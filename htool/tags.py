@@ -34,6 +34,8 @@ from .text import TextRaw
 
 
 class _List(_HTMLNewlineElement):
+    __slots__ = ()
+
     # This class is too coupled with this module to be moved to a separate one
     def append_item(self, item):
         if not isinstance(item, Li):
@@ -46,6 +48,8 @@ class _List(_HTMLNewlineElement):
 
 
 class _Table(_HTMLNewlineElement):
+    __slots__ = ()
+
     # This class is too coupled with this module to be moved to a separate one
     def append_header_row(self, *cells, **attributes):
         row = Tr(**attributes)
@@ -65,8 +69,37 @@ class _Table(_HTMLNewlineElement):
         for row in rows:
             self.append_data_row(*row, **attributes)
 
+    @classmethod
+    def from_rows(cls, rows, header=None, **attributes):
+        """
+        Create a table whose data rows are compiled from plain data.
+
+        'rows' is only iterated when the table is compiled, see RowSource.
+        """
+        from .tables import RowSource
+        table = cls(**attributes)
+        if header is not None:
+            table.append_header_row(*header)
+        table.append_child(RowSource(rows))
+        return table
+
+    @classmethod
+    def from_columns(cls, columns, header=None, formats=None, **attributes):
+        """
+        Create a table whose data rows are compiled from columns of data.
+
+        See ColumnSource for the accepted columns and 'formats'.
+        """
+        from .tables import ColumnSource
+        table = cls(**attributes)
+        if header is not None:
+            table.append_header_row(*header)
+        table.append_child(ColumnSource(columns, formats=formats))
+        return table
+
 
 class A(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'a'
 
     @classmethod
@@ -75,82 +108,102 @@ class A(_HTMLSamelineElement):
 
 
 class Abbr(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'abbr'
 
 
 class Address(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'address'
 
 
 class Area(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'area'
 
 
 class Article(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'article'
 
 
 class Aside(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'aside'
 
 
 class Audio(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'audio'
 
 
 class B(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'b'
 
 
 class Base(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'base'
 
 
 class Bdi(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'bdi'
 
 
 class Bdo(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'bdo'
 
 
 class Blockquote(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'blockquote'
 
 
 class Body(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'body'
 
 
 class Br(_HTMLEndlineVoidElement):
+    __slots__ = ()
     TAG = 'br'
 
 
 class Button(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'button'
 
 
 class Canvas(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'canvas'
 
 
 class Caption(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'caption'
 
 
 class Cite(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'cite'
 
 
 class Code(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'code'
 
 
 class Col(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'col'
 
 
 class Colgroup(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'colgroup'
 
     def populate(self, colN, classes=None):
@@ -168,154 +221,192 @@ class Colgroup(_HTMLNewlineElement):
 
 
 class Data(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'data'
 
 
 class Datalist(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'datalist'
 
 
 class Dd(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'dd'
 
 
 class Del(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'del'
 
 
 class Details(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'details'
 
 
 class Dfn(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'dfn'
 
 
 class Dialog(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'dialog'
 
 
 class Div(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'div'
 
 
 class Dl(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'dl'
 
 
 class Dt(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'dt'
 
 
 class Em(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'em'
 
 
 class Embed(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'embed'
 
 
 class Fieldset(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'fieldset'
 
 
 class Figcaption(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'figcaption'
 
 
 class Figure(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'figure'
 
 
 class Footer(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'footer'
 
 
 class Form(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'form'
 
 
 class H1(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'h1'
 
 
 class H2(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'h2'
 
 
 class H3(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'h3'
 
 
 class H4(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'h4'
 
 
 class H5(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'h5'
 
 
 class H6(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'h6'
 
 
 class Head(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'head'
 
 
 class Header(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'header'
 
 
 class Hgroup(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'hgroup'
 
 
 class Hr(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'hr'
 
 
 class Html(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'html'
 
 
 class I(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'i'
 
 
 class Iframe(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'iframe'
 
 
 class Img(_HTMLSamelineVoidElement):
+    __slots__ = ()
     TAG = 'img'
 
 
 class Input(_HTMLSamelineVoidElement):
+    __slots__ = ()
     TAG = 'input'
 
 
 class Ins(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'ins'
 
 
 class Kbd(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'kbd'
 
 
 class Label(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'label'
 
 
 class Legend(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'legend'
 
 
 class Li(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'li'
 
 
 class Link(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'link'
 
     @classmethod
@@ -328,111 +419,141 @@ class Link(_HTMLNewlineVoidElement):
 
 
 class Main(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'main'
 
 
 class Map(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'map'
 
 
 class Mark(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'mark'
 
 
 class Menu(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'menu'
 
 
 class Menuitem(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'menuitem'
 
 
 class Meta(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'meta'
 
 
 class Meter(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'meter'
 
 
 class Nav(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'nav'
 
 
 class Noscript(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'noscript'
 
 
 class Object(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'object'
 
 
 class Ol(_List):
+    __slots__ = ()
     TAG = 'ol'
 
 
 class Optgroup(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'optgroup'
 
 
 class Option(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'option'
 
 
 class Output(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'output'
 
 
 class P(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'p'
 
 
 class Param(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'param'
 
 
 class Picture(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'picture'
 
 
 class Pre(_HTMLPrelineElement):
+    __slots__ = ()
     TAG = 'pre'
+    PRESERVE_WHITESPACE = True
 
 
 class Progress(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'progress'
 
 
 class Q(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'q'
 
 
 class Rp(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'rp'
 
 
 class Rt(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'rt'
 
 
 class Rtc(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'rtc'
 
 
 class Ruby(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'ruby'
 
 
 class S(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 's'
 
 
 class Samp(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'samp'
 
 
 class Script(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'script'
+    PRESERVE_WHITESPACE = True
+    RAW_TEXT = True
     # TODO: Document that the text isn't escaped in this case
     DEFAULT_ESCAPE_TEXT = TextRaw
 
@@ -442,86 +563,110 @@ class Script(_HTMLNewlineElement):
 
 
 class Section(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'section'
 
 
 class Select(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'select'
 
 
 class Small(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'small'
 
 
 class Source(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'source'
 
 
 class Span(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'span'
 
 
 class Strong(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'strong'
 
 
 class Style(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'style'
+    PRESERVE_WHITESPACE = True
+    RAW_TEXT = True
 
 
 class Sub(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'sub'
 
 
 class Summary(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'summary'
 
 
 class Sup(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'sup'
 
 
 class Table(_Table):
+    __slots__ = ()
     TAG = 'table'
 
 
 class Tbody(_Table):
+    __slots__ = ()
     TAG = 'tbody'
 
 
 class Td(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'td'
 
 
 class Template(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'template'
 
 
 class Textarea(_HTMLPrelineElement):
+    __slots__ = ()
     TAG = 'textarea'
+    PRESERVE_WHITESPACE = True
 
 
 class Tfoot(_Table):
+    __slots__ = ()
     TAG = 'tfoot'
 
 
 class Th(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'th'
 
 
 class Thead(_Table):
+    __slots__ = ()
     TAG = 'thead'
 
 
 class Time(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'time'
 
 
 class Title(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'title'
 
 
 class Tr(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'tr'
 
     def append_header_cell(self, cell):
@@ -544,24 +689,30 @@ class Tr(_HTMLNewlineElement):
 
 
 class Track(_HTMLNewlineVoidElement):
+    __slots__ = ()
     TAG = 'track'
 
 
 class U(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'u'
 
 
 class Ul(_List):
+    __slots__ = ()
     TAG = 'ul'
 
 
 class Var(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'var'
 
 
 class Video(_HTMLNewlineElement):
+    __slots__ = ()
     TAG = 'video'
 
 
 class Wbr(_HTMLSamelineElement):
+    __slots__ = ()
     TAG = 'wbr'
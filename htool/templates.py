@@ -0,0 +1,174 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+from .dom import _Element, _Node, _Renderer
+from .text import _Text
+
+
+class _SlotDependency(Exception):
+    # Raised while pre-rendering a Template when the formatting of an element
+    # depends on the value of a slot
+    pass
+
+
+class _DynamicPart(object):
+    # A subtree of a Template that is compiled by Template.render()
+    __slots__ = ('node', 'indent')
+
+    def __init__(self, node, indent):
+        self.node = node
+        self.indent = indent
+
+
+class _TemplateRenderer(_Renderer):
+    __slots__ = ()
+
+    def iter_compile(self, node, indent=""):
+        # Like _Renderer.iter_compile(), but yield a _DynamicPart in place of
+        # each Slot and of each element whose formatting depends on a slot
+        self._newlines = {0: "".join(("\n", indent))}
+        stack = [iter(((node, 0), ))]
+        while stack:
+            for item in stack[-1]:
+                if item.__class__ is tuple:
+                    child, subindent = item
+                    # The indentation handles are only valid for this
+                    # renderer, so pass the indentation string
+                    if isinstance(child, Slot):
+                        yield _DynamicPart(child, self.newline(subindent)[1:])
+                        continue
+                    try:
+                        items = child._render(self, subindent)
+                    except _SlotDependency:
+                        yield _DynamicPart(child, self.newline(subindent)[1:])
+                        continue
+                    stack.append(iter(items))
+                    break
+                yield item
+            else:
+                stack.pop()
+
+
+class Slot(_Element):
+    """
+    Placeholder for a node or a text that is given when rendering a Template.
+
+    A Slot is formatted as a block, i.e. it is always surrounded by line
+    breaks; use InlineSlot inside inline content. Text values are escaped like
+    the other children of the Slot's parent. The default value is also used
+    when the tree is compiled directly.
+    """
+    __slots__ = ('name', 'default')
+    BREAK_BEFORE = True
+    BREAK_AFTER = True
+    CACHEABLE = False
+
+    def __init__(self, name, default=None):
+        super(Slot, self).__init__()
+        self.name = name
+        self.default = default
+
+    def _get_value(self, renderer):
+        if isinstance(renderer, _TemplateRenderer):
+            raise _SlotDependency()
+        if renderer.slots is None:
+            return self.default
+        return renderer.slots.get(self.name, self.default)
+
+    def _escape(self, value):
+        if isinstance(value, _Text):
+            return value
+        # Like _ElementContainer._prepare_child() would do
+        if self.parent_element is not None:
+            return self.parent_element.DefaultContentEscape(value)
+        return self.DefaultContentEscape(value)
+
+    def _render(self, renderer, indent):
+        value = self._get_value(renderer)
+        if value is None:
+            return ()
+        if isinstance(value, _Node):
+            return ((value, indent), )
+        if renderer.UNICODE:
+            return (self._escape(value).escaped_unicode, )
+        return (self._escape(value).escaped, )
+
+    def _scan_newline(self, renderer):
+        value = self._get_value(renderer)
+        if value is None:
+            return (False, None)
+        if isinstance(value, _Node):
+            return (False, (value, ))
+        return ("\n" in self._escape(value).escaped, None)
+
+
+class InlineSlot(Slot):
+    """
+    Slot that is formatted inline, i.e. without line breaks around it.
+
+    The elements whose formatting depends on the value of an InlineSlot are
+    compiled in full by Template.render().
+    """
+    __slots__ = ()
+    BREAK_BEFORE = False
+    BREAK_AFTER = False
+
+
+class Template(object):
+    """
+    Pre-rendered tree with Slot nodes.
+
+    All the static parts of the tree are compiled once when the Template is
+    created; render() only compiles the values of the slots, and the
+    elements whose formatting depends on them, at the indentation that their
+    position in the tree requires.
+
+    Note that the tree must not be modified after creating the Template.
+    """
+    def __init__(self, root, indent=""):
+        self.chunks = []
+        static = []
+        for item in _TemplateRenderer().iter_compile(root, indent=indent):
+            if item.__class__ is _DynamicPart:
+                if static:
+                    self.chunks.append("".join(static))
+                    static = []
+                self.chunks.append(item)
+            else:
+                static.append(item)
+        if static:
+            self.chunks.append("".join(static))
+
+    def iter_render(self, **slots):
+        for chunk in self.chunks:
+            if chunk.__class__ is _DynamicPart:
+                for subchunk in _Renderer(slots).iter_compile(
+                        chunk.node, indent=chunk.indent):
+                    yield subchunk
+            else:
+                yield chunk
+
+    def render(self, **slots):
+        return "".join(self.iter_render(**slots))
@@ -23,6 +23,9 @@ from __future__ import (absolute_import, division,
 # Support Python 2.6
 # from builtins import *
 
+import re
+from collections import namedtuple, OrderedDict
+
 try:
     from html import escape as html_escape
 except ImportError:
@@ -30,29 +33,188 @@ except ImportError:
     from cgi import escape as _html_escape
     html_escape = lambda text: _html_escape(text, quote=True)  # NOQA
 
+try:
+    _STRING_TYPES = (str, unicode)
+except NameError:
+    # Python 3
+    _STRING_TYPES = (str, )
+
+# The string representations of these types never contain characters to be
+# escaped
+_NUMBER_TYPES = (int, float, bool)
+
+# Match any character that html_escape() would escape, or that is not ASCII,
+# i.e. that would be turned into a character reference
+_ESCAPABLE = re.compile('[^\x00-!#-%(-;=?-\x7f]')
+
+# Match any character that html_escape() would escape
+_SIGNIFICANT = re.compile('[&<>"\']')
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+
+def _escape(rawtext):
+    # Fast path: strings without characters to be escaped don't need to go
+    # through the encode/decode round-trip
+    if rawtext.__class__ is str and not _ESCAPABLE.search(rawtext):
+        return rawtext
+    if rawtext.__class__ in _NUMBER_TYPES:
+        # Don't go through the AttributeError raised by html_escape()
+        return str(rawtext)
+    try:
+        # It's important to first html_escape, then encode, not vice versa
+        escaped = html_escape(rawtext).encode('ascii', 'xmlcharrefreplace')
+    except AttributeError:
+        return str(rawtext)
+    else:
+        # Finally decode, otherwise 'escaped' is a bytes object
+        return escaped.decode('utf-8')
+
+
+def _escape_unicode(rawtext):
+    # Like _escape(), but don't replace the non-ASCII characters with
+    # character references, see _Text.escaped_unicode
+    if rawtext.__class__ is str and not _SIGNIFICANT.search(rawtext):
+        return rawtext
+    if rawtext.__class__ in _NUMBER_TYPES:
+        return str(rawtext)
+    try:
+        return html_escape(rawtext)
+    except AttributeError:
+        return str(rawtext)
+
 
 class _Text(object):
+    __slots__ = ('raw', )
+
     def __init__(self, rawtext):
         self.raw = rawtext
 
+    @property
+    def escaped_unicode(self):
+        # The escaped text for the output that is encoded by
+        # _Node.compile_bytes(), where the characters that are not
+        # representable in the target encoding are replaced with character
+        # references anyway; subclasses that don't override this are output
+        # with their usual 'escaped' text
+        return self.escaped
+
 
 class TextRaw(_Text):
+    __slots__ = ('escaped', )
+
     def __init__(self, rawtext):
         super(TextRaw, self).__init__(rawtext)
         self.escaped = rawtext
 
 
 class TextEscaped(_Text):
+    __slots__ = ('escaped', )
     # TODO: Make another smarter class that leaves already-escaped text as
     #       is, e.g. named character references (e.g. '&gt;')
     #       Probably use the html.entities.html5 dictionary
     def __init__(self, rawtext):
         super(TextEscaped, self).__init__(rawtext)
+        self.escaped = _escape(rawtext)
+
+    @property
+    def escaped_unicode(self):
+        # Most texts don't have characters to be escaped at all
+        if self.escaped is self.raw:
+            return self.raw
+        return _escape_unicode(self.raw)
+
+
+class TextEscapedLazy(_Text):
+    """
+    TextEscaped variant that only escapes its text when it's first read.
+
+    This avoids escaping the text of nodes that end up never being compiled.
+    """
+    __slots__ = ('_escaped', )
+
+    def __init__(self, rawtext):
+        super(TextEscapedLazy, self).__init__(rawtext)
+        self._escaped = None
+
+    @property
+    def escaped(self):
+        if self._escaped is None:
+            self._escaped = _escape(self.raw)
+        return self._escaped
+
+    @property
+    def escaped_unicode(self):
+        return _escape_unicode(self.raw)
+
+
+class EscapeCache(object):
+    """
+    Bounded cache of escaped strings, evicting the least recently used ones.
+
+    A 'maxsize' of None makes the cache unbounded.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def escape(self, rawtext):
+        # Only strings are cached: other objects may not be hashable, and
+        # e.g. 1 and True would share the same key
+        if not isinstance(rawtext, _STRING_TYPES):
+            return _escape(rawtext)
         try:
-            # It's important to first html_escape, then encode, not vice versa
-            escaped = html_escape(rawtext).encode('ascii', 'xmlcharrefreplace')
-        except AttributeError:
-            self.escaped = str(rawtext)
+            # Re-insert the key to mark it as the most recently used
+            escaped = self._cache.pop(rawtext)
+        except KeyError:
+            self.misses += 1
+            escaped = _escape(rawtext)
+            if self.maxsize is not None and len(self._cache) >= self.maxsize:
+                if self.maxsize < 1:
+                    return escaped
+                self._cache.popitem(last=False)
         else:
-            # Finally decode, otherwise 'escaped' is a bytes object
-            self.escaped = escaped.decode('utf-8')
+            self.hits += 1
+        self._cache[rawtext] = escaped
+        return escaped
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        if maxsize is not None:
+            while len(self._cache) > max(maxsize, 0):
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._cache))
+
+
+class TextEscapedCached(TextEscaped):
+    """
+    TextEscaped variant that memoizes the escaped strings in CACHE.
+
+    Enable it for example by setting htool.dom.DEFAULT_ESCAPE to this class,
+    or to a subclass created with make_cached_escape() to use a separate
+    cache.
+    """
+    __slots__ = ()
+    CACHE = EscapeCache()
+
+    def __init__(self, rawtext):
+        _Text.__init__(self, rawtext)
+        self.escaped = self.CACHE.escape(rawtext)
+
+
+def make_cached_escape(maxsize=4096):
+    """
+    Return a new TextEscapedCached subclass with its own cache.
+    """
+    return type(str('TextEscapedCached'), (TextEscapedCached, ),
+                {'__slots__': (), 'CACHE': EscapeCache(maxsize)})
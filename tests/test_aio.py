@@ -0,0 +1,130 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# Like htool.aio, this module requires Python 3.6
+
+import asyncio
+import unittest
+
+import htool
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def _value(value):
+    await asyncio.sleep(0)
+    return value
+
+
+async def _values(*values):
+    for value in values:
+        await asyncio.sleep(0)
+        yield value
+
+
+async def _compile(node, indent=""):
+    return [chunk async for chunk in node.aiter_compile(indent=indent)]
+
+
+class TestAiterCompile(unittest.TestCase):
+    def assertResolved(self, node, resolved, indent=""):
+        output = "".join(_run(_compile(node, indent)))
+        self.assertEqual(output, resolved.compile(indent=indent))
+        # The tree now only contains the resolved nodes
+        self.assertEqual(node.compile(indent=indent), output)
+
+    def test_inline(self):
+        self.assertResolved(htool.Span(_value('hello <x>')),
+                            htool.Span('hello <x>'))
+        self.assertEqual(
+            "".join(_run(_compile(htool.Span(_value('hello <x>'))))),
+            '<span>hello &lt;x&gt;</span>')
+        self.assertResolved(htool.P('a', _value(htool.B('b')), 'c'),
+                            htool.P('a', htool.B('b'), 'c'))
+
+    def test_block(self):
+        self.assertResolved(htool.Div(htool.P('a'), _value(htool.P('b'))),
+                            htool.Div(htool.P('a'), htool.P('b')), "  ")
+        self.assertResolved(htool.Ul(_values(*(htool.Li(index)
+                                               for index in range(3)))),
+                            htool.Ul(*(htool.Li(index)
+                                       for index in range(3))))
+
+    def test_values(self):
+        self.assertResolved(
+            htool.Div(_value([htool.Span('1'), 'x', None,
+                              _value(htool.B('n'))]), _value(None)),
+            htool.Div(htool.Span('1'), 'x', htool.B('n')))
+        self.assertResolved(htool.Ul(_values('<a>', None, htool.Li('b'))),
+                            htool.Ul('<a>', htool.Li('b')))
+
+    def test_descendants_decide_formatting(self):
+        # The formatting of the Div depends on the text of the Em
+        self.assertResolved(
+            htool.Div(htool.Span(htool.Em(_value('a\nb')))),
+            htool.Div(htool.Span(htool.Em('a\nb'))))
+        self.assertResolved(
+            htool.Div(htool.Span(htool.Em(_value('ab')))),
+            htool.Div(htool.Span(htool.Em('ab'))))
+
+    def test_flush_before_await(self):
+        chunks = []
+
+        async def compile_():
+            async for chunk in node.aiter_compile():
+                chunks.append(chunk)
+
+        async def value():
+            # The output before the awaitable was already yielded
+            self.assertEqual("".join(chunks), '<body>\n  <h1>Title</h1>\n  ')
+            return htool.P('text')
+        node = htool.Body(htool.H1('Title'), htool.Div(value()))
+        _run(compile_())
+        self.assertEqual("".join(chunks), htool.Body(
+            htool.H1('Title'), htool.Div(htool.P('text'))).compile())
+
+    def test_index(self):
+        div = htool.Div(_value(htool.P('a', id='p')))
+        div.enable_index()
+        _run(_compile(div))
+        self.assertIs(div.get_by_id('p'), div.children[0])
+        self.assertEqual(div.get_by_tag('p'), [div.children[0]])
+
+    def test_generated_children(self):
+        div = htool.Div(htool.LazyChildren([_value('a'), htool.P('b')]))
+        self.assertEqual("".join(_run(_compile(div))),
+                         '<div>\n  a\n  <p>b</p>\n</div>')
+
+    def test_compile_error(self):
+        coroutine = _value('a')
+        self.assertRaises(TypeError, htool.Div(coroutine).compile)
+        coroutine.close()
+        coroutine = _value('a')
+        self.assertRaises(TypeError,
+                          htool.Div(htool.Span(coroutine)).compile)
+        coroutine.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import io
+import sys
+import unittest
+
+import htool
+from htool import arena
+from htool.arena import DocumentArena
+
+
+def _build():
+    return htool.Div(
+        htool.H1('Title < 1', class_='t'),
+        htool.P('a ', htool.B('b'), ' c\nd', htool.Br(), 'e', id='p'),
+        htool.Pre('x\n  y'),
+        htool.Ul(htool.Li('\xe9'), htool.Li(htool.Input(disabled=None))),
+        htool.ElementContainer('f', htool.Span('g')),
+        htool.Comment('note'),
+        htool.LazyChildren([htool.P('lazy'), 'h']),
+        id='root')
+
+
+class TestConversion(unittest.TestCase):
+    def test_compile(self):
+        for indent in ('', '  ', '\t'):
+            self.assertEqual(DocumentArena.from_tree(_build()).compile(
+                indent=indent), _build().compile(indent=indent))
+
+    def test_iter_compile(self):
+        document = DocumentArena.from_tree(_build())
+        chunks = list(document.iter_compile())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), _build().compile())
+
+    def test_documents(self):
+        self.assertEqual(
+            DocumentArena.from_tree(htool.docs.SimpleDocument(
+                'T', 'D', _build())).compile(),
+            htool.docs.SimpleDocument('T', 'D', _build()).compile())
+
+    def test_fragments_expanded(self):
+        # The items of LazyChildren are consumed once, when they are added
+        document = DocumentArena.from_tree(_build())
+        self.assertEqual(document.compile(), document.compile())
+        self.assertIn('<p>lazy</p>', document.compile())
+
+    def test_nodes(self):
+        # The root Div, the P, its text and the Br
+        document = DocumentArena.from_tree(htool.Div(htool.P('a'),
+                                                     htool.Br()))
+        self.assertEqual(len(document), 4)
+        self.assertEqual(len(DocumentArena()), 1)
+        self.assertEqual(DocumentArena().compile(), '')
+
+    def test_to_tree(self):
+        document = DocumentArena.from_tree(_build())
+        div = document.to_tree()
+        self.assertIsInstance(div, htool.Div)
+        self.assertEqual(div.compile(), _build().compile())
+        self.assertEqual(div.compile(minify=True),
+                         _build().compile(minify=True))
+        self.assertEqual(div.get_attribute('id'), 'root')
+        self.assertIs(div.children[0].parent_element, div)
+        self.assertIsInstance(div.children[4], htool.ElementContainer)
+        self.assertIsInstance(div.children[5], htool.Comment)
+
+    def test_to_tree_subtree(self):
+        document = DocumentArena()
+        document.add_element(DocumentArena.ROOT, htool.P, 'a')
+        index = document.add_node(DocumentArena.ROOT,
+                                  htool.Ul(htool.Li('b'), class_='c'))
+        ul = document.to_tree(index)
+        self.assertIsInstance(ul, htool.Ul)
+        self.assertIsNone(ul.parent_element)
+        self.assertEqual(ul.compile(),
+                         htool.Ul(htool.Li('b'), class_='c').compile())
+
+    def test_interned(self):
+        tree = htool.Ul(*[htool.Li('x', class_='item') for _ in range(100)])
+        document = DocumentArena.from_tree(tree)
+        self.assertEqual(document.compile(), tree.compile())
+        self.assertLess(len(document._pool), 20)
+
+    def test_intern_size(self):
+        size = arena.INTERN_SIZE
+        arena.INTERN_SIZE = 2
+        try:
+            tree = htool.Ul(*[htool.Li(str(n)) for n in range(10)])
+            document = DocumentArena.from_tree(tree)
+            self.assertEqual(len(document._interned), 2)
+            self.assertEqual(document.compile(), tree.compile())
+        finally:
+            arena.INTERN_SIZE = size
+
+    def test_deep(self):
+        depth = sys.getrecursionlimit() * 3
+        root = node = htool.Div()
+        for _ in range(depth):
+            child = htool.Div()
+            node.append_child(child)
+            node = child
+        node.append_child('x')
+        document = DocumentArena.from_tree(root)
+        self.assertEqual(document.compile(), root.compile())
+        self.assertEqual(document.to_tree().compile(), root.compile())
+
+
+class TestBuilding(unittest.TestCase):
+    def test_add(self):
+        document = DocumentArena()
+        div = document.add_element(DocumentArena.ROOT, htool.Div, id='d')
+        p = document.add_element(div, htool.P, 'a < b', htool.B('c'), None,
+                                 class_='x')
+        document.add_text(p, ' d')
+        document.add_element(div, htool.Br)
+        document.add_node(div, htool.Ul(htool.Li('e')))
+        expected = htool.Div(htool.P('a < b', htool.B('c'), ' d', class_='x'),
+                             htool.Br(), htool.Ul(htool.Li('e')), id='d')
+        self.assertEqual(document.compile(), expected.compile())
+
+    def test_text_escaping(self):
+        # The texts are escaped like the children of the parent's class
+        document = DocumentArena()
+        script = document.add_element(DocumentArena.ROOT, htool.Script)
+        document.add_text(script, 'a < b')
+        p = document.add_element(DocumentArena.ROOT, htool.P)
+        document.add_text(p, 'a < b')
+        document.add_text(p, htool.TextRaw('<i>c</i>'))
+        self.assertEqual(document.compile(),
+                         htool.ElementContainer(
+                             htool.Script('a < b'),
+                             htool.P('a < b', htool.TextRaw('<i>c</i>'))
+                         ).compile())
+
+    def test_add_node_indexes(self):
+        document = DocumentArena()
+        index = document.add_node(DocumentArena.ROOT,
+                                  htool.Div(htool.P('a')))
+        self.assertEqual(index, 1)
+        self.assertEqual(document._parent[index], DocumentArena.ROOT)
+        self.assertEqual(document.add_text(index, 'b'), 4)
+
+    def test_formatting_classes(self):
+        # The formatting attributes are read from the classes when compiling
+        document = DocumentArena.from_tree(htool.Div(htool.Span('a'),
+                                                     htool.Span('b')))
+        htool.Span.BREAK_BEFORE = True
+        try:
+            self.assertEqual(document.compile(),
+                             htool.Div(htool.Span('a'),
+                                       htool.Span('b')).compile())
+        finally:
+            del htool.Span.BREAK_BEFORE
+
+
+class TestWrite(unittest.TestCase):
+    def test_file_object(self):
+        document = DocumentArena.from_tree(_build())
+        output = io.StringIO()
+        document.write(output)
+        self.assertEqual(output.getvalue(), _build().compile())
+
+
+if __name__ == '__main__':
+    unittest.main()
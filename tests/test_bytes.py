@@ -0,0 +1,110 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import io
+import os.path
+import shutil
+import tempfile
+import unittest
+
+import htool
+from htool.text import TextRaw
+
+
+def _build():
+    return htool.Div(htool.P('caf\xe9 ☃ <&>', title='\xe9"'),
+                     htool.Pre('a\n  b'), htool.Span(1.5),
+                     *[htool.P('x' * 100) for _ in range(2000)])
+
+
+class TestCompileBytes(unittest.TestCase):
+    def test_utf8(self):
+        div = htool.Div(htool.P('caf\xe9 ☃ <&>', title='\xe9"'))
+        self.assertEqual(div.compile_bytes(),
+                         '<div>\n  <p title="\xe9&quot;">caf\xe9 ☃ '
+                         '&lt;&amp;&gt;</p>\n</div>'.encode('utf-8'))
+
+    def test_same_text(self):
+        # Decoding the character references gives the same text
+        div = _build()
+        for encoding in ('utf-8', 'ascii', 'latin-1', 'utf-16', 'utf-32'):
+            self.assertEqual(
+                div.compile_bytes(encoding=encoding, indent='  ').decode(
+                    encoding).encode('ascii', 'xmlcharrefreplace').decode(
+                        'ascii'),
+                div.compile(indent='  '))
+
+    def test_byte_order_mark(self):
+        div = _build()
+        output = div.compile_bytes(encoding='utf-16')
+        self.assertEqual(output.count('﻿'.encode('utf-16-le')), 1)
+        self.assertNotIn('﻿', output.decode('utf-16'))
+
+    def test_minify(self):
+        div = _build()
+        self.assertEqual(div.compile_bytes(minify=True, encoding='ascii'),
+                         div.compile(minify=True).encode('ascii'))
+
+    def test_targets(self):
+        div = htool.Div('☃')
+        target = bytearray(b'>')
+        self.assertIs(div.compile_bytes(target=target), target)
+        self.assertEqual(target, bytearray('><div>☃</div>'.encode(
+            'utf-8')))
+        target = io.BytesIO()
+        self.assertIs(div.compile_bytes(target=target, encoding='ascii'),
+                      target)
+        self.assertEqual(target.getvalue(), b'<div>&#9731;</div>')
+
+    def test_write(self):
+        div = _build()
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tempdir, 'output.html')
+            div.write(filename, encoding='utf-16')
+            with io.open(filename, encoding='utf-16') as f:
+                self.assertEqual(f.read(), div.compile_bytes(
+                    encoding='utf-16').decode('utf-16'))
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_raw_text(self):
+        for node in (htool.Script('var s = "\xe9";'),
+                     htool.Style(TextRaw('p::after {content: "☃"}')),
+                     htool.Comment(' \xe9 ')):
+            self.assertEqual(node.compile_bytes(),
+                             node.compile().encode('utf-8'))
+            self.assertRaises(UnicodeEncodeError, node.compile_bytes,
+                              encoding='ascii')
+            self.assertRaises(UnicodeEncodeError,
+                              htool.Div(node).compile_bytes,
+                              encoding='ascii')
+        # Character references are decoded in the other elements
+        self.assertEqual(htool.Textarea('\xe9').compile_bytes(
+            encoding='ascii'), b'<textarea>&#233;</textarea>')
+
+
+if __name__ == '__main__':
+    unittest.main()
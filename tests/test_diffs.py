@@ -0,0 +1,232 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import copy
+import json
+import unittest
+
+import htool
+from htool import diffs
+from htool.parser import parse
+
+
+def _parse_node(markup):
+    nodes = parse(markup).children
+    if len(nodes) == 1:
+        return nodes[0]
+    return htool.ElementContainer(*nodes)
+
+
+def _apply(root, ops):
+    # Apply the operations to the htool tree as a client would to a mirror
+    # of its children lists, and return the patched root
+    for op in json.loads(json.dumps(ops)):
+        kind, path = op[0], op[1]
+        if kind == diffs.ATTRIBUTE:
+            element = _get_node(root, path)
+            if op[3] is None:
+                del element.attributes[op[2]]
+            else:
+                element.set_attribute(op[2], op[3])
+            continue
+        if not path:
+            if kind == diffs.INSERT:
+                root = _parse_node(op[2])
+            continue
+        parent = _get_node(root, path[:-1])
+        index = path[-1]
+        if kind == diffs.INSERT:
+            node = _parse_node(op[2])
+            node.parent_element = parent
+            parent.children.insert(index, node)
+        elif kind == diffs.REMOVE:
+            del parent.children[index]
+        else:
+            parent.children[index] = parent._prepare_child(
+                htool.TextRaw(op[2]))
+    return root
+
+
+def _get_node(root, path):
+    node = root
+    for index in path:
+        node = node.children[index]
+    return node
+
+
+def _build(items, **attributes):
+    return htool.Div(
+        htool.H1('Title'),
+        htool.Ul(*[htool.Li(htool.B(item), ' text ', item,
+                            id='i{}'.format(item))
+                   for item in items]),
+        htool.P('footer'),
+        **attributes)
+
+
+class DiffTestCase(unittest.TestCase):
+    def assertPatches(self, old, new, keys=()):
+        expected = new.compile(minify=True)
+        # The paths are valid for the htool tree, whose text nodes are not
+        # merged as in a parsed copy
+        patched = _apply(copy.deepcopy(old), diffs.diff(old, new, keys))
+        self.assertEqual(patched.compile(minify=True), expected)
+        return diffs.diff(old, new, keys)
+
+
+class TestOperations(DiffTestCase):
+    def test_same(self):
+        tree = _build([1, 2, 3])
+        self.assertEqual(diffs.diff(tree, tree), [])
+        self.assertEqual(diffs.diff(tree, _build([1, 2, 3])), [])
+
+    def test_text(self):
+        ops = self.assertPatches(htool.P('a', htool.B('b')),
+                                 htool.P('a < c', htool.B('b')))
+        self.assertEqual(ops, [[diffs.TEXT, [0], 'a &lt; c']])
+
+    def test_attributes(self):
+        old = htool.Div(htool.P(id='a', title='x'), class_='c')
+        new = htool.Div(htool.P(id='a', lang='en'), class_='d')
+        ops = self.assertPatches(old, new)
+        self.assertIn([diffs.ATTRIBUTE, [], 'class', 'd'], ops)
+        self.assertIn([diffs.ATTRIBUTE, [0], 'lang', 'en'], ops)
+        self.assertIn([diffs.ATTRIBUTE, [0], 'title', None], ops)
+        self.assertEqual(len(ops), 3)
+
+    def test_attribute_values_not_escaped(self):
+        ops = self.assertPatches(htool.P(title='a'), htool.P(title='a & "b"'))
+        self.assertEqual(ops, [[diffs.ATTRIBUTE, [], 'title', 'a & "b"']])
+
+    def test_replaced_root(self):
+        ops = self.assertPatches(htool.P('a'), htool.Div('a'))
+        self.assertEqual(ops, [[diffs.REMOVE, []],
+                               [diffs.INSERT, [], '<div>a</div>']])
+
+    def test_replaced_element(self):
+        ops = self.assertPatches(htool.Div(htool.P('a')),
+                                 htool.Div(htool.Span('a')))
+        self.assertEqual(ops, [[diffs.REMOVE, [0]],
+                               [diffs.INSERT, [0], '<span>a</span>']])
+
+    def test_comments(self):
+        self.assertEqual(diffs.diff(htool.Div(htool.Comment('a')),
+                                    htool.Div(htool.Comment('a'))), [])
+        self.assertPatches(htool.Div(htool.Comment('a')),
+                           htool.Div(htool.Comment('b')))
+
+    def test_fragments(self):
+        lazy = htool.LazyChildren(['a'])
+        self.assertEqual(diffs.diff(htool.Div(lazy), htool.Div(lazy)), [])
+        ops = diffs.diff(htool.Div(htool.LazyChildren(['a'])),
+                         htool.Div(htool.LazyChildren(['b'])))
+        self.assertEqual(ops, [[diffs.REMOVE, [0]],
+                               [diffs.INSERT, [0], 'b']])
+
+    def test_element_containers(self):
+        self.assertPatches(
+            htool.Div(htool.ElementContainer(htool.P('a'), 'b')),
+            htool.Div(htool.ElementContainer(htool.P('c'), 'b', 'd')))
+
+    def test_json(self):
+        ops = diffs.diff(_build([1, 2]), _build([2, 3]), keys=['id'])
+        self.assertEqual(json.loads(json.dumps(ops)), ops)
+
+
+class TestChildren(DiffTestCase):
+    def test_append_prepend(self):
+        self.assertPatches(_build([1, 2, 3]), _build([1, 2, 3, 4]))
+        self.assertPatches(_build([1, 2, 3]), _build([0, 1, 2, 3]))
+        self.assertPatches(_build([1, 2, 3]), _build([]))
+        self.assertPatches(_build([]), _build([1, 2, 3]))
+
+    def test_unkeyed(self):
+        # Matched in order by tag, then updated
+        ops = self.assertPatches(_build([1, 2, 3]), _build([1, 3]))
+        self.assertNotIn(diffs.INSERT, [op[0] for op in ops])
+        self.assertPatches(_build([1, 2, 3, 4, 5]), _build([5, 3, 1, 4]))
+
+    def test_keyed_reorder(self):
+        ops = self.assertPatches(_build([1, 2, 3, 4, 5]),
+                                 _build([1, 3, 2, 4, 5]), keys=['id'])
+        self.assertEqual([op[0] for op in ops], [diffs.REMOVE, diffs.INSERT])
+
+    def test_keyed_filter(self):
+        ops = self.assertPatches(_build(range(10)), _build(range(0, 10, 3)),
+                                 keys=['id'])
+        self.assertEqual([op[0] for op in ops], [diffs.REMOVE] * 6)
+
+    def test_keyed_mixed(self):
+        for old, new in (([1, 2, 3], [3, 2, 1]),
+                         ([1, 2, 3, 4, 5, 6], [6, 1, 5, 2, 4, 3]),
+                         ([1, 2, 3], [4, 5, 6]),
+                         ([1, 2, 3, 4], [2, 7, 4, 1, 8])):
+            self.assertPatches(_build(old), _build(new), keys=['id'])
+
+    def test_keyed_changed_content(self):
+        old = htool.Ul(htool.Li('a', id='1'), htool.Li('b', id='2'))
+        new = htool.Ul(htool.Li('b2', id='2'), htool.Li('a', id='1'))
+        self.assertPatches(old, new, keys=['id'])
+
+    def test_keys_order(self):
+        old = htool.Ul(htool.Li('a', **{'data-key': 'x'}),
+                       htool.Li('b', id='y'))
+        new = htool.Ul(htool.Li('b', id='y'),
+                       htool.Li('a', **{'data-key': 'x'}))
+        self.assertPatches(old, new, keys=['id', 'data-key'])
+
+
+class TestDeepTrees(DiffTestCase):
+    def _chain(self, depth, leaf):
+        root = node = htool.Div()
+        for _ in range(depth):
+            child = htool.Div()
+            node.append_child(child)
+            node = child
+        node.append_child(leaf)
+        return root
+
+    def test_deep(self):
+        old = self._chain(5000, htool.Span('a'))
+        new = self._chain(5000, htool.Span('b', class_='c'))
+        ops = diffs.diff(old, new)
+        path = [0] * 5001
+        self.assertEqual(ops, [[diffs.ATTRIBUTE, path, 'class', 'c'],
+                               [diffs.TEXT, path + [0], 'b']])
+
+    def test_deep_insert(self):
+        old = self._chain(5000, htool.Span('a'))
+        new = self._chain(5000, htool.Span('a'))
+        node = new
+        for _ in range(4000):
+            node = node.children[0]
+        node.append_child(htool.P('b'))
+        ops = diffs.diff(old, new)
+        self.assertEqual(ops, [[diffs.INSERT, [0] * 4000 + [1],
+                                '<p>b</p>']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import pickle
+import unittest
+import weakref
+
+import htool
+from htool import dom, text
+
+
+class TestSlots(unittest.TestCase):
+    def test_no_instance_dict(self):
+        for node in (htool.Div(), htool.Br(), htool.Comment('c'),
+                     htool.Div('text').children[0]):
+            self.assertFalse(hasattr(node, '__dict__'))
+
+    def test_weakref(self):
+        div = htool.Div()
+        ref = weakref.ref(div)
+        self.assertIs(ref(), div)
+        text = htool.P('text').children[0]
+        self.assertIs(weakref.ref(text)(), text)
+
+    def test_subclass_without_slots(self):
+        class Custom(htool.Div):
+            pass
+        div = Custom(id='a')
+        div.extra = 1
+        self.assertEqual(div.compile(), '<div id="a"></div>')
+
+    def test_pickle(self):
+        div = htool.Div(htool.P('a < b', class_='x'), htool.Br(), id='d')
+        copy = pickle.loads(pickle.dumps(div))
+        self.assertEqual(copy.compile(), div.compile())
+        self.assertIsNone(copy.parent_element)
+        self.assertIs(copy.children[0].parent_element, copy)
+        self.assertIs(copy.children[0].children[0].parent_element,
+                      copy.children[0])
+
+
+class TestAttributeNames(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(dom._normalize_attribute_name('class_'), 'class')
+        self.assertEqual(dom._normalize_attribute_name('attr__'), 'attr_')
+        self.assertEqual(dom._normalize_attribute_name('data_x'), 'data-x')
+        self.assertEqual(dom._normalize_attribute_name('For'), 'for')
+        self.assertEqual(dom._normalize_attribute_name('Data_X_'), 'Data_X')
+
+    def test_keywords(self):
+        self.assertEqual(htool.P(class_='a', data_x='1', Title='t',
+                                 attr__='v', z='1', b='2').compile(),
+                         '<p class="a" attr_="v" b="2" data-x="1" title="t" '
+                         'z="1"></p>')
+
+    def test_order_independent(self):
+        self.assertEqual(htool.P(z='1', b='2', m='3').compile(),
+                         htool.P(m='3', b='2', z='1').compile())
+
+    def test_existing_names(self):
+        # A keyword is left as is if its normalized name is also passed
+        self.assertEqual(htool.P(data_x='1', **{'data-x': '2'}).compile(),
+                         '<p data-x="2" data_x="1"></p>')
+
+    def test_classes(self):
+        self.assertEqual(htool.P(classes=['a', 'b', 'a']).compile(),
+                         '<p class="a b"></p>')
+        self.assertEqual(htool.P(classes='a', class_='b').compile(),
+                         '<p class="b"></p>')
+        self.assertEqual(htool.P(classes_='x').compile(),
+                         '<p classes="x"></p>')
+        self.assertEqual(htool.P(class_='').compile(), '<p class=""></p>')
+
+    def test_plan_memoized(self):
+        keys = ('data_x', 'class_')
+        plan = dom._plan_attributes(keys, text.TextEscaped)
+        self.assertIs(dom._plan_attributes(keys, text.TextEscaped), plan)
+        self.assertIsNot(dom._plan_attributes(keys, text.TextRaw), plan)
+        names, classkey, classname = plan
+        self.assertEqual([(name.escaped, key) for name, key in names],
+                         [('class', 'class_'), ('data-x', 'data_x')])
+        self.assertEqual(classkey, 'class_')
+        self.assertEqual(classname, 'class')
+
+    def test_cache_size(self):
+        size = dom._ATTRIBUTE_CACHE_SIZE
+        names = dict(dom._NORMALIZED_ATTRIBUTE_NAMES)
+        plans = dict(dom._ATTRIBUTE_PLANS)
+        dom._ATTRIBUTE_CACHE_SIZE = len(names) + 1
+        try:
+            for n in range(10):
+                htool.P(**{'new_name_{}'.format(n): 'x'})
+            self.assertLessEqual(len(dom._NORMALIZED_ATTRIBUTE_NAMES),
+                                 len(names) + 1)
+            self.assertLessEqual(len(dom._ATTRIBUTE_PLANS),
+                                 max(len(plans), len(names) + 1))
+            # Names that aren't memoized are still normalized
+            self.assertEqual(htool.P(new_name_9='x').compile(),
+                             '<p new-name-9="x"></p>')
+        finally:
+            dom._ATTRIBUTE_CACHE_SIZE = size
+            dom._NORMALIZED_ATTRIBUTE_NAMES.clear()
+            dom._NORMALIZED_ATTRIBUTE_NAMES.update(names)
+            dom._ATTRIBUTE_PLANS.clear()
+            dom._ATTRIBUTE_PLANS.update(plans)
+
+
+class TestEscapePolicy(unittest.TestCase):
+    def test_default(self):
+        self.assertEqual(htool.P('<&>', title='"').compile(),
+                         '<p title="&quot;">&lt;&amp;&gt;</p>')
+
+    def test_module_attribute(self):
+        htool.P('a')
+        dom.DEFAULT_ESCAPE_TEXT = text.TextRaw
+        try:
+            self.assertEqual(htool.P('<b>', title='<').compile(),
+                             '<p title="&lt;"><b></p>')
+        finally:
+            dom.DEFAULT_ESCAPE_TEXT = None
+        self.assertEqual(htool.P('<b>').compile(), '<p>&lt;b&gt;</p>')
+
+    def test_class_attribute_changed_after_use(self):
+        class Raw(htool.P):
+            __slots__ = ()
+        self.assertEqual(Raw('<b>').compile(), '<p>&lt;b&gt;</p>')
+        Raw.DEFAULT_ESCAPE_TEXT = text.TextRaw
+        self.assertEqual(Raw('<b>').compile(), '<p><b></p>')
+        del Raw.DEFAULT_ESCAPE_TEXT
+        self.assertEqual(Raw('<b>').compile(), '<p>&lt;b&gt;</p>')
+
+    def test_subclass_and_parent_class(self):
+        class Raw(htool.P):
+            __slots__ = ()
+            DEFAULT_ESCAPE = text.TextRaw
+
+        class Escaped(Raw):
+            __slots__ = ()
+            DEFAULT_ESCAPE_TEXT = text.TextEscaped
+        self.assertEqual(Raw('<b>', title='<').compile(),
+                         '<p title="<"><b></p>')
+        self.assertEqual(Escaped('<b>', title='<').compile(),
+                         '<p title="<">&lt;b&gt;</p>')
+        # The parent class keeps its own policy
+        self.assertEqual(htool.P('<b>').compile(), '<p>&lt;b&gt;</p>')
+
+    def test_instance_override(self):
+        first = htool.P()
+        first.DefaultContentEscape = text.TextRaw
+        first.append_child('<b>')
+        second = htool.P('<b>')
+        self.assertEqual(first.compile(), '<p><b></p>')
+        self.assertEqual(second.compile(), '<p>&lt;b&gt;</p>')
+
+
+    def test_instance_attributes(self):
+        # Subclasses without __slots__ can set the policy on the instance
+        class Raw(htool.Div):
+            def __init__(self, *children):
+                self.DEFAULT_ESCAPE_TEXT = text.TextRaw
+                super(Raw, self).__init__(*children)
+        self.assertEqual(Raw('<b>').compile(), '<div><b></div>')
+        self.assertEqual(htool.Div('<b>').compile(), '<div>&lt;b&gt;</div>')
+
+    def test_base_class_changed(self):
+        class Base(htool.P):
+            __slots__ = ()
+
+        class Sub(Base):
+            __slots__ = ()
+        Sub('a')
+        Base.DEFAULT_ESCAPE = text.TextRaw
+        self.assertEqual(Sub('<b>').compile(), '<p><b></p>')
+        del Base.DEFAULT_ESCAPE
+        self.assertEqual(Sub('<b>').compile(), '<p>&lt;b&gt;</p>')
+
+    def test_resolved_once(self):
+        policy = htool.P._escape_policy
+        htool.P('a')
+        self.assertIs(htool.P._escape_policy, policy)
+        self.assertIs(htool.P().DefaultContentEscape, text.TextEscaped)
+
+    def test_pickled_overrides(self):
+        element = htool.P()
+        element.DefaultContentEscape = text.TextRaw
+        copy = pickle.loads(pickle.dumps(element))
+        self.assertIs(copy.DefaultContentEscape, text.TextRaw)
+        self.assertIs(copy.DefaultAttributeNameEscape, text.TextEscaped)
+        copy = pickle.loads(pickle.dumps(htool.P()))
+        self.assertIs(copy.DefaultContentEscape, text.TextEscaped)
+
+
+if __name__ == '__main__':
+    unittest.main()
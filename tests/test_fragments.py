@@ -0,0 +1,134 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import tracemalloc
+import unittest
+
+import htool
+from htool import dom
+
+
+class TestLazyChildren(unittest.TestCase):
+    def assertSameOutput(self, build):
+        lazy = build(lambda items: (htool.LazyChildren(items), ))
+        eager = build(lambda items: tuple(items))
+        for indent in ("", "  "):
+            self.assertEqual(lazy().compile(indent=indent),
+                             eager().compile(indent=indent))
+        self.assertEqual(lazy().compile(minify=True),
+                         eager().compile(minify=True))
+
+    def test_same_output(self):
+        self.assertSameOutput(lambda wrap: lambda: htool.Ul(*wrap(
+            htool.Li(index) for index in range(5))))
+        self.assertSameOutput(lambda wrap: lambda: htool.Div(*wrap(
+            htool.Span(index) for index in range(5))))
+        self.assertSameOutput(lambda wrap: lambda: htool.Div(htool.P(*wrap(
+            ['a', None, 'b <c>', htool.Em('d')]))))
+        self.assertSameOutput(lambda wrap: lambda: htool.Div(htool.Span(
+            'x'), *wrap(['a\nb', htool.Span('c')])))
+        self.assertSameOutput(lambda wrap: lambda: htool.Div(*wrap([])))
+
+    def test_consumed_once(self):
+        ul = htool.Ul(htool.LazyChildren(htool.Li(index)
+                                         for index in range(2)))
+        self.assertEqual(ul.compile(),
+                         '<ul>\n  <li>0</li>\n  <li>1</li>\n</ul>')
+        self.assertEqual(ul.compile(), '<ul></ul>')
+
+    def test_lookahead_limit(self):
+        size = dom.FRAGMENT_SCAN_SIZE
+        dom.FRAGMENT_SCAN_SIZE = 3
+        try:
+            # Up to the limit, the output is the same as with normal children
+            self.assertEqual(
+                htool.Div(htool.LazyChildren(htool.Span(index)
+                                             for index in range(3))).compile(),
+                '<div><span>0</span><span>1</span><span>2</span></div>')
+            # Beyond it, the formatting can't be decided
+            div = htool.Div(htool.LazyChildren(htool.Span(index)
+                                               for index in range(4)))
+            self.assertRaises(ValueError, div.compile)
+            self.assertEqual(
+                htool.Div(htool.LazyChildren((htool.Span(index)
+                                              for index in range(4)),
+                                             multiline=False)).compile(),
+                '<div><span>0</span><span>1</span><span>2</span>'
+                '<span>3</span></div>')
+            # Unless the other nodes decide it
+            self.assertEqual(
+                htool.Div(htool.LazyChildren(htool.Span(index)
+                                             for index in range(4)),
+                          htool.P('a')).compile(),
+                htool.Div(*[htool.Span(index) for index in range(4)] +
+                          [htool.P('a')]).compile())
+            # The output is the same if the content breaks lines anyway
+            self.assertEqual(
+                htool.Div(htool.Span(htool.LazyChildren(
+                    ['a', 'b\nc', 'd', 'e', 'f']))).compile(),
+                htool.Div(htool.Span('a', 'b\nc', 'd', 'e', 'f')).compile())
+        finally:
+            dom.FRAGMENT_SCAN_SIZE = size
+
+    def test_multiline(self):
+        self.assertEqual(
+            htool.Div(htool.LazyChildren(['a', 'b'],
+                                         multiline=True)).compile(),
+            '<div>\n  ab\n</div>')
+        self.assertEqual(
+            htool.Div(htool.LazyChildren(['a', 'b'],
+                                         multiline=False)).compile(),
+            '<div>ab</div>')
+        # The breaks between the items are still output
+        self.assertEqual(
+            htool.Div(htool.LazyChildren([htool.P('a'), htool.P('b')],
+                                         multiline=False)).compile(),
+            '<div>\n  <p>a</p>\n  <p>b</p>\n</div>')
+
+    def _measure(self, node):
+        tracemalloc.start()
+        try:
+            for _ in node.iter_compile():
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_inline_children(self):
+        count = 20000
+        # Keeping all the items would take several megabytes
+        self.assertLess(self._measure(htool.Div(htool.LazyChildren(
+            (htool.Span(index) for index in range(count)),
+            multiline=True))), 1024 * 1024)
+        self.assertLess(self._measure(htool.Div(htool.P(htool.LazyChildren(
+            (str(index) for index in range(count)), multiline=True)))),
+            1024 * 1024)
+        self.assertLess(self._measure(htool.Div(htool.LazyChildren(
+            (htool.Span(index) for index in range(count)),
+            multiline=False))), 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import pickle
+import unittest
+
+import htool
+from htool import dom
+from htool.index import ElementIndex
+
+
+def _build():
+    return htool.Div(
+        htool.Section(htool.P('a', id='p1', class_='x y'),
+                      htool.P('b', id='p2'),
+                      id='s1', class_='x'),
+        htool.Ul(htool.Li('1', class_='y'), htool.Li('2', id='li2')),
+        htool.LazyChildren([htool.P(id='lazy')]),
+        id='root')
+
+
+class IndexTestCase(unittest.TestCase):
+    def assertIndexed(self, root):
+        # The index agrees with a new one built from the current tree
+        index = root._index
+        fresh = ElementIndex(root)
+        for name in ('ids', 'classes', 'tags'):
+            self.assertEqual(
+                dict((key, set(elements))
+                     for key, elements in getattr(index, name).items()),
+                dict((key, set(elements))
+                     for key, elements in getattr(fresh, name).items()))
+
+
+class TestLookups(IndexTestCase):
+    def _check(self, root):
+        self.assertIs(root.get_by_id('root'), root)
+        self.assertEqual(root.get_by_id('p2').children[0].text.raw, 'b')
+        self.assertIsNone(root.get_by_id('missing'))
+        self.assertEqual([element.get_attribute('id')
+                          for element in root.get_by_class('x')],
+                         ['s1', 'p1'])
+        self.assertEqual(len(root.get_by_class('y')), 2)
+        self.assertEqual(root.get_by_class('missing'), [])
+        self.assertEqual(len(root.get_by_tag('p')), 2)
+        self.assertEqual(root.get_by_tag('table'), [])
+
+    def test_temporary_index(self):
+        root = _build()
+        self._check(root)
+        self.assertIsNone(root._index)
+
+    def test_index(self):
+        root = _build()
+        index = root.enable_index()
+        self.assertIs(root.enable_index(), index)
+        self.assertTrue(dom._index_used)
+        self._check(root)
+
+    def test_generated_nodes(self):
+        # The nodes generated when compiling are not indexed
+        root = _build()
+        root.enable_index()
+        self.assertIsNone(root.get_by_id('lazy'))
+
+    def test_container_root(self):
+        root = htool.ElementContainer(htool.P(id='a'), 'text',
+                                      htool.Span(id='a'))
+        self.assertEqual(root.get_by_id('a').tag, 'p')
+        root.enable_index()
+        self.assertEqual(root.get_by_id('a').tag, 'p')
+        self.assertEqual(root.get_by_tag('span')[0].get_attribute('id'), 'a')
+
+    def test_attribute_values(self):
+        root = htool.Div(htool.P(id=1), htool.P())
+        root.children[1].set_attribute('class', htool.TextRaw('a b'))
+        root.enable_index()
+        self.assertEqual(root.get_by_id('1').tag, 'p')
+        self.assertEqual(len(root.get_by_class('b')), 1)
+
+    def test_disable_index(self):
+        root = _build()
+        root.enable_index()
+        root.disable_index()
+        self.assertIsNone(root._index)
+        root.children[1].append_child(htool.Li(id='new'))
+        self.assertEqual(root.get_by_id('new').tag, 'li')
+
+
+class TestMutations(IndexTestCase):
+    def setUp(self):
+        self.root = _build()
+        self.root.enable_index()
+
+    def test_append_prepend(self):
+        ul = self.root.children[1]
+        ul.append_child(htool.Li(htool.Em(id='em'), class_='y'))
+        ul.prepend_child(htool.Li(id='first'))
+        self.assertEqual(self.root.get_by_id('em').tag, 'em')
+        self.assertIs(self.root.get_by_id('first'), ul.children[0])
+        self.assertEqual(len(self.root.get_by_class('y')), 3)
+        self.assertIndexed(self.root)
+
+    def test_subtree_appended(self):
+        subtree = htool.Div(htool.P(id='deep', class_='z'))
+        self.root.append_child(subtree)
+        self.assertIs(self.root.get_by_id('deep'), subtree.children[0])
+        # Changes inside the appended subtree are still indexed
+        subtree.children[0].append_child(htool.Span(id='deeper'))
+        self.assertEqual(self.root.get_by_id('deeper').tag, 'span')
+        self.assertIndexed(self.root)
+
+    def test_empty(self):
+        self.root.children[0].empty()
+        self.assertIsNone(self.root.get_by_id('p1'))
+        self.assertEqual(len(self.root.get_by_class('x')), 1)
+        self.assertNotIn('p', self.root._index.tags)
+        self.assertIndexed(self.root)
+
+    def test_set_attribute(self):
+        p = self.root.get_by_id('p2')
+        p.set_attribute('id', 'new')
+        self.assertIsNone(self.root.get_by_id('p2'))
+        self.assertIs(self.root.get_by_id('new'), p)
+        p.set_attribute('class', 'x')
+        self.assertIn(p, self.root.get_by_class('x'))
+        p.set_attribute('class', None)
+        self.assertNotIn(p, self.root.get_by_class('x'))
+        p.set_attribute('title', 'other')
+        self.assertIndexed(self.root)
+
+    def test_add_classes(self):
+        li = self.root.get_by_id('li2')
+        li.add_class('y z')
+        self.assertIn(li, self.root.get_by_class('y'))
+        self.assertEqual(self.root.get_by_class('z'), [li])
+        self.assertIndexed(self.root)
+
+    def test_ancestor_indexes(self):
+        # The indexes of all the ancestors are updated
+        section = self.root.children[0]
+        section.enable_index()
+        section.append_child(htool.P(id='p3'))
+        self.assertEqual(section.get_by_id('p3').tag, 'p')
+        self.assertEqual(self.root.get_by_id('p3').tag, 'p')
+        section.get_by_id('p1').set_attribute('id', 'p0')
+        self.assertIsNone(self.root.get_by_id('p1'))
+        self.assertIsNone(section.get_by_id('p1'))
+        self.assertIndexed(section)
+        self.assertIndexed(self.root)
+
+    def test_pickle(self):
+        # The index is not pickled
+        copy = pickle.loads(pickle.dumps(self.root))
+        self.assertIsNone(copy._index)
+        self.assertEqual(copy.get_by_id('p1').get_attribute('class'), 'x y')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import io
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+
+import htool
+from htool import dom, misc
+
+
+class TestNamespace(unittest.TestCase):
+    def test_exports(self):
+        for name in ('Doctype', 'Comment', 'ElementContainer',
+                     'LazyChildren', 'TextFile', 'HTMLFile'):
+            self.assertIs(getattr(htool, name), getattr(misc, name))
+        for name in ('codecs', 'io', 'mmap', 'os', 'OrderedDict',
+                     'FILE_CACHE_SIZE', 'FILE_STREAM_SIZE'):
+            self.assertFalse(hasattr(htool, name), name)
+
+
+class TestLeafNodes(unittest.TestCase):
+    def test_doctype(self):
+        self.assertEqual(htool.ElementContainer(
+            htool.Doctype(), htool.Html()).compile(),
+            '<!doctype html>\n<html></html>')
+
+    def test_comment(self):
+        self.assertEqual(htool.Comment(' a < b ', '1').compile(),
+                         '<!-- a < b 1-->')
+        self.assertEqual(htool.Comment('a', 'b').text, 'ab')
+
+    def test_element_container(self):
+        container = htool.ElementContainer(htool.P('a'), 'b', None)
+        self.assertEqual(container.compile(), '<p>a</p>\nb')
+        self.assertIs(container.children[1].parent_element, container)
+
+
+class TestFiles(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'file.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, text, encoding='utf-8'):
+        with io.open(self.filename, 'w', encoding=encoding,
+                     newline='') as f:
+            f.write(text)
+
+    def test_text_file(self):
+        self._write('a < b\n\xe9')
+        self.assertEqual(htool.Div(htool.TextFile(self.filename)).compile(),
+                         '<div>\n  a &lt; b\n&#233;\n</div>')
+
+    def test_html_file(self):
+        self._write('<b>\xe9</b>', 'latin-1')
+        node = htool.HTMLFile(self.filename, encoding='latin-1')
+        self.assertEqual(node.compile(), '<b>\xe9</b>')
+        self.assertEqual(node.text.escaped, '<b>\xe9</b>')
+
+    def test_relative_path(self):
+        self._write('text')
+        cwd = os.getcwd()
+        os.chdir(self.tempdir)
+        try:
+            node = htool.TextFile('file.txt')
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(node.compile(), 'text')
+
+    def test_read_at_compile_time(self):
+        self.assertRaises(EnvironmentError, htool.TextFile(
+            self.filename).compile)
+        node = htool.TextFile(self.filename)
+        self._write('first')
+        self.assertEqual(node.compile(), 'first')
+        self._write('second version')
+        self.assertEqual(node.compile(), 'second version')
+
+    def test_set_text(self):
+        self._write('first')
+        node = htool.TextFile(self.filename)
+        self.assertEqual(node.compile(), 'first')
+        node.text = 'a < b'
+        self.assertEqual(node.compile(), 'a &lt; b')
+        self.assertEqual(node.text.escaped, 'a &lt; b')
+        self.assertFalse([key for key in misc._FILE_CACHE
+                          if key[0] == node.filename])
+        node.text = htool.TextRaw('<b>c</b>')
+        self.assertEqual(node.compile(), '<b>c</b>')
+        node.text = None
+        self.assertEqual(node.compile(), 'first')
+
+    def test_large_file(self):
+        size = misc.FILE_STREAM_SIZE
+        misc.FILE_STREAM_SIZE = 10
+        try:
+            text = 'line <{}>\n' * 3000
+            self._write(text)
+            div = htool.Div(htool.TextFile(self.filename))
+            self.assertEqual(div.compile(), htool.Div(text).compile())
+            self.assertEqual(div.compile_bytes(encoding='ascii'),
+                             htool.Div(text).compile().encode('ascii'))
+        finally:
+            misc.FILE_STREAM_SIZE = size
+
+    def test_splice(self):
+        size = misc.FILE_STREAM_SIZE
+        misc.FILE_STREAM_SIZE = 10
+        try:
+            text = '<p>\xe9</p>' * (dom.WRITE_BUFFER_SIZE // 5)
+            self._write(text)
+            div = htool.Div(htool.P('before'),
+                            htool.HTMLFile(self.filename, encoding='utf-8'))
+            output = os.path.join(self.tempdir, 'output.html')
+            div.write(output, encoding='utf-8')
+            with io.open(output, encoding='utf-8') as f:
+                self.assertEqual(f.read(), htool.Div(
+                    htool.P('before'), htool.HTMLFile(
+                        self.filename, encoding='utf-8')).compile_bytes(
+                            ).decode('utf-8'))
+        finally:
+            misc.FILE_STREAM_SIZE = size
+
+
+if __name__ == '__main__':
+    unittest.main()
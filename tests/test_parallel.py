@@ -0,0 +1,188 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import functools
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import htool
+from htool import parallel
+
+
+def _make_page(number):
+    return htool.Div(htool.P('Page {}'.format(number)))
+
+
+def _build_tree():
+    return htool.Body(*(htool.Section(htool.H2('Section {}'.format(index)),
+                                      htool.Ul(*range(20)),
+                                      htool.Pre('a\n  b'))
+                        for index in range(100)))
+
+
+class TestImport(unittest.TestCase):
+    def test_multiprocessing_not_imported(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, htool; '
+             'print("multiprocessing" in sys.modules)'], cwd=root)
+        self.assertEqual(output.strip(), b'False')
+
+
+def _build_deep_tree():
+    def build():
+        span = htool.Span('x')
+        for index in range(2000):
+            span = htool.Span(span)
+        return span
+    return htool.Body(htool.Div(build()), htool.Div(build()))
+
+
+def _fail(*args):
+    raise AssertionError('The tree is split')
+
+
+class TestRenderParallel(unittest.TestCase):
+    def setUp(self):
+        # The tests also run the workers on single-CPU machines
+        self.get_cpu_count = parallel._get_cpu_count
+        parallel._get_cpu_count = lambda: 4
+
+    def tearDown(self):
+        parallel._get_cpu_count = self.get_cpu_count
+
+    def test_same_output(self):
+        tree = _build_tree()
+        for indent in ('', '    '):
+            for minify in (False, True):
+                self.assertEqual(
+                    parallel.render_parallel(tree, indent=indent, workers=2,
+                                             min_part_size=50,
+                                             minify=minify, min_size=0),
+                    tree.compile(indent=indent, minify=minify))
+
+    def test_serial(self):
+        tree = _build_tree()
+        split = parallel._split
+        parallel._split = _fail
+        try:
+            # Below the size threshold
+            self.assertEqual(parallel.render_parallel(tree, workers=2),
+                             tree.compile())
+            # Fewer than 2 CPUs
+            parallel._get_cpu_count = lambda: 1
+            self.assertEqual(parallel.render_parallel(tree, workers=2,
+                                                      min_size=0),
+                             tree.compile())
+        finally:
+            parallel._split = split
+
+    def test_pickled(self):
+        tree = _build_tree()
+        get_fork_context = parallel._get_fork_context
+        parallel._get_fork_context = lambda: None
+        try:
+            self.assertEqual(
+                parallel.render_parallel(tree, workers=2, min_part_size=50,
+                                         min_size=0),
+                tree.compile())
+            # The parts too deep to be pickled are compiled in this process
+            tree = _build_deep_tree()
+            self.assertEqual(
+                parallel.render_parallel(tree, workers=2, min_part_size=2000,
+                                         min_size=0),
+                tree.compile())
+        finally:
+            parallel._get_fork_context = get_fork_context
+
+    def test_compile_workers(self):
+        tree = _build_tree()
+        self.assertEqual(tree.compile(workers=2), tree.compile())
+        self.assertEqual(tree.compile(workers=1), tree.compile())
+
+    def test_small_tree(self):
+        div = htool.Div(htool.P('a'))
+        self.assertEqual(div.compile(workers=2), div.compile())
+
+    def test_fragments(self):
+        div = htool.Div(htool.LazyChildren(htool.P(index)
+                                           for index in range(3000)))
+        expected = htool.Div(*(htool.P(index)
+                               for index in range(3000))).compile()
+        self.assertEqual(div.compile(workers=2), expected)
+
+
+class TestRenderMany(unittest.TestCase):
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outdir)
+
+    def _check(self, workers):
+        items = [(os.path.join('sub', 'page{}.html'.format(number)),
+                  functools.partial(_make_page, number))
+                 for number in range(20)]
+        items.append(('tree.html', _make_page(20)))
+        results = parallel.render_many(iter(items), self.outdir,
+                                       workers=workers)
+        self.assertEqual(len(results), 21)
+        for number, result in enumerate(results):
+            self.assertEqual(result.path, os.path.join(self.outdir,
+                                                       items[number][0]))
+            with open(result.path) as f:
+                content = f.read()
+            self.assertEqual(content, _make_page(number).compile())
+            self.assertEqual(result.size, len(content))
+            self.assertGreaterEqual(result.seconds, 0)
+
+    def test_serial(self):
+        self._check(1)
+
+    def test_workers(self):
+        self._check(2)
+
+    def test_encoding(self):
+        page = htool.Div(htool.P('caff\xe8 \u20ac'))
+        for encoding in ('utf-8', 'latin-1', None):
+            results = parallel.render_many([('page.html', page)],
+                                           self.outdir, workers=1,
+                                           encoding=encoding)
+            with open(results[0].path, 'rb') as f:
+                content = f.read()
+            if encoding is None:
+                self.assertEqual(content.decode('ascii'), page.compile())
+            else:
+                self.assertEqual(content, page.compile_bytes(
+                    encoding=encoding))
+            self.assertEqual(results[0].size, len(content))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import io
+import unittest
+
+import htool
+from htool import text
+from htool.parser import GenericElement, GenericVoidElement, parse, Parser
+
+
+_SOURCE = ('<!DOCTYPE html><html><head><title>T</title></head>'
+           '<body><div id="d" class="a b"><p>a &amp; b &#233; &lt;<br>'
+           '<b>c</b></p><!-- note --><ul><li>1</li><li>2</li></ul></div>'
+           '</body></html>')
+
+
+def _minified(markup):
+    return parse(markup).compile(minify=True)
+
+
+class TestParse(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(_minified(_SOURCE),
+                         _SOURCE.replace('<!DOCTYPE html>', '<!doctype html>')
+                         .replace('<br>', '<br />'))
+
+    def test_classes(self):
+        root = parse(_SOURCE)
+        self.assertIsInstance(root, htool.ElementContainer)
+        self.assertIsInstance(root.children[0], htool.Doctype)
+        html = root.children[1]
+        self.assertIsInstance(html, htool.Html)
+        div = html.children[1].children[0]
+        self.assertIsInstance(div, htool.Div)
+        self.assertIsInstance(div.children[1], htool.Comment)
+        self.assertIs(div.parent_element, html.children[1])
+
+    def test_attributes(self):
+        p = parse('<p title="a &lt; b" z="1" a="2" hidden>').children[0]
+        # The values are unescaped, and escaped again when compiled
+        self.assertEqual(p.get_attribute('title'), 'a < b')
+        self.assertEqual(list(p.attributes), ['title', 'z', 'a', 'hidden'])
+        self.assertEqual(p.compile(),
+                         '<p title="a &lt; b" z="1" a="2" hidden></p>')
+
+    def test_character_references(self):
+        # The texts are kept as they are in the source, so that they are not
+        # escaped twice
+        p = parse('<p>&lt;b&gt; &eacute; &#xe9; \xe9</p>').children[0]
+        self.assertIsInstance(p.children[0].text, text.TextRaw)
+        self.assertEqual(p.compile(), '<p>&lt;b&gt; &eacute; &#xe9; \xe9</p>')
+        # Also without the final ';'
+        source = '<p>&amp &lt;x &#233 &#xe9x &copy;&copy</p>'
+        self.assertEqual(parse(source).compile(), source)
+        parser = Parser()
+        for char in source:
+            parser.feed(char)
+        self.assertEqual(parser.close().compile(), source)
+
+    def test_unknown_tags(self):
+        root = parse('<my-el a="1">x</my-el><my-void />')
+        self.assertIsInstance(root.children[0], GenericElement)
+        self.assertEqual(root.children[0].tag, 'my-el')
+        self.assertIsInstance(root.children[1], GenericVoidElement)
+        self.assertEqual(root.compile(minify=True),
+                         '<my-el a="1">x</my-el><my-void />')
+
+    def test_void_elements(self):
+        self.assertEqual(_minified('<p>a<br>b<img src="x">c</p>'),
+                         '<p>a<br />b<img src="x" />c</p>')
+        self.assertEqual(_minified('<br/><hr />'), '<br /><hr />')
+
+    def test_implicitly_closed(self):
+        self.assertEqual(_minified('<ul><li>a<li>b</ul>'),
+                         '<ul><li>a</li><li>b</li></ul>')
+        self.assertEqual(_minified('<p>a<p>b'), '<p>a</p><p>b</p>')
+        self.assertEqual(_minified('<p>a<div>b'),
+                         '<p>a<div>b</div></p>')
+
+    def test_unclosed(self):
+        self.assertEqual(_minified('<div><p>a'), '<div><p>a</p></div>')
+        self.assertEqual(_minified('<div><p>a</div>b'),
+                         '<div><p>a</p></div>b')
+
+    def test_stray_end_tags(self):
+        self.assertEqual(_minified('a</span><p>b</i></p>'), 'a<p>b</p>')
+
+    def test_other_markup(self):
+        self.assertEqual(_minified('<?xml version="1.0"?><!DOCTYPE x>'),
+                         '<?xml version="1.0"?><!DOCTYPE x>')
+        self.assertEqual(_minified('<svg><![CDATA[a < b]]></svg>'),
+                         '<svg><![CDATA[a < b]]></svg>')
+
+    def test_empty(self):
+        self.assertEqual(parse('').children, [])
+        self.assertEqual(_minified('text'), 'text')
+
+
+class TestIncremental(unittest.TestCase):
+    def test_chunks(self):
+        for size in (1, 2, 7, 64):
+            parser = Parser()
+            for start in range(0, len(_SOURCE), size):
+                parser.feed(_SOURCE[start:start + size])
+            self.assertEqual(parser.close().compile(),
+                             parse(_SOURCE).compile())
+
+    def test_merged_text(self):
+        parser = Parser()
+        for char in 'a &amp; b':
+            parser.feed(char)
+        root = parser.close()
+        self.assertEqual(len(root.children), 1)
+        self.assertEqual(root.compile(), 'a &amp; b')
+
+    def test_file(self):
+        source = _SOURCE * 2000
+        self.assertEqual(parse(io.StringIO(source)).compile(),
+                         parse(source).compile())
+
+    def test_callback(self):
+        # The removed elements are not kept in the tree
+        seen = []
+
+        def callback(element):
+            seen.append(element.tag)
+            return element.tag in ('li', 'br')
+        root = parse(_SOURCE, callback=callback)
+        self.assertEqual(seen.count('li'), 2)
+        self.assertEqual(seen[-1], 'html')
+        self.assertIn('br', seen)
+        self.assertNotIn('<li>', root.compile())
+        self.assertNotIn('<br', root.compile())
+        self.assertIn('<ul></ul>', root.compile(minify=True))
+
+    def test_callback_unclosed(self):
+        seen = []
+        parse('<div><p>a<p>b', callback=lambda element: seen.append(
+            element.tag))
+        self.assertEqual(seen, ['p', 'p', 'div'])
+
+
+if __name__ == '__main__':
+    unittest.main()
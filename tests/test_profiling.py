@@ -0,0 +1,181 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import threading
+import time
+import unittest
+
+import htool
+from htool import dom, profiling, tables, text
+from htool.dom import _Renderer
+
+
+def _build():
+    return htool.Div(htool.P('a < b', htool.Span('c')),
+                     htool.P('d'),
+                     htool.Ul(htool.Li('e'), htool.Li('f')))
+
+
+class TestProfile(unittest.TestCase):
+    def test_statistics(self):
+        div = _build()
+        with htool.profile() as p:
+            compiled = div.compile()
+        stats = p.as_dict()
+        self.assertEqual(stats['classes']['P']['count'], 2)
+        self.assertEqual(stats['classes']['Li']['count'], 2)
+        self.assertEqual(stats['classes']['_TextNode']['count'], 5)
+        self.assertEqual(stats['tags']['div']['cumulative_output'],
+                         len(compiled))
+        self.assertEqual(stats['tags']['div']['output'],
+                         len(compiled) - sum(
+                             stats['tags'][tag]['cumulative_output']
+                             for tag in ('p', 'ul')))
+        for values in stats['classes'].values():
+            self.assertGreaterEqual(values['cumulative'], values['self'])
+            self.assertGreaterEqual(values['self'], 0.0)
+        self.assertIn('Span', p.table())
+        self.assertIn('span', p.table(by='tags', sort='count', limit=5))
+
+    def test_restored(self):
+        escape = text._escape
+        batch_escapes = dict(tables._BATCH_ESCAPES)
+        with htool.profile():
+            self.assertIsNotNone(_Renderer.HOOK)
+            self.assertIsNot(text._escape, escape)
+            self.assertIs(tables._escape, text._escape)
+        self.assertIsNone(_Renderer.HOOK)
+        self.assertIs(text._escape, escape)
+        self.assertIs(tables._escape, escape)
+        self.assertEqual(tables._BATCH_ESCAPES, batch_escapes)
+        self.assertIsNone(profiling._active)
+
+    def test_nested(self):
+        with htool.profile():
+            self.assertRaises(RuntimeError, htool.profile().__enter__)
+
+    def test_same_output(self):
+        div = _build()
+        expected = div.compile()
+        with htool.profile():
+            self.assertEqual(div.compile(), expected)
+            self.assertEqual(div.compile(minify=True),
+                             _build().compile(minify=True))
+
+    def test_escape_calls(self):
+        with htool.profile() as p:
+            htool.Div(htool.P('a'), htool.Span('b')).compile()
+        self.assertEqual(p.escape_calls, 2)
+
+    def test_table_escape_calls(self):
+        # tables.py imports the escape functions by name
+        rows = [['a < b', 'c'] for _ in range(100)]
+        expected = htool.Table(htool.RowSource(rows)).compile()
+        with htool.profile() as p:
+            compiled = htool.Table(htool.RowSource(rows)).compile()
+        self.assertEqual(compiled, expected)
+        self.assertEqual(p.escape_calls, 200)
+
+    def test_column_escape_calls(self):
+        # The columns of strings are still escaped in one pass, if they
+        # contain any character to escape
+        columns = [['a < b'] * 100, ['c'] * 100]
+        expected = htool.Table(htool.ColumnSource(columns)).compile()
+        with htool.profile() as p:
+            compiled = htool.Table(htool.ColumnSource(columns)).compile()
+        self.assertEqual(compiled, expected)
+        self.assertEqual(p.escape_calls, 1)
+
+    def test_consumer_time_excluded(self):
+        div = htool.Div(*[htool.P(str(n)) for n in range(5)])
+        with htool.profile() as p:
+            for _ in div.iter_compile():
+                time.sleep(0.01)
+        self.assertLess(p.classes['Div'][1], 0.01)
+
+    def test_interrupted(self):
+        with htool.profile() as p:
+            iterator = _build().iter_compile()
+            next(iterator)
+            next(iterator)
+            iterator.close()
+            self.assertEqual(_Renderer.HOOK.stack, [])
+            htool.Div(htool.P('x')).compile()
+        self.assertEqual(p.classes['Div'][0], 1)
+
+    def test_other_threads(self):
+        def compile_():
+            htool.Div(htool.Em('a')).compile()
+        with htool.profile() as p:
+            thread = threading.Thread(target=compile_)
+            thread.start()
+            thread.join()
+            htool.P('b').compile()
+        self.assertNotIn('Em', p.classes)
+        self.assertEqual(list(p.tags), ['p'])
+        self.assertEqual(p.escape_calls, 1)
+
+
+class TestProfileRenderCache(unittest.TestCase):
+    def setUp(self):
+        dom.RENDER_CACHE = True
+        dom.reset_render_cache_info()
+
+    def tearDown(self):
+        dom.RENDER_CACHE = False
+
+    def test_hits(self):
+        div = _build()
+        expected = div.compile()
+        with htool.profile() as p:
+            self.assertEqual(div.compile(), expected)
+        self.assertEqual(p.render_cache, [1, 0])
+        self.assertEqual(p.classes['Div'][0], 1)
+        self.assertEqual(p.classes['Div'][4], len(expected))
+        self.assertNotIn('P', p.classes)
+
+    def test_misses(self):
+        div = _build()
+        with htool.profile() as p:
+            compiled = div.compile()
+        self.assertEqual(p.render_cache, [0, 7])
+        self.assertEqual(p.classes['P'][0], 2)
+        self.assertEqual(div.compile(), compiled)
+        self.assertEqual(dom.render_cache_info().hits, 1)
+
+    def test_not_cacheable(self):
+        # The containers of the nodes that are not CACHEABLE aren't cached
+        # while profiling either
+        items = [['a'], ['b']]
+        div = htool.Div(htool.P('x'),
+                        htool.LazyChildren(iter(items.pop(0))))
+        with htool.profile():
+            first = div.compile()
+        div.children[1].iterable = iter(items.pop(0))
+        self.assertNotEqual(div.compile(), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
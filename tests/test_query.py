@@ -0,0 +1,303 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import unittest
+
+import htool
+from htool import query
+
+
+def _ids(elements):
+    return [element.get_attribute('id') for element in elements]
+
+
+class QueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = htool.Div(
+            htool.Section(
+                htool.H2('Title', id='h1', class_='title main'),
+                htool.P('a', htool.Em('b', id='em1'), id='p1',
+                        class_='text'),
+                htool.P('c', id='p2', lang='en-US'),
+                htool.Ul(*[htool.Li(str(n), id='li{}'.format(n),
+                                    class_='odd' if n % 2 else 'even')
+                           for n in range(1, 8)], id='ul1'),
+                'text',
+                htool.P('d', id='p3', title='x y'),
+                id='s1', class_='section'),
+            htool.Section(
+                htool.P(htool.Span('e', id='sp1'), id='p4',
+                        **{'data-x': 'prefix-value'}),
+                id='s2', class_='section other'),
+            id='root')
+
+    def assertSelect(self, selector, expected):
+        self.assertEqual(_ids(self.root.select(selector)), expected)
+
+
+class TestSimpleSelectors(QueryTestCase):
+    def test_type(self):
+        self.assertSelect('p', ['p1', 'p2', 'p3', 'p4'])
+        self.assertSelect('P', ['p1', 'p2', 'p3', 'p4'])
+
+    def test_universal(self):
+        self.assertEqual(len(self.root.select('*')), 17)
+        self.assertSelect('section > *', ['h1', 'p1', 'p2', 'ul1', 'p3',
+                                         'p4'])
+
+    def test_id(self):
+        self.assertSelect('#p2', ['p2'])
+        self.assertSelect('p#p2', ['p2'])
+        self.assertSelect('span#p2', [])
+        self.assertSelect('#missing', [])
+
+    def test_class(self):
+        self.assertSelect('.section', ['s1', 's2'])
+        self.assertSelect('.section.other', ['s2'])
+        self.assertSelect('.title', ['h1'])
+        self.assertSelect('.main', ['h1'])
+        self.assertSelect('.mai', [])
+
+    def test_root_excluded(self):
+        self.assertSelect('div', [])
+        self.assertSelect('#root', [])
+        self.assertIsNone(self.root.select_one('#root'))
+
+    def test_select_one(self):
+        self.assertEqual(self.root.select_one('p').get_attribute('id'), 'p1')
+        self.assertIsNone(self.root.select_one('table'))
+
+
+class TestAttributeSelectors(QueryTestCase):
+    def test_presence(self):
+        self.assertSelect('[lang]', ['p2'])
+        self.assertSelect('p[title]', ['p3'])
+        self.assertSelect('[missing]', [])
+
+    def test_operators(self):
+        self.assertSelect('[lang=en-US]', ['p2'])
+        self.assertSelect('[lang=en]', [])
+        self.assertSelect('[title~=y]', ['p3'])
+        self.assertSelect('[title~=x]', ['p3'])
+        self.assertSelect('[title~="x y"]', [])
+        self.assertSelect('[lang|=en]', ['p2'])
+        self.assertSelect('[lang|=e]', [])
+        self.assertSelect('[data-x^=prefix]', ['p4'])
+        self.assertSelect('[data-x$=value]', ['p4'])
+        self.assertSelect('[data-x*=x-v]', ['p4'])
+        self.assertSelect('[data-x*=z]', [])
+
+    def test_empty_values(self):
+        self.assertSelect('[lang^=""]', [])
+        self.assertSelect('[lang$=""]', [])
+        self.assertSelect('[lang*=""]', [])
+
+    def test_quoted_values(self):
+        self.assertSelect('[title="x y"]', ['p3'])
+        self.assertSelect("[title='x y']", ['p3'])
+        self.assertSelect('[ title = "x y" ]', ['p3'])
+
+    def test_value_types(self):
+        root = htool.Div(htool.P(id=1), htool.P())
+        root.children[1].set_attribute('class', htool.TextRaw('a b'))
+        self.assertEqual(len(root.select('#1')), 1)
+        self.assertEqual(len(root.select('.a')), 1)
+        self.assertEqual(len(root.select('.b')), 1)
+
+
+class TestPseudoClasses(QueryTestCase):
+    def test_first_last_only(self):
+        self.assertSelect('li:first-child', ['li1'])
+        self.assertSelect('li:last-child', ['li7'])
+        self.assertSelect('p:first-child', ['p4'])
+        self.assertSelect('span:only-child', ['sp1'])
+        self.assertSelect('li:only-child', [])
+
+    def test_nth_child(self):
+        self.assertSelect('li:nth-child(odd)', ['li1', 'li3', 'li5', 'li7'])
+        self.assertSelect('li:nth-child(even)', ['li2', 'li4', 'li6'])
+        self.assertSelect('li:nth-child(3)', ['li3'])
+        self.assertSelect('li:nth-child(3n)', ['li3', 'li6'])
+        self.assertSelect('li:nth-child(3n+1)', ['li1', 'li4', 'li7'])
+        self.assertSelect('li:nth-child(2n-1)', ['li1', 'li3', 'li5', 'li7'])
+        self.assertSelect('li:nth-child(-n+2)', ['li1', 'li2'])
+        self.assertSelect('li:nth-child(n+6)', ['li6', 'li7'])
+
+    def test_nth_last_child(self):
+        self.assertSelect('li:nth-last-child(1)', ['li7'])
+        self.assertSelect('li:nth-last-child(odd)', ['li1', 'li3', 'li5',
+                                                     'li7'])
+        self.assertSelect('li:nth-last-child(-n+2)', ['li6', 'li7'])
+
+    def test_text_nodes_not_counted(self):
+        # The text between ul1 and p3 is not a sibling element
+        self.assertSelect('section > :nth-child(5)', ['p3'])
+
+    def test_not(self):
+        self.assertSelect('li:not(.odd)', ['li2', 'li4', 'li6'])
+        self.assertSelect('p:not([lang]):not(#p1)', ['p3', 'p4'])
+        self.assertSelect('section:not(.other)', ['s1'])
+        self.assertSelect('p:not(p)', [])
+        self.assertSelect('p:not(*)', [])
+
+
+class TestCombinators(QueryTestCase):
+    def test_descendant(self):
+        self.assertSelect('section em', ['em1'])
+        self.assertSelect('section li.even', ['li2', 'li4', 'li6'])
+        self.assertSelect('#s2 p span', ['sp1'])
+        self.assertSelect('#s1 span', [])
+
+    def test_descendant_above_root(self):
+        section = self.root.children[0]
+        self.assertEqual(_ids(section.select('div p')), ['p1', 'p2', 'p3'])
+
+    def test_child(self):
+        self.assertSelect('section > p', ['p1', 'p2', 'p3', 'p4'])
+        self.assertSelect('section > em', [])
+        self.assertSelect('ul > li:first-child', ['li1'])
+        self.assertSelect('div > section > h2', ['h1'])
+
+    def test_adjacent_sibling(self):
+        self.assertSelect('h2 + p', ['p1'])
+        self.assertSelect('p + p', ['p2'])
+        self.assertSelect('ul + p', ['p3'])
+        self.assertSelect('li.odd + li', ['li2', 'li4', 'li6'])
+        self.assertSelect('section + section', ['s2'])
+
+    def test_general_sibling(self):
+        self.assertSelect('h2 ~ p', ['p1', 'p2', 'p3'])
+        self.assertSelect('#li5 ~ li', ['li6', 'li7'])
+        self.assertSelect('li ~ li', ['li2', 'li3', 'li4', 'li5', 'li6',
+                                      'li7'])
+        self.assertSelect('ul ~ h2', [])
+
+    def test_mixed(self):
+        self.assertSelect('section > h2 ~ ul li:nth-child(2n)',
+                          ['li2', 'li4', 'li6'])
+        self.assertSelect('.section p > em', ['em1'])
+        self.assertSelect('h2 + p ~ ul > li:last-child', ['li7'])
+        self.assertSelect('div section.other p span', ['sp1'])
+
+    def test_deep_tree(self):
+        root = node = htool.Div()
+        for _ in range(5000):
+            child = htool.Div()
+            node.append_child(child)
+            node = child
+        node.append_child(htool.Span(id='deep'))
+        self.assertEqual(_ids(root.select('div div > span')), ['deep'])
+        self.assertEqual(_ids(root.select('p span')), [])
+
+
+class TestSelectorLists(QueryTestCase):
+    def test_document_order(self):
+        self.assertSelect('#p3, h2, #sp1, #p1', ['h1', 'p1', 'p3', 'sp1'])
+
+    def test_no_duplicates(self):
+        self.assertSelect('p, .text, #p1', ['p1', 'p2', 'p3', 'p4'])
+
+
+class TestInvalidSelectors(unittest.TestCase):
+    def test_invalid(self):
+        root = htool.Div(htool.P())
+        for selector in ('', ' ', ',', 'p,', ',p', 'a >', '> a', 'a > > b',
+                         '[x', '[x=]', '#', '.', 'p!', ':unknown',
+                         ':nth-child(x)', ':nth-child()', ':not(a b)',
+                         ':not(a > b)'):
+            self.assertRaises(ValueError, root.select, selector)
+
+    def test_compile_selector(self):
+        match = query.compile_selector('p.a')
+        self.assertTrue(match(htool.P(class_='b a'), {}))
+        self.assertFalse(match(htool.P(class_='b'), {}))
+        self.assertRaises(ValueError, query.compile_selector, 'p[')
+
+
+class TestIndex(QueryTestCase):
+    def setUp(self):
+        super(TestIndex, self).setUp()
+        self.root.enable_index()
+
+    def assertSelectAgrees(self, root, selector):
+        indexed = root.select(selector)
+        root.disable_index()
+        try:
+            self.assertEqual(root.select(selector), indexed)
+        finally:
+            root.enable_index()
+
+    def test_same_results(self):
+        for selector in ('#p2', '#li3', 'p#p2', 'span#p2', '#missing',
+                         '.section', '.odd', 'li.odd', '.odd.even', 'em',
+                         'section p', '#s2 p', 'section > p#p4',
+                         'li:nth-child(2n).even', '#root', 'div'):
+            self.assertSelectAgrees(self.root, selector)
+
+    def test_no_walk(self):
+        def walk(*args):
+            raise AssertionError('the tree was walked')
+        iter_walk = query._iter_walk
+        query._iter_walk = walk
+        try:
+            self.assertSelect('#li3', ['li3'])
+            self.assertSelect('li.even', ['li2', 'li4', 'li6'])
+        finally:
+            query._iter_walk = iter_walk
+
+    def test_id(self):
+        self.assertSelect('#li3', ['li3'])
+        self.assertSelect('#root', [])
+        self.assertSelect('section > #li3', [])
+        self.assertSelect('ul > #li3', ['li3'])
+
+    def test_document_order(self):
+        # Indexed in insertion order, not document order
+        section = self.root.children[0]
+        section.prepend_child(htool.P(id='p0', class_='text'))
+        self.assertSelect('.text', ['p0', 'p1'])
+        self.assertSelect('p', ['p0', 'p1', 'p2', 'p3', 'p4'])
+
+    def test_subtree(self):
+        # The index of an ancestor also contains elements outside 'root'
+        section = self.root.children[1]
+        self.assertEqual(_ids(section.select('#p2')), [])
+        self.assertEqual(_ids(section.select('.section')), [])
+        self.assertEqual(_ids(section.select('p, span')), ['p4', 'sp1'])
+        self.assertSelectAgrees(section, 'p')
+
+    def test_mutations(self):
+        self.root.select('#li3')[0].set_attribute('id', 'new')
+        self.assertSelect('#li3', [])
+        self.assertSelect('#new', ['new'])
+        self.root.children[1].append_child(htool.P(id='p5', class_='text'))
+        self.assertSelect('.text', ['p1', 'p5'])
+        self.root.children[0].empty()
+        self.assertSelect('#p1', [])
+        self.assertSelect('.text', ['p5'])
+
+
+if __name__ == '__main__':
+    unittest.main()
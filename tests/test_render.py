@@ -0,0 +1,289 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import io
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+import htool
+from htool import dom
+
+
+def _build():
+    return htool.Div(htool.P('a  b', htool.Span('c < d')),
+                     htool.Pre('x\n  y'),
+                     htool.Ul(htool.Li('1'), htool.Li('\xe9')))
+
+
+_EXPECTED = ('<div>\n'
+             '  <p>a  b<span>c &lt; d</span></p>\n'
+             '  <pre>x\n  y</pre>\n'
+             '  <ul>\n'
+             '    <li>1</li>\n'
+             '    <li>&#233;</li>\n'
+             '  </ul>\n'
+             '</div>')
+
+
+class _Writer(object):
+    # A file-like object that records the writes
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+class TestIterCompile(unittest.TestCase):
+    def test_chunks(self):
+        iterator = _build().iter_compile()
+        self.assertIsInstance(iterator, types.GeneratorType)
+        chunks = list(iterator)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), _EXPECTED)
+
+    def test_same_as_compile(self):
+        for node in (_build(), htool.P(), htool.Br(), htool.P('a'),
+                     htool.ElementContainer(),
+                     htool.docs.SimpleDocument('T', 'D', _build())):
+            for indent in ('', '  '):
+                for minify in (False, True):
+                    self.assertEqual(
+                        "".join(node.iter_compile(indent=indent,
+                                                  minify=minify)),
+                        node.compile(indent=indent, minify=minify))
+
+    def test_indent(self):
+        # The content of Pre is never indented
+        self.assertEqual(_build().compile(indent='  '),
+                         _EXPECTED.replace('\n', '\n  ').replace(
+                             '\n    y', '\n  y'))
+
+    def test_lazy(self):
+        # Nothing is compiled before the first chunk is requested
+        class Failing(htool.P):
+            __slots__ = ()
+
+            def _render(self, renderer, indent):
+                raise ValueError()
+        iterator = htool.Div(Failing()).iter_compile()
+        self.assertRaises(ValueError, list, iterator)
+
+    def test_abandoned(self):
+        iterator = _build().iter_compile()
+        next(iterator)
+        iterator.close()
+        self.assertEqual(_build().compile(), _EXPECTED)
+
+
+class _Custom(dom._Element):
+    # Customized by overriding compile(), as before _render() existed
+    def compile(self, indent=""):
+        return "".join(('<x-custom>', indent, '</x-custom>'))
+
+
+class _Upper(htool.Div):
+    __slots__ = ()
+
+    def compile(self, indent=""):
+        return super(_Upper, self).compile(indent).upper()
+
+
+class TestCompileOverrides(unittest.TestCase):
+    def test_element(self):
+        self.assertEqual(_Custom().compile(), '<x-custom></x-custom>')
+        self.assertEqual(htool.Div(htool.P(_Custom())).compile(),
+                         '<div>\n  <p><x-custom>    </x-custom></p>\n</div>')
+
+    def test_container(self):
+        self.assertEqual(_Upper(htool.Span('b')).compile(),
+                         '<DIV><SPAN>B</SPAN></DIV>')
+        self.assertEqual(htool.Div(_Upper(htool.Span('b'))).compile(),
+                         '<div>\n  <DIV><SPAN>B</SPAN></DIV>\n</div>')
+        self.assertEqual(
+            htool.Div(_Upper(htool.P('a'), htool.P('b'))).compile(),
+            '<div>\n  <DIV>\n    <P>A</P>\n    <P>B</P>\n  </DIV>\n</div>')
+
+    def test_nested(self):
+        node = _Upper(htool.P(_Upper(htool.I('a'))), _Custom())
+        self.assertEqual(htool.Span(node).compile(),
+                         '<span>\n'
+                         '  <DIV>\n'
+                         '    <P>\n'
+                         '      <DIV><I>A</I></DIV>\n'
+                         '    </P>\n'
+                         '    <X-CUSTOM>    </X-CUSTOM>\n'
+                         '  </DIV>\n'
+                         '</span>')
+        self.assertEqual("".join(htool.Span(node).iter_compile()),
+                         htool.Span(node).compile())
+
+    def test_not_cacheable(self):
+        self.assertFalse(_Custom.CACHEABLE)
+        self.assertFalse(_Upper.CACHEABLE)
+        self.assertTrue(htool.Div.CACHEABLE)
+
+
+class TestWrite(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'out.html')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+        dom.WRITE_BUFFER_SIZE = 64 * 1024
+
+    def test_filename(self):
+        _build().write(self.filename)
+        with io.open(self.filename, encoding='ascii') as f:
+            self.assertEqual(f.read(), _EXPECTED)
+
+    def test_filename_encoding(self):
+        _build().write(self.filename, encoding='utf-8')
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), _build().compile_bytes())
+
+    def test_file_objects(self):
+        output = io.StringIO()
+        _build().write(output)
+        self.assertEqual(output.getvalue(), _EXPECTED)
+        output = io.BytesIO()
+        _build().write(output, encoding='utf-8', minify=True)
+        self.assertEqual(output.getvalue(),
+                         _build().compile_bytes(minify=True))
+
+    def test_open_file(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'x')
+            _build().write(f, encoding='utf-8')
+        with open(self.filename, 'rb') as f:
+            self.assertEqual(f.read(), b'x' + _build().compile_bytes())
+
+    def test_buffered(self):
+        # The chunks are grouped in writes of about WRITE_BUFFER_SIZE
+        # characters
+        node = htool.Ul(*[htool.Li(str(n)) for n in range(1000)])
+        writer = _Writer()
+        node.write(writer)
+        self.assertEqual(len(writer.writes), 1)
+        dom.WRITE_BUFFER_SIZE = 100
+        writer = _Writer()
+        node.write(writer)
+        self.assertEqual("".join(writer.writes), node.compile())
+        self.assertGreater(len(writer.writes), 100)
+        for data in writer.writes[:-1]:
+            self.assertGreaterEqual(len(data), 100)
+            self.assertLess(len(data), 200)
+
+    def test_empty(self):
+        writer = _Writer()
+        htool.ElementContainer().write(writer)
+        self.assertEqual("".join(writer.writes), '')
+
+
+class TestDeepTrees(unittest.TestCase):
+    def _chain(self, depth):
+        root = node = htool.Div()
+        for _ in range(depth):
+            child = htool.Div()
+            node.append_child(child)
+            node = child
+        node.append_child('x')
+        return root
+
+    def test_deep(self):
+        depth = sys.getrecursionlimit() * 3
+        compiled = self._chain(depth).compile()
+        self.assertEqual(compiled.count('<div>'), depth + 1)
+        self.assertTrue(compiled.startswith('<div>\n  <div>\n    <div>'))
+        self.assertIn('\n' + '  ' * depth + '<div>x</div>\n', compiled)
+        self.assertEqual(self._chain(depth).compile(minify=True),
+                         '<div>' * (depth + 1) + 'x' + '</div>' * (depth + 1))
+
+    def test_deep_inline(self):
+        depth = sys.getrecursionlimit() * 3
+        root = node = htool.Span()
+        for _ in range(depth):
+            child = htool.Span()
+            node.append_child(child)
+            node = child
+        self.assertEqual(root.compile(),
+                         '<span>' * (depth + 1) + '</span>' * (depth + 1))
+
+    def test_wide(self):
+        width = 20000
+        node = htool.Div(*[htool.Span(str(n)) for n in range(width)])
+        compiled = node.compile()
+        self.assertEqual(compiled.count('<span>'), width)
+        self.assertTrue(compiled.endswith('<span>19999</span></div>'))
+
+    def test_deep_write(self):
+        depth = sys.getrecursionlimit() * 3
+        output = io.BytesIO()
+        self._chain(depth).write(output, encoding='utf-8')
+        self.assertEqual(output.getvalue().count(b'</div>'), depth + 1)
+
+
+class TestMinify(unittest.TestCase):
+    def test_minify(self):
+        self.assertEqual(_build().compile(minify=True),
+                         '<div><p>a  b<span>c &lt; d</span></p>'
+                         '<pre>x\n  y</pre>'
+                         '<ul><li>1</li><li>&#233;</li></ul></div>')
+
+    def test_preserve_whitespace(self):
+        node = htool.Div(htool.Textarea('a\n b'),
+                         htool.Pre(htool.B('x'), '\n', htool.I('y')))
+        self.assertEqual(node.compile(minify=True),
+                         '<div><textarea>a\n b</textarea>'
+                         '<pre><b>x</b>\n<i>y</i></pre></div>')
+
+    def test_inline(self):
+        self.assertEqual(htool.Div('a', htool.Br(), 'b').compile(minify=True),
+                         '<div>a<br />b</div>')
+
+    def test_indent(self):
+        # The base indentation is never output without line breaks
+        self.assertEqual(_build().compile(indent='  ', minify=True),
+                         _build().compile(minify=True))
+
+    def test_document(self):
+        document = htool.docs.SimpleDocument('T', 'D', htool.Div(
+            htool.P('a'), htool.Ul(htool.Li('b'))))
+        self.assertNotIn('\n', document.compile(minify=True))
+
+    def test_bytes(self):
+        self.assertEqual(_build().compile_bytes(minify=True),
+                         _build().compile(minify=True).replace(
+                             '&#233;', '\xe9').encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
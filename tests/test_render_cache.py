@@ -0,0 +1,202 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import gc
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+
+import htool
+from htool import dom
+from htool.templates import Slot
+
+
+class _Awaitable(object):
+    def __await__(self):
+        return iter(())
+
+
+class RenderCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        dom.RENDER_CACHE = True
+        dom.reset_render_cache_info()
+
+    def tearDown(self):
+        dom.RENDER_CACHE = False
+
+
+class TestRenderCache(RenderCacheTestCase):
+    def test_hits(self):
+        div = htool.Div(htool.P('a'), htool.P('b'))
+        expected = '<div>\n  <p>a</p>\n  <p>b</p>\n</div>'
+        self.assertEqual(div.compile(), expected)
+        self.assertEqual(dom.render_cache_info().misses, 3)
+        self.assertEqual(div.compile(), expected)
+        self.assertEqual(dom.render_cache_info().hits, 1)
+
+    def test_indentation(self):
+        div = htool.Div(htool.P('a'), htool.P('b'))
+        div.compile()
+        self.assertEqual(div.compile(indent='  '),
+                         '<div>\n    <p>a</p>\n    <p>b</p>\n  </div>')
+        self.assertEqual(div.compile(minify=True),
+                         '<div><p>a</p><p>b</p></div>')
+
+    def test_invalidation(self):
+        paragraph = htool.P('a')
+        span = htool.Span('b')
+        div = htool.Div(htool.Section(paragraph), span)
+        div.compile()
+        paragraph.append_child('c')
+        self.assertEqual(div.compile(), '<div>\n  <section>\n    <p>ac</p>\n'
+                         '  </section>\n  <span>b</span>\n</div>')
+        span.set_attribute('id', 'x')
+        self.assertIn('<span id="x">b</span>', div.compile())
+        paragraph.empty()
+        self.assertIn('<p></p>', div.compile())
+        paragraph.prepend_child('d')
+        self.assertIn('<p>d</p>', div.compile())
+        span.add_classes('y')
+        self.assertIn('<span id="x" class="y">b</span>', div.compile())
+
+
+class TestCachedOutputs(RenderCacheTestCase):
+    def setUp(self):
+        super(TestCachedOutputs, self).setUp()
+        self.size = dom.RENDER_CACHE_SIZE
+
+    def tearDown(self):
+        dom.RENDER_CACHE_SIZE = self.size
+        super(TestCachedOutputs, self).tearDown()
+
+    def _build(self):
+        return htool.Div(*(htool.Section(htool.P('x' * 600))
+                           for index in range(4)))
+
+    def test_shared(self):
+        div = self._build()
+        compiled = div.compile()
+        self.assertEqual(div.compile(), compiled)
+        # The output of the children is referenced, not copied
+        parts = div._render_cache[1].parts
+        for child in div.children:
+            self.assertIn(child._render_cache[1], parts)
+        self.assertLess(div._render_cache[1].size, 100)
+        self.assertEqual(len(div._render_cache[1]), len(compiled))
+
+    def test_size(self):
+        # The nodes reference their parents
+        gc.collect()
+        size = dom._render_cache_size[0]
+        div = self._build()
+        div.compile()
+        self.assertGreater(dom._render_cache_size[0], size + 4 * 600)
+        self.assertLess(dom._render_cache_size[0], size + 5 * 600)
+        div.children[0].children[0].append_child('y')
+        del div
+        gc.collect()
+        self.assertEqual(dom._render_cache_size[0], size)
+
+    def test_bounded(self):
+        size = dom._render_cache_size[0]
+        dom.RENDER_CACHE_SIZE = size + 2 * 700
+        div = self._build()
+        compiled = div.compile()
+        self.assertLessEqual(dom._render_cache_size[0],
+                             dom.RENDER_CACHE_SIZE)
+        self.assertEqual(div.compile(), compiled)
+        self.assertIsNone(div._render_cache)
+        self.assertIsNone(div.children[3]._render_cache)
+
+    def test_deep(self):
+        span = root = htool.Span('x' * 600)
+        for index in range(5000):
+            span = htool.Span(span)
+        compiled = span.compile()
+        self.assertEqual(len(compiled), 600 + 5001 * 13)
+        self.assertEqual(span.compile(), compiled)
+        self.assertLess(dom._render_cache_size[0], 2 * len(compiled))
+        root.append_child('y')
+        self.assertEqual(len(span.compile()), len(compiled) + 1)
+
+
+class TestNotCacheable(RenderCacheTestCase):
+    def test_file(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tempdir, 'part.html')
+            with open(filename, 'w') as f:
+                f.write('<b>old</b>')
+            div = htool.Div(htool.Section(htool.HTMLFile(filename)),
+                            htool.P('static'))
+            self.assertIn('<b>old</b>', div.compile())
+            with open(filename, 'w') as f:
+                f.write('<i>new content</i>')
+            compiled = div.compile()
+            self.assertIn('<i>new content</i>', compiled)
+            self.assertNotIn('old', compiled)
+            # The siblings are still cached
+            self.assertIsNotNone(div.children[1]._render_cache)
+            self.assertIsNone(div._render_cache)
+            self.assertIsNone(div.children[0]._render_cache)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_lazy_children(self):
+        expected = []
+        for cache in (False, True):
+            dom.RENDER_CACHE = cache
+            div = htool.Div(htool.Ul(htool.LazyChildren(
+                htool.Li(item) for item in 'ab')))
+            expected.append((div.compile(), div.compile()))
+        self.assertEqual(expected[0], expected[1])
+        self.assertEqual(expected[1][1], '<div>\n  <ul></ul>\n</div>')
+
+    def test_row_source(self):
+        table = htool.Table(htool.RowSource(iter([(1, 2)])))
+        self.assertIn('<td>1</td>', table.compile())
+        self.assertEqual(table.compile(), '<table></table>')
+
+    def test_slot(self):
+        paragraph = htool.P('a')
+        div = htool.Div(htool.Section(Slot('content', paragraph)))
+        div.compile()
+        # The default value is not part of the tree, so modifying it doesn't
+        # invalidate the ancestors of the slot
+        paragraph.append_child('b')
+        self.assertIn('<p>ab</p>', div.compile())
+
+    def test_async_child(self):
+        section = htool.Section(htool.P('a'))
+        div = htool.Div(section, _Awaitable())
+        self.assertRaises(TypeError, div.compile)
+        self.assertIsNotNone(section._render_cache)
+        self.assertIsNone(div._render_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
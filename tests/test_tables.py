@@ -0,0 +1,262 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import pickle
+import unittest
+
+import htool
+from htool import text
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_ROWS = [['a', 'b < c', 1, 2.5, True],
+         ['\xe9', None, text.TextRaw('<i>x</i>'), 'd\ne', ''],
+         [],
+         ['f', htool.B('g'), 3, None, 'h']]
+
+
+def _reference(rows, header=False, **attributes):
+    # The same rows as Tr, Td/Th and text objects
+    table = htool.Table()
+    if header:
+        table.append_header_rows(*rows, **attributes)
+    else:
+        table.append_data_rows(*rows, **attributes)
+    return table
+
+
+class _Array(object):
+    # The part of the NumPy arrays' interface used by ColumnSource
+    def __init__(self, values, kind):
+        self.values = values
+        self.dtype = type(str('dtype'), (object, ), {'kind': kind})()
+
+    def astype(self, type_):
+        return _Array([type_(value) for value in self.values], 'U')
+
+    def __len__(self):
+        return len(self.values)
+
+    def tolist(self):
+        return list(self.values)
+
+
+class TablesTestCase(unittest.TestCase):
+    def assertCompiles(self, table, expected):
+        for indent in ('', '  '):
+            for minify in (False, True):
+                self.assertEqual(table.compile(indent=indent, minify=minify),
+                                 expected.compile(indent=indent,
+                                                  minify=minify))
+        self.assertEqual(table.compile_bytes(), expected.compile_bytes())
+        self.assertEqual(table.compile_bytes(encoding='ascii'),
+                         expected.compile_bytes(encoding='ascii'))
+
+
+class TestRowSource(TablesTestCase):
+    def test_rows(self):
+        self.assertCompiles(htool.Table(htool.RowSource(_ROWS)),
+                            _reference(_ROWS))
+
+    def test_header(self):
+        self.assertCompiles(htool.Table(htool.RowSource(_ROWS, header=True)),
+                            _reference(_ROWS, header=True))
+
+    def test_row_attributes(self):
+        self.assertCompiles(
+            htool.Table(htool.RowSource(_ROWS, class_='r', data_x='1')),
+            _reference(_ROWS, class_='r', data_x='1'))
+        rows = [[]]
+        self.assertCompiles(htool.Table(htool.RowSource(rows, class_='r')),
+                            _reference(rows, class_='r'))
+
+    def test_mixed_children(self):
+        table = htool.Table(htool.Caption('c'))
+        table.append_header_row('x', 'y')
+        table.append_child(htool.RowSource([[1, 2]]))
+        table.append_data_row(3, 4)
+        expected = htool.Table(htool.Caption('c'))
+        expected.append_header_row('x', 'y')
+        expected.append_data_rows([1, 2], [3, 4])
+        self.assertCompiles(table, expected)
+
+    def test_iterables(self):
+        # The rows can be any iterables, and they are iterated again each
+        # time the table is compiled
+        rows = [('a', 'b'), iter(['c', 'd'])]
+        table = htool.Table(htool.RowSource(rows))
+        self.assertEqual(table.compile(),
+                         _reference([['a', 'b'], ['c', 'd']]).compile())
+        self.assertEqual(table.compile(),
+                         _reference([['a', 'b'], []]).compile())
+
+    def test_generator(self):
+        table = htool.Table.from_rows(([n, n * 2] for n in range(3)))
+        self.assertEqual(table.compile(),
+                         _reference([[0, 0], [1, 2], [2, 4]]).compile())
+        self.assertEqual(table.compile(), '<table></table>')
+
+    def test_custom_formatting(self):
+        # The rows are compiled as elements if the standard formatting of
+        # the cells is changed
+        htool.Td.BREAK_BEFORE = htool.Td.BREAK_AFTER = False
+        try:
+            table = htool.Table(htool.RowSource([['a', 'b']]))
+            self.assertEqual(table.compile(),
+                             _reference([['a', 'b']]).compile())
+            self.assertIn('<tr><td>a</td><td>b</td></tr>', table.compile())
+            table = htool.Table(htool.ColumnSource([['a'], ['b']]))
+            self.assertEqual(table.compile(),
+                             _reference([['a', 'b']]).compile())
+        finally:
+            del htool.Td.BREAK_BEFORE
+            del htool.Td.BREAK_AFTER
+
+    def test_escape_policy(self):
+        class Raw(htool.Td):
+            __slots__ = ()
+        Raw.DEFAULT_ESCAPE_TEXT = text.TextRaw
+        td = htool.tables.Td
+        htool.tables.Td = Raw
+        try:
+            table = htool.Table(htool.RowSource([['<b>', '\xe9']]))
+            self.assertIn('<td><b></td>', table.compile())
+            self.assertIn('<td>\xe9</td>', table.compile())
+        finally:
+            htool.tables.Td = td
+
+    def test_pickle(self):
+        table = htool.Table(htool.RowSource(_ROWS))
+        compiled = table.compile()
+        copy = pickle.loads(pickle.dumps(table))
+        self.assertIsNone(copy.children[0]._layout)
+        self.assertEqual(copy.compile(), compiled)
+
+    def test_from_rows(self):
+        table = htool.Table.from_rows(_ROWS, header=['x', 'y'], id='t')
+        expected = htool.Table(id='t')
+        expected.append_header_row('x', 'y')
+        expected.append_data_rows(*_ROWS)
+        self.assertCompiles(table, expected)
+
+
+class TestColumnSource(TablesTestCase):
+    def assertColumns(self, columns, formats=None, header=False):
+        rows = [list(row) for row in zip(*columns)]
+        if formats:
+            rows = [[value if spec is None else format(value, spec)
+                     for value, spec in zip(row, formats)] for row in rows]
+        self.assertCompiles(
+            htool.Table(htool.ColumnSource(columns, formats=formats,
+                                           header=header)),
+            _reference(rows, header=header))
+
+    def test_strings(self):
+        self.assertColumns([['a', 'b < c', '\xe9'], ['d', 'e', 'f\ng']])
+        self.assertColumns([['a', 'b'], ['c', 'd']], header=True)
+
+    def test_numbers(self):
+        self.assertColumns([[1, 2, 3], [1.5, -2.25, 1e20], [True, False, 0]])
+
+    def test_mixed(self):
+        self.assertColumns([['a', 1, None, text.TextRaw('<b>'), 2.5]])
+        self.assertColumns([[None, None]])
+
+    def test_formats(self):
+        self.assertColumns([[1.25, 2.5], [1, 2], ['a', 'b']],
+                           formats=['.1f', None, '>3'])
+        self.assertColumns([[1.25, 2.5]], formats=['.1f', '.2f'])
+
+    def test_formats_mixed(self):
+        table = htool.Table(htool.ColumnSource([[1.25, None]],
+                                               formats=['.1f']))
+        self.assertEqual(table.compile(),
+                         _reference([['1.2'], [None]]).compile())
+
+    def test_nul_characters(self):
+        # The texts are escaped one by one if they contain the separator
+        self.assertColumns([['a\x00<', 'b'], ['<', '\x00']])
+
+    def test_no_escaping(self):
+        column = ['a', 'b']
+        texts = htool.tables._escape_column(column, text._escape)
+        self.assertEqual(texts, column)
+        self.assertEqual(htool.tables._escape_column(['<', '&'],
+                                                     text._escape),
+                         ['&lt;', '&amp;'])
+
+    def test_uneven_columns(self):
+        # Like zip(), the shortest column determines the number of rows
+        self.assertColumns([['a', 'b', 'c'], ['d']])
+
+    def test_empty(self):
+        self.assertEqual(htool.Table(htool.ColumnSource([])).compile(),
+                         '<table></table>')
+        self.assertEqual(htool.Table(htool.ColumnSource([[]])).compile(),
+                         '<table></table>')
+
+    def test_array_interface(self):
+        columns = [_Array([1, 2, 3], 'i'), _Array([1.5, 2.5, 3.5], 'f'),
+                   _Array(['a', '<', 'c'], 'U')]
+        table = htool.Table(htool.ColumnSource(columns))
+        self.assertEqual(table.compile(),
+                         _reference([[1, 1.5, 'a'], [2, 2.5, '<'],
+                                     [3, 3.5, 'c']]).compile())
+        table = htool.Table(htool.ColumnSource([_Array([1.25], 'f')],
+                                               formats=['.1f']))
+        self.assertEqual(table.compile(), _reference([['1.2']]).compile())
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        columns = [numpy.arange(5), numpy.linspace(0, 1, 5),
+                   numpy.array(['a', '<', 'c', 'd', 'e'])]
+        rows = [[a, b, c] for a, b, c in zip(*[column.tolist()
+                                               for column in columns])]
+        self.assertCompiles(htool.Table(htool.ColumnSource(columns)),
+                            _reference(rows))
+
+    def test_recompiled(self):
+        table = htool.Table(htool.ColumnSource([['a', '\xe9']]))
+        compiled = table.compile()
+        self.assertEqual(table.compile_bytes(),
+                         _reference([['a'], ['\xe9']]).compile_bytes())
+        self.assertEqual(table.compile(), compiled)
+
+    def test_from_columns(self):
+        table = htool.Table.from_columns([[1.25, 2], ['a', 'b']],
+                                         header=['x', 'y'],
+                                         formats=['.1f'], class_='t')
+        expected = htool.Table(class_='t')
+        expected.append_header_row('x', 'y')
+        expected.append_data_rows(['1.2', 'a'], ['2.0', 'b'])
+        self.assertCompiles(table, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import types
+import unittest
+
+import htool
+from htool import text
+from htool.templates import InlineSlot, Slot, Template
+
+
+def _build(title=None, items=None):
+    return htool.Div(htool.H1(InlineSlot('title', title)),
+                     htool.Ul(Slot('items', items)),
+                     htool.P('a < b'))
+
+
+class TemplateTestCase(unittest.TestCase):
+    def assertRenders(self, build, indent="", **slots):
+        # A Template renders like the tree whose slots default to the values
+        template = Template(build(), indent=indent)
+        self.assertEqual(template.render(**slots),
+                         build(**slots).compile(indent=indent))
+
+
+class TestTemplate(TemplateTestCase):
+    def test_render(self):
+        template = Template(_build())
+        items = htool.ElementContainer(htool.Li('1'), htool.Li('2'))
+        self.assertEqual(template.render(title='x < y', items=items),
+                         '<div>\n'
+                         '  <h1>x &lt; y</h1>\n'
+                         '  <ul>\n'
+                         '    <li>1</li>\n'
+                         '    <li>2</li>\n'
+                         '  </ul>\n'
+                         '  <p>a &lt; b</p>\n'
+                         '</div>')
+
+    def test_same_as_compile(self):
+        for slots in ({}, {'title': 'x'}, {'title': htool.B('b')},
+                      {'items': htool.Li('1')}, {'items': 'a\nb'},
+                      {'title': 'a\nb', 'items': htool.Li(htool.P('c'))}):
+            self.assertRenders(_build, **slots)
+            self.assertRenders(_build, indent='  ', **slots)
+
+    def test_static_chunks(self):
+        # Only the slots and their parents are compiled by render()
+        template = Template(_build())
+        self.assertEqual(len(template.chunks), 5)
+        self.assertIn('<p>a &lt; b</p>', template.chunks[-1])
+
+    def test_no_slots(self):
+        tree = htool.Div(htool.P('a'), htool.Pre('x\n y'))
+        template = Template(tree)
+        self.assertEqual(template.chunks, [tree.compile()])
+        self.assertEqual(template.render(unused='x'), tree.compile())
+
+    def test_iter_render(self):
+        template = Template(_build())
+        iterator = template.iter_render(title='t')
+        self.assertIsInstance(iterator, types.GeneratorType)
+        self.assertEqual("".join(iterator), template.render(title='t'))
+
+    def test_reused(self):
+        template = Template(_build())
+        first = template.render(title='1')
+        template.render(title='2', items=htool.Li('x'))
+        self.assertEqual(template.render(title='1'), first)
+
+
+class TestSlot(TemplateTestCase):
+    def test_default(self):
+        template = Template(htool.Div(Slot('x', 'default')))
+        self.assertEqual(template.render(), '<div>\n  default\n</div>')
+        self.assertEqual(template.render(x='y'), '<div>\n  y\n</div>')
+        self.assertEqual(htool.Div(Slot('x', 'default')).compile(),
+                         '<div>\n  default\n</div>')
+
+    def test_none(self):
+        template = Template(htool.Div(Slot('x')))
+        self.assertEqual(template.render(), htool.Div(Slot('x')).compile())
+        self.assertEqual(template.render(x=None), template.render())
+
+    def test_escaping(self):
+        template = Template(htool.Div(Slot('x')))
+        self.assertEqual(template.render(x='<b>'),
+                         '<div>\n  &lt;b&gt;\n</div>')
+        self.assertEqual(template.render(x=text.TextRaw('<b>')),
+                         '<div>\n  <b>\n</div>')
+        self.assertEqual(template.render(x=3), '<div>\n  3\n</div>')
+
+    def test_parent_escaping(self):
+        # Text values are escaped like the other children of the parent
+        template = Template(htool.Script(Slot('x')))
+        self.assertEqual(template.render(x='a < b'),
+                         htool.Script(Slot('x', 'a < b')).compile())
+        self.assertIn('a < b', template.render(x='a < b'))
+
+    def test_preformatted(self):
+        def build(x=None):
+            return htool.Div(htool.Pre(Slot('x', x)), htool.P('y'))
+        self.assertRenders(build, x='a\nb')
+        self.assertRenders(build, x=htool.B('a'))
+
+    def test_not_cacheable(self):
+        self.assertFalse(Slot.CACHEABLE)
+        self.assertFalse(InlineSlot.CACHEABLE)
+
+
+class TestInlineSlot(TemplateTestCase):
+    def test_inline(self):
+        def build(x=None):
+            return htool.P('a', InlineSlot('x', x), 'b')
+        template = Template(build())
+        self.assertEqual(template.render(x='c'), '<p>acb</p>')
+        self.assertRenders(build, x='c\nd')
+        self.assertRenders(build, x=htool.Div('d'))
+        self.assertRenders(build, indent='    ', x='c\nd')
+
+    def test_nested(self):
+        def build(x=None, y=None):
+            return htool.Div(htool.Ul(htool.Li(InlineSlot('x', x)),
+                                      htool.Li(htool.Em(InlineSlot('y', y)))),
+                             Slot('x', x))
+        self.assertRenders(build, x='1', y='2')
+        self.assertRenders(build, x='1\n2')
+        self.assertRenders(build, indent='\t', y=htool.Span('s'))
+
+
+if __name__ == '__main__':
+    unittest.main()
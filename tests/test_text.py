@@ -0,0 +1,170 @@
+# Htool - HyperText Object-Oriented Layer.
+# Copyright (C) 2016 Dario Giovannetti <dev@dariogiovannetti.net>
+#
+# This file is part of Htool.
+#
+# Htool is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Htool is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Htool.  If not, see <http://www.gnu.org/licenses/>.
+
+# The module must also support Python 2
+# http://python-future.org/
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+# Support Python 2.6
+# from builtins import *
+
+import unittest
+
+import htool
+from htool import dom, text
+
+
+class TestEscape(unittest.TestCase):
+    def test_escape(self):
+        self.assertEqual(text._escape('a < b & "c"'),
+                         'a &lt; b &amp; &quot;c&quot;')
+        self.assertEqual(text._escape('\xe9'), '&#233;')
+        self.assertEqual(text._escape("'"), '&#x27;')
+
+    def test_fast_path(self):
+        rawtext = 'plain text, no characters to escape!'
+        self.assertIs(text._escape(rawtext), rawtext)
+        self.assertIs(text._escape_unicode(rawtext), rawtext)
+        rawtext = '\xe9'
+        self.assertIs(text._escape_unicode(rawtext), rawtext)
+
+    def test_escape_unicode(self):
+        self.assertEqual(text._escape_unicode('a < \xe9'), 'a &lt; \xe9')
+
+    def test_other_types(self):
+        for escape in (text._escape, text._escape_unicode):
+            self.assertEqual(escape(1), '1')
+            self.assertEqual(escape(1.5), '1.5')
+            self.assertEqual(escape(True), 'True')
+            self.assertEqual(escape(None), 'None')
+
+
+class TestTextClasses(unittest.TestCase):
+    def test_raw(self):
+        node = text.TextRaw('<b>')
+        self.assertEqual(node.escaped, '<b>')
+        self.assertEqual(node.escaped_unicode, '<b>')
+
+    def test_escaped(self):
+        node = text.TextEscaped('<\xe9')
+        self.assertEqual(node.raw, '<\xe9')
+        self.assertEqual(node.escaped, '&lt;&#233;')
+        self.assertEqual(node.escaped_unicode, '&lt;\xe9')
+
+    def test_lazy(self):
+        node = text.TextEscapedLazy('<\xe9')
+        self.assertIsNone(node._escaped)
+        self.assertEqual(node.escaped, '&lt;&#233;')
+        self.assertIs(node.escaped, node._escaped)
+        self.assertEqual(node.escaped_unicode, '&lt;\xe9')
+        self.assertEqual(text.TextEscapedLazy(3).escaped, '3')
+
+    def test_lazy_policy(self):
+        dom.DEFAULT_ESCAPE_TEXT = text.TextEscapedLazy
+        try:
+            node = htool.P('<\xe9', title='x')
+            self.assertEqual(node.compile(), '<p title="x">&lt;&#233;</p>')
+            self.assertEqual(node.compile_bytes(),
+                             '<p title="x">&lt;\xe9</p>'.encode('utf-8'))
+        finally:
+            dom.DEFAULT_ESCAPE_TEXT = None
+
+
+class TestEscapeCache(unittest.TestCase):
+    def test_hits_misses(self):
+        cache = text.EscapeCache()
+        self.assertEqual(cache.escape('a < b'), 'a &lt; b')
+        self.assertEqual(cache.escape('a < b'), 'a &lt; b')
+        self.assertEqual(cache.escape('c'), 'c')
+        self.assertEqual(cache.info(), text.CacheInfo(1, 2, 4096, 2))
+        cache.clear()
+        self.assertEqual(cache.info(), text.CacheInfo(0, 0, 4096, 0))
+
+    def test_lru(self):
+        cache = text.EscapeCache(2)
+        cache.escape('a')
+        cache.escape('b')
+        # 'a' becomes the most recently used
+        cache.escape('a')
+        cache.escape('c')
+        self.assertEqual(list(cache._cache), ['a', 'c'])
+        cache.escape('b')
+        self.assertEqual(cache.info(), text.CacheInfo(1, 4, 2, 2))
+
+    def test_resize(self):
+        cache = text.EscapeCache(None)
+        for n in range(10):
+            cache.escape(str(n))
+        self.assertEqual(cache.info().currsize, 10)
+        cache.resize(3)
+        self.assertEqual(list(cache._cache), ['7', '8', '9'])
+        cache.resize(-1)
+        self.assertEqual(cache.info().currsize, 0)
+        cache.resize(None)
+        cache.escape('x')
+        self.assertEqual(cache.info().currsize, 1)
+
+    def test_disabled(self):
+        cache = text.EscapeCache(0)
+        self.assertEqual(cache.escape('<'), '&lt;')
+        self.assertEqual(cache.escape('<'), '&lt;')
+        self.assertEqual(cache.info(), text.CacheInfo(0, 2, 0, 0))
+
+    def test_not_strings(self):
+        # 1 and True would have the same key
+        cache = text.EscapeCache()
+        self.assertEqual(cache.escape(1), '1')
+        self.assertEqual(cache.escape(True), 'True')
+        self.assertEqual(cache.escape([1]), '[1]')
+        self.assertEqual(cache.info(), text.CacheInfo(0, 0, 4096, 0))
+
+
+class TestTextEscapedCached(unittest.TestCase):
+    def tearDown(self):
+        dom.DEFAULT_ESCAPE = None
+
+    def test_shared_cache(self):
+        text.TextEscapedCached.CACHE.clear()
+        first = text.TextEscapedCached('a < b')
+        second = text.TextEscapedCached('a < b')
+        self.assertEqual(first.escaped, 'a &lt; b')
+        self.assertIs(first.escaped, second.escaped)
+        self.assertEqual(second.escaped_unicode, 'a &lt; b')
+        self.assertEqual(text.TextEscapedCached.CACHE.info().hits, 1)
+
+    def test_make_cached_escape(self):
+        cls = text.make_cached_escape(2)
+        self.assertTrue(issubclass(cls, text.TextEscapedCached))
+        self.assertIsNot(cls.CACHE, text.TextEscapedCached.CACHE)
+        self.assertEqual(cls.CACHE.maxsize, 2)
+        self.assertFalse(hasattr(cls('a'), '__dict__'))
+
+    def test_policy(self):
+        cls = text.make_cached_escape()
+        dom.DEFAULT_ESCAPE = cls
+        node = htool.P('a < b', htool.Span('a < b'), title='a < b')
+        self.assertEqual(node.compile(),
+                         '<p title="a &lt; b">a &lt; b'
+                         '<span>a &lt; b</span></p>')
+        # The repeated text is escaped once
+        self.assertIn('a < b', cls.CACHE._cache)
+        self.assertEqual(cls.CACHE.info().hits, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()